@@ -0,0 +1,129 @@
+# analysis_cache.py
+# TextAnalyzer の解析結果（音素イベントのリスト）のキャッシュ
+# 1段目はプロセス内の LRU、2段目は任意のディスク置き場（アプリを再起動しても残る）
+# キーは NFKC 正規化したテキスト・辞書のバージョン・解析の設定から作る
+
+import hashlib
+import json
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+
+# ディスクキャッシュの置き場所（未設定ならメモリだけ）
+ANALYSIS_CACHE_DIR_ENV_VAR = "VOSE_ANALYSIS_CACHE_DIR"
+
+
+def normalize_text(text: str) -> str:
+    """全角英数・半角カナなどの表記ゆれを揃える（同じ読みになる入力は同じキーにする）"""
+    return unicodedata.normalize("NFKC", text).strip()
+
+
+def analysis_key(normalized_text: str, dict_version: str, settings: dict) -> str:
+    payload = json.dumps([normalized_text, dict_version, settings], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _copy_events(events: list) -> list:
+    # 呼び出し側がイベントを書き換えてもキャッシュが壊れないように、毎回コピーを返す
+    return [dict(e) for e in events]
+
+
+class AnalysisCache:
+    """
+    キー → 音素イベント（辞書）のリスト
+    メモリに無ければディスクを見て、ディスクで見つかったものはメモリにも載せる
+    """
+    def __init__(self, max_entries: int = 1024, disk_dir: str = None):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir if disk_dir is not None else os.environ.get(ANALYSIS_CACHE_DIR_ENV_VAR)
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, list] = OrderedDict()
+        self._lock = threading.Lock()
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.json")
+
+    def _remember(self, key: str, events: list):
+        """呼び出し側で self._lock を取っておくこと"""
+        self._entries[key] = events
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str) -> list:
+        """キャッシュにあればイベントのリスト（コピー）を返す。無ければ None"""
+        with self._lock:
+            events = self._entries.get(key)
+            if events is not None:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return _copy_events(events)
+
+        events = self._load_disk(key)
+        with self._lock:
+            if events is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, events)
+        return _copy_events(events)
+
+    def put(self, key: str, events: list):
+        events = _copy_events(events)
+        with self._lock:
+            self._remember(key, events)
+        self._save_disk(key, events)
+
+    def _load_disk(self, key: str) -> list:
+        if not self.disk_dir: return None
+        path = self._disk_path(key)
+        if not os.path.exists(path): return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"解析キャッシュの読み込みに失敗しました: {path} ({e})")
+            return None
+
+    def _save_disk(self, key: str, events: list):
+        if not self.disk_dir: return
+        path = self._disk_path(key)
+        # 別プロセスが同時に書いても壊れたファイルを読まないように、一時ファイルから置き換える
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(events, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"解析キャッシュの保存に失敗しました: {path} ({e})")
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.memory_hits + self.disk_hits + self.misses
+        return (self.memory_hits + self.disk_hits) / total if total else 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hit_rate,
+            }
+
+    def clear(self, disk: bool = False):
+        """メモリのキャッシュを空にする（disk=True ならディスクの置き場も消す）"""
+        with self._lock:
+            self._entries.clear()
+        if disk and self.disk_dir:
+            for root, _, files in os.walk(self.disk_dir):
+                for name in files:
+                    if name.endswith(".json"):
+                        os.remove(os.path.join(root, name))
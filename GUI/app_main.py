@@ -1,9 +1,19 @@
 # app_main.py
-import sys
+# 起動の流れ:
+#   1. エンジン (DLL) と音源の読み込みをワーカースレッドで始める
+#   2. その間に PySide6 とメインウィンドウのモジュールを読み込む（スプラッシュに進み具合を表示）
+#   3. 読み込み済みのエンジンを MainWindow に渡して表示する
+# 重いモジュール (numpy, pyaudio, janome, pyopenjtalk など) は使う所で読み込み、ここでは import しない
+# VOSE_STARTUP_PROFILE=1 で段階ごとの起動時間を表示する（startup_profile.py）
+# 起動は python GUI/app_main.py。GUI のモジュールは全て GUI フォルダ直下から import する（from vo_se_engine import ... の形）
 import os
-import time
-from PyQt6.QtWidgets import QApplication
-from PyQt6.QtCore import Qt
+import sys
+import threading
+
+# python -m GUI.app_main など、GUI フォルダが sys.path に無い起動のされ方でも同じ並びで import できるようにする
+GUI_DIR = os.path.dirname(os.path.abspath(__file__))
+if GUI_DIR not in sys.path:
+    sys.path.insert(0, GUI_DIR)
 
 # PyInstallerのスプラッシュスクリーン制御用
 try:
@@ -11,140 +21,204 @@ try:
 except ImportError:
     pyi_splash = None
 
-# 自作モジュールのインポート（パスはプロジェクト構成に合わせる）
-from GUI.main_window import MainWindow
-from GUI.vo_se_engine import VoSeEngineWrapper
+from startup_profile import profile_from_env
+
+DEFAULT_CHARACTER_ID = "char_001"
+APP_USER_MODEL_ID = 'mycompany.myproduct.vo-se.1.0' # 任意のID
+
+# --- GUI改修ステップ3 のスタイルシート ---
+STYLE_SHEET = """
+/* アプリケーション全体の基本フォントと背景色 */
+QMainWindow {
+    background-color: #2e2e2e; /* 暗いグレーの背景 */
+    color: #eeeeee;            /* 明るいテキスト色 */
+}
+
+/* QPushButton のスタイル設定 */
+QPushButton {
+    background-color: #007acc; /* 目立つ青色 */
+    border: none;
+    color: white;
+    padding: 6px 12px;
+    margin: 3px;
+    border-radius: 4px; /* 角を少し丸くする */
+}
+QPushButton:hover {
+    background-color: #005f99; /* ホバー時の色 */
+}
+QPushButton:pressed {
+    background-color: #004c80; /* クリック時の色 */
+}
+
+/* QLabel のスタイル */
+QLabel {
+    color: #eeeeee;
+    margin: 2px;
+}
+
+/* QLineEdit (テキスト入力欄) のスタイル */
+QLineEdit {
+    background-color: #3e3e3e;
+    border: 1px solid #555555;
+    padding: 4px;
+    color: #eeeeee;
+}
+
+/* QComboBox (キャラクター選択) のスタイル */
+QComboBox {
+    background-color: #3e3e3e;
+    color: #eeeeee;
+    border: 1px solid #555555;
+    padding: 4px;
+}
+
+/* QScrollBar (スクロールバー) のスタイル */
+QScrollBar:horizontal {
+    border: 1px solid #444444;
+    background: #333333;
+    height: 12px;
+    margin: 0px;
+}
+QScrollBar:vertical {
+    border: 1px solid #444444;
+    background: #333333;
+    width: 12px;
+    margin: 0px;
+}
+QScrollBar::handle:horizontal {
+    background: #007acc;
+    min-width: 20px;
+}
+QScrollBar::handle:vertical {
+    background: #007acc;
+    min-height: 20px;
+}
+
+/* QSplitter のハンドル（分割バー）のスタイル */
+QSplitter::handle {
+    background-color: #555;
+}
+"""
+
+
+class EngineLoader:
+    """
+    エンジン (DLL) と音源をワーカースレッドで読み込む
+    status は今何をしているか（スプラッシュに表示する文字列）
+    """
+    def __init__(self, profile, char_id: str = DEFAULT_CHARACTER_ID):
+        self.profile = profile
+        self.char_id = char_id
+        self.engine = None
+        self.error = None
+        self.status = "エンジンを初期化中..."
+        self._thread = threading.Thread(target=self._run, name="engine-loader", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        try:
+            with self.profile.phase("import vo_se_engine"):
+                from vo_se_engine import VO_SE_Engine
+            with self.profile.phase("エンジン (DLL) のロード"):
+                engine = VO_SE_Engine(previews=True) # ノートのクリック・MIDIモニター用の音を作り置きする
+            self.engine = engine
+            self.status = "音源データを読み込み中..."
+            with self.profile.phase("音源のロード"):
+                char_id = self._load_character(engine)
+            if engine.active_character_id != char_id:
+                # エンジンはそのまま渡し、キャラクターは MainWindow の選択欄から選び直してもらう
+                raise RuntimeError(f"キャラクター {char_id} を読み込めませんでした。")
+        except ImportError as e:
+            self.error = e # モジュールが足りない・import の並びが壊れている。wait() がメインスレッドで送出する
+        except Exception as e:
+            self.error = e
+            print(f"エンジンの読み込みに失敗しました: {e}")
+
+    def _load_character(self, engine) -> str:
+        """
+        名簿（audio_data/ から見つけた音源）に char_id があればそれを、無ければ名簿の先頭を読み込む
+        名簿が空なら音源なしで char_id を読み込む。読み込もうとしたIDを返す
+        """
+        char_id = engine.default_character_id(self.char_id)
+        if char_id is not None:
+            engine.set_active_character(char_id)
+            return char_id
+        engine.load_character(self.char_id, "")
+        return self.char_id
+
+    def wait(self, app=None):
+        """
+        読み込みが終わるまで待つ。その間スプラッシュの表示を更新し、Qt のイベントも処理する
+        ImportError は握りつぶさずにそのまま送出する（エンジン無しで起動しても動かないので）
+        """
+        shown = None
+        while self._thread.is_alive():
+            if pyi_splash and self.status != shown:
+                pyi_splash.update_text(self.status)
+                shown = self.status
+            if app is not None:
+                app.processEvents()
+            self._thread.join(0.02)
+        if isinstance(self.error, ImportError):
+            raise self.error
+        return self.engine
+
+
+def _set_app_user_model_id():
+    # Windowsに独立してると教えるやつ
+    if os.name != 'nt': return
+    import ctypes
+    ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID(APP_USER_MODEL_ID)
 
-def main():
-    # 1. 高DPI対応（GUIを表示する前に必須）
-    if hasattr(Qt.ApplicationAttribute, 'AA_UseHighDpiPixmaps'):
-        QApplication.setAttribute(Qt.ApplicationAttribute.AA_UseHighDpiPixmaps, True)
 
-    app = QApplication(sys.argv)
+def main():
+    profile, profile_path = profile_from_env()
+    profile.track_imports()
 
-    # --- 2. アプリの初期化（スプラッシュ表示中に行う処理） ---
-    
-    # メッセージの更新（スプラッシュ上に文字を出せる場合）
-    if pyi_splash:
-        pyi_splash.update_text("エンジンを初期化中...")
+    # 1. 一番重いエンジンと音源の読み込みを、GUI の準備と並行して進める
+    loader = EngineLoader(profile)
+    loader.start()
 
-    # (A) C言語エンジンのロード
-    # ここで DLL/dylib のロードと関数定義が行われる
-    engine = VoSeEngineWrapper() 
+    _set_app_user_model_id()
+    with profile.phase("import PySide6"):
+        from PySide6.QtWidgets import QApplication
+    with profile.phase("QApplication の作成"):
+        app = QApplication(sys.argv)
+        app.setStyleSheet(STYLE_SHEET)
 
+    # 2. メインウィンドウのモジュール（TimelineWidget など）を読み込む
     if pyi_splash:
-        pyi_splash.update_text("音源データを読み込み中...")
+        pyi_splash.update_text("画面を準備中...")
+    with profile.phase("import main_window"):
+        from main_window import MainWindow
 
-    # (B) メインウィンドウの作成
-    # ここで TimelineWidget やサイドバーなどの重いGUIパーツが生成される
-    window = MainWindow(engine=engine)
+    with profile.phase("エンジンの読み込み待ち"):
+        engine = loader.wait(app)
 
-    # (C) 擬似的な待機（ロードが速すぎてスプラッシュが見えない場合用）
-    # time.sleep(1) 
+    # 3. 読み込み済みのエンジンを渡す（エンジン自体が作れなかった場合は MainWindow がもう一度作る）
+    with profile.phase("MainWindow の作成"):
+        window = MainWindow(engine=engine)
 
-    # --- 3. セットアップ完了、スプラッシュを閉じる ---
+    # --- セットアップ完了、スプラッシュを閉じる ---
     if pyi_splash:
         pyi_splash.close()
 
-    # 4. メインウィンドウを表示してアプリ開始
+    # メインウィンドウを表示してアプリ開始
     window.show()
+    profile.mark("ウィンドウ表示")
+    profile.stop_tracking_imports()
+    if profile.enabled:
+        profile.write(profile_path)
     sys.exit(app.exec())
 
 
-
-
-# Windowsに独立してると教えるやつ
-if os.name == 'nt':
-    myappid = 'mycompany.myproduct.vo-se.1.0' # 任意のID
-    ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID(myappid)
-
-
-
 # ----------------------------------------------------------------------
 # Pythonスクリプトが直接実行された場合にのみ、以下のブロックが実行される
 # ----------------------------------------------------------------------
 if __name__ == "__main__":
-    # QApplication インスタンスの作成
-    app = QApplication(sys.argv)
-    
-    # --- GUI改修ステップ3 のスタイルシートを適用 ---
-    app.setStyleSheet("""
-        /* アプリケーション全体の基本フォントと背景色 */
-        QMainWindow {
-            background-color: #2e2e2e; /* 暗いグレーの背景 */
-            color: #eeeeee;            /* 明るいテキスト色 */
-        }
-        
-        /* QPushButton のスタイル設定 */
-        QPushButton {
-            background-color: #007acc; /* 目立つ青色 */
-            border: none;
-            color: white;
-            padding: 6px 12px;
-            margin: 3px;
-            border-radius: 4px; /* 角を少し丸くする */
-        }
-        QPushButton:hover {
-            background-color: #005f99; /* ホバー時の色 */
-        }
-        QPushButton:pressed {
-            background-color: #004c80; /* クリック時の色 */
-        }
-
-        /* QLabel のスタイル */
-        QLabel {
-            color: #eeeeee;
-            margin: 2px;
-        }
-
-        /* QLineEdit (テキスト入力欄) のスタイル */
-        QLineEdit {
-            background-color: #3e3e3e;
-            border: 1px solid #555555;
-            padding: 4px;
-            color: #eeeeee;
-        }
-        
-        /* QComboBox (キャラクター選択) のスタイル */
-        QComboBox {
-            background-color: #3e3e3e;
-            color: #eeeeee;
-            border: 1px solid #555555;
-            padding: 4px;
-        }
-
-        /* QScrollBar (スクロールバー) のスタイル */
-        QScrollBar:horizontal {
-            border: 1px solid #444444;
-            background: #333333;
-            height: 12px;
-            margin: 0px;
-        }
-        QScrollBar:vertical {
-            border: 1px solid #444444;
-            background: #333333;
-            width: 12px;
-            margin: 0px;
-        }
-        QScrollBar::handle:horizontal {
-            background: #007acc;
-            min-width: 20px;
-        }
-        QScrollBar::handle:vertical {
-            background: #007acc;
-            min-height: 20px;
-        }
-
-        /* QSplitter のハンドル（分割バー）のスタイル */
-        QSplitter::handle {
-            background-color: #555;
-        }
-    """)
-    # --- スタイルシートここまで ---
-    
-    # メインウィンドウのインスタンスを作成し、表示する
-    window = MainWindow() 
-    window.show()
-    
-    # アプリケーションのイベントループ（ユーザー操作の待ち受け）を開始する
-    sys.exit(app.exec())
+    # 実行ファイル化した場合、解析・書き出しのワーカープロセスもこの実行ファイルから起動するので、何より先に呼ぶ
+    import multiprocessing
+    multiprocessing.freeze_support()
+    main()
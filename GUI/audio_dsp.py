@@ -0,0 +1,49 @@
+# audio_dsp.py
+# synthesizer_core.h の処理を NumPy で書き直したもの（Python 側でつなぎ合わせる時に使う）
+
+import wave
+
+import numpy as np
+
+DEFAULT_FADE_SAMPLES = 256 # つなぎ目のクロスフェード長
+
+
+def note_to_hz(note_number):
+    """MIDIノートから周波数へ変換（配列もそのまま渡せる）"""
+    return 440.0 * np.power(2.0, (np.asarray(note_number, dtype=np.float64) - 69.0) / 12.0)
+
+
+def resample_linear(src: np.ndarray, dest_len: int) -> np.ndarray:
+    """C の resample_linear と同じ線形補間リサンプリング（src 全体を dest_len サンプルに伸縮）"""
+    if dest_len <= 0 or src.size == 0:
+        return np.zeros(max(dest_len, 0), dtype=np.float32)
+    if src.size == 1:
+        return np.full(dest_len, src[0], dtype=np.float32)
+    pos = np.linspace(0.0, src.size - 1, dest_len)
+    return np.interp(pos, np.arange(src.size), src).astype(np.float32)
+
+
+def apply_crossfade(out_buffer: np.ndarray, current_pos: int, new_sample: np.ndarray, fade_samples: int = DEFAULT_FADE_SAMPLES):
+    """
+    C の apply_crossfade と同じ処理
+    current_pos から fade_samples の間は既存の音から新しい音へ線形に切り替え、その後ろは new_sample で上書きする
+    """
+    n = min(new_sample.size, out_buffer.size - current_pos)
+    if n <= 0: return
+    fade = max(0, min(fade_samples, n))
+    if fade > 0:
+        w = np.arange(fade, dtype=np.float32) / np.float32(fade)
+        region = out_buffer[current_pos:current_pos + fade]
+        region *= (1.0 - w)
+        region += new_sample[:fade] * w
+    out_buffer[current_pos + fade:current_pos + n] = new_sample[fade:n]
+
+
+def write_wav(path: str, audio: np.ndarray, sample_rate: int):
+    """float32 の音声を 16bit PCM の WAV として保存する"""
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767.0).astype('<i2')
+    with wave.open(path, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(pcm.tobytes())
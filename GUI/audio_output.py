@@ -0,0 +1,578 @@
+# audio_output.py
+# 開いたままにしておく PyAudio のコールバック出力と、そこへ音声を送るリングバッファ
+# 再生のたびにデバイスを開き直さないので、再生開始が速く、停止・シーク・ループもできる
+
+import queue
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+LOOP_FADE_SAMPLES = 441 # ループの継ぎ目のクロスフェード長（44.1kHz で 10ms）
+ONE_SHOT_RELEASE_SAMPLES = 441 # ワンショットを途中で止める時のフェードアウト長
+MAX_ONE_SHOTS = 8              # 同時に鳴らせるワンショットの数（超えたら古いものから止める）
+STREAM_PREFETCH_BLOCKS = 4     # StreamSource が先に取り出しておくブロック数の上限
+_STREAM_END = object()         # StreamSource のブロックの終わりの目印
+
+
+class _OneShot:
+    """コールバックの中で再生と一緒に混ぜる短い音（プレビュー音）"""
+    __slots__ = ("audio", "position", "gain", "tag", "release_left")
+
+    def __init__(self, audio: np.ndarray, gain: float, tag):
+        self.audio = audio
+        self.position = 0
+        self.gain = gain
+        self.tag = tag
+        self.release_left = None # フェードアウト中なら残りのサンプル数
+
+
+class RingBuffer:
+    """
+    書き込み1スレッド・読み出し1スレッド用の float32 リングバッファ
+    書き込み側は write_count だけ、読み出し側は read_count だけを更新するのでロックを使わない
+    （オーディオのコールバックがロック待ちで止まらないようにするため）
+    音声と並べて、各サンプルがタイムライン上の何サンプル目かも保持する
+    """
+    def __init__(self, capacity: int):
+        size = 1
+        while size < capacity:
+            size <<= 1
+        self.capacity = size
+        self._mask = size - 1
+        self._data = np.zeros(size, dtype=np.float32)
+        self._positions = np.zeros(size, dtype=np.int64)
+        self.write_count = 0 # これまでに書き込んだ総サンプル数
+        self.read_count = 0  # これまでに読み出した総サンプル数
+
+    def readable(self) -> int:
+        return self.write_count - self.read_count
+
+    def writable(self) -> int:
+        return self.capacity - self.readable()
+
+    def write(self, data: np.ndarray, position: int = 0) -> int:
+        """書ける分だけ書き込み、書き込んだサンプル数を返す（position は data の先頭のタイムライン位置）"""
+        n = min(data.size, self.writable())
+        if n <= 0: return 0
+        start = self.write_count & self._mask
+        first = min(n, self.capacity - start)
+        self._data[start:start + first] = data[:first]
+        self._data[:n - first] = data[first:n]
+        positions = np.arange(position, position + n, dtype=np.int64)
+        self._positions[start:start + first] = positions[:first]
+        self._positions[:n - first] = positions[first:]
+        self.write_count += n # 中身を書いてからカウンタを進める
+        return n
+
+    def read_into(self, out: np.ndarray, positions_out: np.ndarray = None) -> int:
+        """out に読めるだけ読み出し、読んだサンプル数を返す（positions_out には各サンプルのタイムライン位置）"""
+        n = min(out.size, self.readable())
+        if n <= 0: return 0
+        start = self.read_count & self._mask
+        first = min(n, self.capacity - start)
+        out[:first] = self._data[start:start + first]
+        out[first:n] = self._data[:n - first]
+        if positions_out is not None:
+            positions_out[:first] = self._positions[start:start + first]
+            positions_out[first:n] = self._positions[:n - first]
+        self.read_count += n
+        return n
+
+    def skip_to(self, count: int):
+        """読み出し側から呼ぶ。count サンプル目まで読み捨てる"""
+        if count > self.read_count:
+            self.read_count = min(count, self.write_count)
+
+
+class PlaybackClock:
+    """
+    出力デバイスが今鳴らしているタイムライン上の位置（サンプル単位）
+    コールバックが「ここまでに鳴らした実サンプル数とその位置」を記録し、GUI スレッドはデバイスの遅延を差し引いて読む
+    記録はタプルの差し替えだけで行う（GIL 下で不可分なのでロック不要）
+    """
+    HISTORY = 64 # ループの継ぎ目などで位置が飛んでも遅延分さかのぼれるだけの記録数
+
+    def __init__(self, sample_rate: int):
+        self.sample_rate = sample_rate
+        self.latency_frames = 0     # デバイスの出力遅延（サンプル数）
+        self.frames_played = 0      # コールバックが渡した実サンプルの総数（コールバックだけが更新）
+        self._history = [(0, 0)] * self.HISTORY # (frames_played, タイムライン位置) 位置が連続する区間の先頭
+        self._state = (0, 0.0, -1)  # (最後に渡したブロックの先頭の frames_played, 渡した時刻, 最新の記録の番号)
+        self._origin = (0, 0)       # (frames_played, タイムライン位置) 再生開始・シークした時点
+
+    def reset(self, timeline_sample: int):
+        """再生開始・シークの時に呼ぶ。新しい音が聞こえ始めるまでは timeline_sample を返す"""
+        self._origin = (self.frames_played, timeline_sample)
+
+    def publish(self, positions: np.ndarray):
+        """コールバックから呼ぶ。今回渡したサンプルのタイムライン位置を記録する"""
+        n = positions.size
+        if n == 0: return
+        _, _, head = self._state
+        # ブロックの途中で位置が飛んでいたら（ループの継ぎ目）、そこからを別の区間として記録する
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(positions) != 1) + 1))
+        for i in starts.tolist():
+            head += 1
+            self._history[head % self.HISTORY] = (self.frames_played + i, int(positions[i]))
+        self._state = (self.frames_played, time.perf_counter(), head)
+        self.frames_played += n
+
+    def position(self) -> int:
+        """今聞こえているタイムライン位置（サンプル）"""
+        origin_frames, origin_position = self._origin
+        block_start, stamp, head = self._state
+        # 最後に渡したブロックの先頭から経過時間だけ進め、デバイス内で待っている分を差し引く
+        elapsed = int((time.perf_counter() - stamp) * self.sample_rate)
+        heard = min(self.frames_played - 1, block_start + elapsed - self.latency_frames)
+        if heard < origin_frames or head < 0:
+            return origin_position
+        for k in range(head, max(head - self.HISTORY, -1), -1):
+            start_frames, start_position = self._history[k % self.HISTORY]
+            if start_frames < origin_frames: break
+            if start_frames <= heard:
+                return start_position + (heard - start_frames)
+        return origin_position
+
+    def seconds(self) -> float:
+        return self.position() / self.sample_rate
+
+
+class BufferSource:
+    """
+    合成済みの配列を再生するソース（シーク・ループ可能）
+    ループの終端の直前 fade サンプルは、終端の音とループ先頭の直前の音をクロスフェードしたものに置き換えて継ぎ目を消す
+    """
+    seekable = True
+
+    def __init__(self, audio: np.ndarray, start_sample: int = 0, timeline_offset: int = 0):
+        self.audio = audio
+        self.timeline_offset = timeline_offset # audio[0] がタイムライン上の何サンプル目か
+        self.position = max(0, start_sample)
+        self.loop_range = None # audio 内の (開始サンプル, 終了サンプル)
+        self._loop = None      # タイムライン上の (開始, 終了, クロスフェード長)。配列を差し替えた時に作り直す
+        self._seam = None
+
+    def set_loop(self, start: int, end: int, fade: int) -> bool:
+        """タイムライン上の [start, end) をループさせる"""
+        self._loop = (start, end, fade)
+        lo = max(0, start - self.timeline_offset)
+        hi = min(end - self.timeline_offset, self.audio.size)
+        if hi <= lo:
+            self.loop_range = self._seam = None
+            return False
+        fade = max(0, min(fade, hi - lo))
+        tail = self.audio[hi - fade:hi]
+        head = np.zeros(fade, dtype=np.float32) # ループ先頭の直前の音（配列の外は無音）
+        pre = self.audio[max(0, lo - fade):lo]
+        head[fade - pre.size:] = pre
+        ramp = np.linspace(0.0, 1.0, fade, endpoint=False, dtype=np.float32)
+        self._seam = tail * (1.0 - ramp) + head * ramp
+        self.loop_range = (lo, hi)
+        return True
+
+    def clear_loop(self):
+        self.loop_range = self._seam = self._loop = None
+
+    def replace_audio(self, audio: np.ndarray, timeline_offset: int):
+        """再生中のタイムライン位置を保ったまま配列を差し替える"""
+        timeline_position = self.timeline_offset + self.position
+        self.audio = audio
+        self.timeline_offset = timeline_offset
+        self.position = min(max(0, timeline_position - timeline_offset), audio.size)
+        if self._loop is not None:
+            self.set_loop(*self._loop)
+
+    def read(self, n: int):
+        """(先頭のタイムライン位置, 次の最大 n サンプル) を返す。最後まで読んだら None"""
+        if self.loop_range is not None:
+            loop_start, loop_end = self.loop_range
+            if self.position >= loop_end:
+                self.position = loop_start
+            seam_start = loop_end - self._seam.size
+            if self.position >= seam_start:
+                # 継ぎ目のクロスフェード区間を出し、終端まで来たらループ先頭へ戻る
+                chunk = self._seam[self.position - seam_start:self.position - seam_start + n]
+                start = self.timeline_offset + self.position
+                self.position += chunk.size
+                if self.position >= loop_end:
+                    self.position = loop_start
+                return start, chunk
+            end = min(self.position + n, seam_start)
+        else:
+            end = min(self.position + n, self.audio.size)
+        if end <= self.position:
+            return None
+        chunk = self.audio[self.position:end]
+        start = self.timeline_offset + self.position
+        self.position = end
+        return start, chunk
+
+    def seek(self, timeline_sample: int):
+        self.position = min(max(0, timeline_sample - self.timeline_offset), self.audio.size)
+
+    def close(self):
+        pass
+
+
+class StreamSource:
+    """
+    synthesize_stream などのブロックのイテレータを再生するソース（シーク不可）
+    イテレータは専用のスレッドで読んで上限付きのキューに溜め、フィーダーはそこから待ち時間付きで取り出す
+    （合成待ちの間もフィーダーが止まらないので、停止や次の再生への切り替えにすぐ気付ける）
+    """
+    seekable = False
+
+    def __init__(self, blocks, timeline_offset: int = 0, prefetch: int = STREAM_PREFETCH_BLOCKS):
+        self.blocks = iter(blocks)
+        self.position = timeline_offset
+        self._queue = queue.Queue(maxsize=max(1, prefetch))
+        self._cancelled = threading.Event()
+        self._ended = False
+        self._thread = threading.Thread(target=self._produce, daemon=True)
+        self._thread.start()
+
+    def _produce(self):
+        try:
+            for block in self.blocks:
+                if not self._put(block): return
+        except Exception as e:
+            print(f"再生ソースの読み込みでエラー: {e}")
+        finally:
+            # イテレータはこのスレッドで閉じる（合成中のジェネレーターを別スレッドから閉じることはできない）
+            if hasattr(self.blocks, "close"):
+                self.blocks.close() # 途中で止めた場合はバックグラウンド合成も止める
+            self._put(_STREAM_END)
+
+    def _put(self, item) -> bool:
+        # 止められた場合に備えて、待ちながらキャンセルを確認する
+        while not self._cancelled.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def read(self, n: int, timeout: float = None):
+        """
+        (先頭のタイムライン位置, 次のブロック) を返す。最後まで読んだら None
+        timeout 秒待ってもブロックが届かなければ空のブロックを返す
+        """
+        if self._ended: return None
+        try:
+            block = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return self.position, np.zeros(0, dtype=np.float32)
+        if block is _STREAM_END:
+            self._ended = True
+            return None
+        start = self.position
+        self.position += block.size
+        return start, block
+
+    def close(self):
+        """読み込みスレッドを止める（すぐに戻る。イテレータは読み込みスレッドが閉じる）"""
+        self._cancelled.set()
+
+
+class AudioOutput:
+    """
+    PyAudio のコールバックストリームを開いたままにし、フィーダースレッドがソースからリングバッファへ音声を送る
+    コールバックはリングバッファから読むだけなので、合成が遅れても無音になる（アンダーランとして数える）だけで止まらない
+    """
+    def __init__(self, sample_rate: int = 44100, block_frames: int = 512, buffer_seconds: float = 0.25):
+        self.sample_rate = sample_rate
+        self.block_frames = block_frames
+        self.ring = RingBuffer(int(buffer_seconds * sample_rate))
+        self.underruns = 0
+        self.is_playing = False
+        self.clock = PlaybackClock(sample_rate)
+        self.on_finished = None # 最後まで再生し終えた時に（フィーダースレッドから）呼ばれる
+
+        self._pa = None
+        self._stream = None
+        self._pa_continue = 0
+        self._pa_output_underflow = 0
+        self._out = np.zeros(block_frames, dtype=np.float32)
+        self._out_positions = np.zeros(block_frames, dtype=np.int64)
+
+        self._lock = threading.Lock() # ソースの差し替えとフィーダーの書き込みの排他（コールバックは取らない）
+        self._source = None
+        self._generation = 0     # ソースを差し替えるたびに増やす（古いソースの音を書き込まないため）
+        self._source_done = False
+        self._primed = False     # 今のソースの音が一度でも鳴ったか（鳴り始める前の無音はアンダーランに数えない）
+        self._discard_until = 0  # コールバックはこのサンプル数まで読み捨てる（停止・シークで古い音を捨てる）
+        self._finished = threading.Event()
+        self._finished.set()
+        self._retired = []       # フィーダーが閉じる古いソース
+        self._one_shot_commands = deque() # 他のスレッドからコールバックへの指示（deque の append/popleft はロック不要）
+        self._one_shots = []     # コールバックだけが触る、鳴っているワンショット
+        self._feeder = None
+        self._closed = False
+
+    # --- デバイス ---
+    def _ensure_stream(self):
+        """最初の再生の時に PyAudio を読み込んでストリームを開く"""
+        if self._stream is not None: return
+        import pyaudio
+        self._pa_continue = pyaudio.paContinue
+        self._pa_output_underflow = pyaudio.paOutputUnderflow
+        self._pa = pyaudio.PyAudio()
+        self._stream = self._pa.open(
+            format=pyaudio.paFloat32, channels=1, rate=self.sample_rate, output=True,
+            frames_per_buffer=self.block_frames, stream_callback=self._callback
+        )
+        try:
+            self.clock.latency_frames = int(self._stream.get_output_latency() * self.sample_rate)
+        except Exception:
+            self.clock.latency_frames = 0
+        self._stream.start_stream()
+        self._feeder = threading.Thread(target=self._feed_loop, daemon=True)
+        self._feeder.start()
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        ring = self.ring
+        if ring.read_count < self._discard_until:
+            ring.skip_to(self._discard_until)
+        if self._out.size < frame_count:
+            self._out = np.zeros(frame_count, dtype=np.float32)
+            self._out_positions = np.zeros(frame_count, dtype=np.int64)
+        out = self._out[:frame_count]
+        n = ring.read_into(out, self._out_positions)
+        if n > 0:
+            self._primed = True
+            self.clock.publish(self._out_positions[:n])
+        if n < frame_count:
+            out[n:] = 0.0
+            if self.is_playing and self._primed and not self._source_done:
+                self.underruns += 1 # 合成・供給が間に合わなかった
+        if status & self._pa_output_underflow:
+            self.underruns += 1
+        if self._one_shot_commands or self._one_shots:
+            self._mix_one_shots(out)
+        return out.tobytes(), self._pa_continue
+
+    def _mix_one_shots(self, out: np.ndarray):
+        """ワンショットを出力に足し込む（コールバックの中で呼ばれる）"""
+        voices = self._one_shots
+        while self._one_shot_commands:
+            command, arg = self._one_shot_commands.popleft()
+            if command == "play":
+                voices.append(arg)
+                if len(voices) > MAX_ONE_SHOTS:
+                    del voices[0]
+            else:
+                for voice in voices:
+                    if (command == "release" and voice.tag == arg) or command == "clear":
+                        if voice.release_left is None:
+                            voice.release_left = ONE_SHOT_RELEASE_SAMPLES
+
+        alive = []
+        for voice in voices:
+            n = min(out.size, voice.audio.size - voice.position)
+            if voice.release_left is not None:
+                n = min(n, voice.release_left)
+            if n > 0:
+                chunk = voice.audio[voice.position:voice.position + n] * voice.gain
+                if voice.release_left is not None:
+                    left = voice.release_left
+                    chunk *= np.arange(left, left - n, -1, dtype=np.float32) / ONE_SHOT_RELEASE_SAMPLES
+                    voice.release_left -= n
+                out[:n] += chunk
+                voice.position += n
+            if voice.position < voice.audio.size and voice.release_left != 0:
+                alive.append(voice)
+        self._one_shots = alive
+        np.clip(out, -1.0, 1.0, out=out)
+
+    # --- フィーダー ---
+    def _feed_loop(self):
+        pending = None
+        pending_position = 0
+        pending_generation = -1
+        idle = self.block_frames / self.sample_rate / 2
+        while not self._closed:
+            self._close_retired()
+            with self._lock:
+                source, generation, done = self._source, self._generation, self._source_done
+            if generation != pending_generation:
+                pending = None
+                pending_generation = generation
+
+            if source is None or done:
+                self._check_finished(generation)
+                time.sleep(idle)
+                continue
+
+            if pending is None or pending.size == 0:
+                n = max(self.block_frames, self.ring.writable())
+                if source.seekable:
+                    # シーク・ループ設定と同時に位置を動かさないようにロックの中で読む
+                    with self._lock:
+                        if self._generation != generation: continue
+                        result = source.read(n)
+                else:
+                    # StreamSource は合成待ちのことがあるので、ロックの外で少しだけ待つ
+                    # 届いていなければ空のブロックが返り、次の周回でソースの差し替えを確認できる
+                    result = source.read(n, timeout=idle)
+                if result is None:
+                    with self._lock:
+                        if self._generation == generation:
+                            self._source_done = True
+                    continue
+                pending_position, pending = result
+
+            with self._lock:
+                if self._generation != generation: continue
+                written = self.ring.write(pending, pending_position)
+            pending = pending[written:]
+            pending_position += written
+            if pending.size > 0:
+                time.sleep(idle) # リングバッファが一杯なのでコールバックが読むのを待つ
+
+    def _check_finished(self, generation: int):
+        """送り終えた音が全て鳴り終わったら再生終了にする"""
+        if not self.is_playing or not self._source_done or self.ring.readable() > 0: return
+        with self._lock:
+            if self._generation != generation: return
+            self.is_playing = False
+        self._finished.set()
+        if self.on_finished is not None:
+            try:
+                self.on_finished()
+            except Exception as e:
+                print(f"再生終了の通知でエラー: {e}")
+
+    def _close_retired(self):
+        with self._lock:
+            retired, self._retired = self._retired, []
+        for source in retired:
+            try:
+                source.close()
+            except Exception as e:
+                print(f"再生ソースの終了処理でエラー: {e}")
+
+    def _set_source(self, source):
+        """ソースを差し替える（呼び出し側で self._lock を取っておくこと）"""
+        if self._source is not None:
+            self._retired.append(self._source)
+        self._source = source
+        self._generation += 1
+        self._source_done = source is None
+        self._primed = False
+        self._discard_until = self.ring.write_count # まだ鳴っていない古い音は捨てる
+
+    # --- 操作 ---
+    def play_buffer(self, audio: np.ndarray, start_sample: int = 0, copy: bool = True, timeline_offset: int = 0,
+                    loop_range: tuple = None, fade_samples: int = LOOP_FADE_SAMPLES):
+        """
+        合成済みの配列を再生する（すぐに戻る）
+        PhraseRenderer の mix バッファのように後から書き換えられる配列は copy=True のまま渡す
+        timeline_offset は audio[0] がタイムライン上の何サンプル目か（再生位置の表示に使う）
+        loop_range にタイムライン上の (開始, 終了) を渡すと最初からループ再生する
+        """
+        self._ensure_stream()
+        audio = np.array(audio, dtype=np.float32, copy=True) if copy else np.asarray(audio, dtype=np.float32)
+        source = BufferSource(audio, start_sample, timeline_offset)
+        if loop_range is not None:
+            source.set_loop(loop_range[0], loop_range[1], fade_samples)
+        with self._lock:
+            self._set_source(source)
+            self.clock.reset(timeline_offset + start_sample)
+            self.is_playing = True
+            self._finished.clear()
+
+    def play_blocks(self, blocks, timeline_offset: int = 0):
+        """ブロックのイテレータ（synthesize_stream など）を届いた順に再生する（すぐに戻る）"""
+        self._ensure_stream()
+        with self._lock:
+            self._set_source(StreamSource(blocks, timeline_offset))
+            self.clock.reset(timeline_offset)
+            self.is_playing = True
+            self._finished.clear()
+
+    def stop(self):
+        """再生を止める（デバイスは開いたまま）"""
+        with self._lock:
+            self._set_source(None)
+            self.is_playing = False
+        self._finished.set()
+
+    def seek(self, timeline_sample: int) -> bool:
+        """再生位置をタイムライン上の timeline_sample に移す（合成済みの配列を再生している時だけ）"""
+        with self._lock:
+            source = self._source
+            if source is None or not source.seekable:
+                return False
+            source.seek(timeline_sample)
+            self.clock.reset(source.timeline_offset + source.position)
+            self._generation += 1
+            self._source_done = False
+            self._primed = False
+            self._discard_until = self.ring.write_count
+            return True
+
+    def set_loop(self, start_sample: int, end_sample: int, fade_samples: int = LOOP_FADE_SAMPLES) -> bool:
+        """合成済みの配列のタイムライン上の区間 [start_sample, end_sample) を継ぎ目なしでループ再生する"""
+        with self._lock:
+            source = self._source
+            if source is None or not source.seekable or end_sample <= start_sample:
+                return False
+            return source.set_loop(start_sample, end_sample, fade_samples)
+
+    def clear_loop(self):
+        """ループを解除する（そのまま配列の最後まで再生する）"""
+        with self._lock:
+            if self._source is not None and self._source.seekable:
+                self._source.clear_loop()
+
+    def replace_buffer(self, audio: np.ndarray, timeline_offset: int = 0, copy: bool = True) -> bool:
+        """
+        再生を止めずに配列を差し替える（ループ範囲の変更や編集の反映用）
+        リングバッファに送り済みの音はそのまま鳴らし、その続きから新しい配列を読む
+        """
+        audio = np.array(audio, dtype=np.float32, copy=True) if copy else np.asarray(audio, dtype=np.float32)
+        with self._lock:
+            source = self._source
+            if source is None or not source.seekable:
+                return False
+            source.replace_audio(audio, timeline_offset)
+            if self.is_playing:
+                self._source_done = False # 新しい配列の方が長ければ続きを鳴らす
+            return True
+
+    def play_one_shot(self, audio: np.ndarray, gain: float = 1.0, tag=None):
+        """
+        短い音を今の再生に重ねて一度だけ鳴らす（プレビュー音用、すぐに戻る）
+        リングバッファを通さないので、鳴り始めるまでの遅れはデバイスのバッファ1つ分になる
+        audio は書き換えない配列を渡すこと（コピーしない）
+        """
+        self._ensure_stream()
+        self._one_shot_commands.append(("play", _OneShot(np.asarray(audio, dtype=np.float32), gain, tag)))
+
+    def release_one_shot(self, tag):
+        """tag を付けて鳴らしたワンショットを短いフェードで止める（MIDI のノートオフ用）"""
+        self._one_shot_commands.append(("release", tag))
+
+    def clear_one_shots(self):
+        self._one_shot_commands.append(("clear", None))
+
+    def wait(self, timeout: float = None) -> bool:
+        """再生が終わるまで待つ"""
+        return self._finished.wait(timeout)
+
+    def close(self):
+        self.stop()
+        self._closed = True
+        if self._feeder is not None:
+            self._feeder.join(timeout=0.5)
+        self._close_retired()
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._stream = None
+        if self._pa is not None:
+            self._pa.terminate()
+            self._pa = None
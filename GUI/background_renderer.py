@@ -0,0 +1,80 @@
+# background_renderer.py
+# 編集が落ち着いたタイミングで、変更されたフレーズを裏で先に合成しておく（再生ボタンを押した時にはキャッシュ済みにする）
+
+import copy
+import threading
+
+from PySide6.QtCore import QObject, QTimer, Signal, Slot
+
+from render_cache import split_into_phrases, phrase_key
+
+
+class SpeculativeRenderer(QObject):
+    """
+    notes_changed_signal / pitch_data_changed を受けてデバウンスし、
+    キャッシュに無いフレーズだけをバックグラウンドスレッドで合成する。
+    新しい編集が来たら実行中の先読みは打ち切る（フレーズの区切りで止まる）。
+    """
+    # 先読みが最後まで終わった時に、合成したフレーズ数を通知する
+    prerender_finished = Signal(int)
+
+    def __init__(self, phrase_renderer, get_project, focus_time=None, debounce_ms: int = 400, parent=None):
+        super().__init__(parent)
+        self.phrase_renderer = phrase_renderer
+        self.get_project = get_project   # () -> (notes, pitch_events)
+        self.focus_time = focus_time     # () -> 秒。ここに近いフレーズから合成する
+        self.enabled = True
+        self._cancel = threading.Event()
+        self._thread = None
+
+        self._debounce_timer = QTimer(self)
+        self._debounce_timer.setSingleShot(True)
+        self._debounce_timer.setInterval(debounce_ms)
+        self._debounce_timer.timeout.connect(self._start)
+
+    @Slot()
+    def schedule(self, *args):
+        """編集のたびに呼ぶ。実行中の先読みを打ち切り、しばらく編集が無ければ先読みを始める"""
+        self._cancel.set()
+        if self.enabled:
+            self._debounce_timer.start()
+
+    def cancel(self):
+        self._debounce_timer.stop()
+        self._cancel.set()
+
+    @Slot()
+    def _start(self):
+        notes, pitch_events = self.get_project()
+        if not notes: return
+
+        # GUIスレッドがノートを書き換えても影響しないよう、スナップショットを取る
+        notes = [copy.copy(n) for n in notes]
+        pitch_events = [copy.copy(p) for p in pitch_events]
+        focus = self.focus_time() if self.focus_time else 0.0
+
+        cancel = threading.Event()
+        self._cancel = cancel
+        self._thread = threading.Thread(target=self._run, args=(notes, pitch_events, focus, cancel), daemon=True)
+        self._thread.start()
+
+    def _run(self, notes, pitch_events, focus, cancel):
+        renderer = self.phrase_renderer
+        engine = renderer.engine
+        phrases = split_into_phrases(notes, pitch_events)
+        # カーソルに近いフレーズ（次に再生されやすい所）から合成する
+        phrases.sort(key=lambda ph: 0.0 if ph.start_time <= focus <= ph.end_time else min(abs(ph.start_time - focus), abs(ph.end_time - focus)))
+
+        rendered = 0
+        for phrase in phrases:
+            if cancel.is_set(): return
+            key = phrase_key(phrase, engine.active_character_id, engine.sample_rate)
+            if key in renderer.cache: continue
+            try:
+                renderer.render_phrase(phrase)
+                rendered += 1
+            except Exception as e:
+                print(f"先読み合成エラー: {e}")
+                return
+        if not cancel.is_set():
+            self.prerender_finished.emit(rendered)
@@ -0,0 +1,103 @@
+# bench_synthesis.py
+# 合成バックエンドのスループット計測
+# 使い方: python bench_synthesis.py [--notes 400] [--repeat 3] [--resample]
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from data_models import NoteEvent, PitchEvent
+
+
+def make_song(n_notes: int, seed: int = 0):
+    """計測用のノート列とピッチベンドを作る（0.25〜0.5秒の音符を並べる）"""
+    rng = random.Random(seed)
+    notes, pitch_events = [], []
+    t = 0.0
+    for _ in range(n_notes):
+        duration = rng.choice([0.25, 0.375, 0.5])
+        notes.append(NoteEvent(rng.randint(55, 76), t, duration, 100, "あ"))
+        pitch_events.append(PitchEvent(t + duration / 2, rng.randint(-2048, 2048)))
+        t += duration
+    return notes, pitch_events
+
+
+def make_voicebank(folder: str, sample_rate: int = 44100, seconds: float = 0.5):
+    """計測用の音源（倍音の多いのこぎり波の「あ」）を書き出す"""
+    from audio_dsp import write_wav, note_to_hz
+    cycles = np.arange(int(seconds * sample_rate)) * note_to_hz(60) / sample_rate
+    write_wav(os.path.join(folder, "あ.wav"), 0.5 * (2.0 * (cycles % 1.0) - 1.0), sample_rate)
+
+
+def bench_backend(backend: str, notes, pitch_events, repeat: int, sample_rate: int = 44100,
+                  audio_dir: str = None, resample_quality: str = None):
+    from vo_se_engine import VO_SE_Engine
+    try:
+        engine = VO_SE_Engine(sample_rate=sample_rate, backend=backend, resample_quality=resample_quality)
+    except RuntimeError:
+        print(f"{backend:>6}: 利用できません")
+        return None
+    if audio_dir:
+        engine.load_character("bench", audio_dir)
+
+    best = None
+    audio_size = 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        audio = engine.synthesize(notes, pitch_events)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+        audio_size = audio.size
+
+    rate = audio_size / best if best > 0 else float('inf')
+    label = f"{backend}/{resample_quality}" if resample_quality else backend
+    print(f"{label:>16}: {best * 1000:8.1f} ms  {rate / 1e6:8.2f} Msamples/s  (x{rate / sample_rate:.0f} realtime)")
+    return rate
+
+
+def bench_resampler(quality: str, repeat: int, seconds: float = 5.0, speed: float = 1.5, sample_rate: int = 44100):
+    """リサンプラー単体の速さ（出力サンプル数 / 秒）"""
+    from resampler import read_at
+    src = np.random.default_rng(0).standard_normal(int(seconds * sample_rate * speed) + 1).astype(np.float32)
+    positions = np.arange(int(seconds * sample_rate)) * speed
+    best = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        read_at(src, positions, quality, speed=speed)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    rate = positions.size / best if best > 0 else float('inf')
+    print(f"{quality:>16}: {best * 1000:8.1f} ms  {rate / 1e6:8.2f} Msamples/s  (x{rate / sample_rate:.0f} realtime)")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VO-SE 合成バックエンドのスループット計測")
+    parser.add_argument("--notes", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--resample", action="store_true", help="リサンプリング品質ごとの速さも計測する")
+    args = parser.parse_args()
+
+    notes, pitch_events = make_song(args.notes)
+    print(f"ノート数: {len(notes)}, 曲の長さ: {notes[-1].start_time + notes[-1].duration:.1f} 秒")
+    for backend in ("numpy", "c"):
+        bench_backend(backend, notes, pitch_events, args.repeat)
+
+    if args.resample:
+        from resampler import QUALITY_TIERS
+        print("\nリサンプラー単体 (1.5 倍速で読み出し):")
+        for quality in QUALITY_TIERS:
+            bench_resampler(quality, args.repeat)
+        print("\nNumPy バックエンド + 音源サンプル:")
+        with tempfile.TemporaryDirectory() as audio_dir:
+            make_voicebank(audio_dir)
+            for quality in QUALITY_TIERS:
+                bench_backend("numpy", notes, pitch_events, args.repeat, audio_dir=audio_dir, resample_quality=quality)
+
+
+if __name__ == "__main__":
+    main()
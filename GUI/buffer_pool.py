@@ -0,0 +1,56 @@
+# buffer_pool.py
+
+import threading
+import numpy as np
+
+
+class OutputBufferPool:
+    """
+    合成結果を書き込む float32 バッファの再利用プール。
+    プレビューのように同じくらいの長さのレンダリングを繰り返す場合、
+    一度確保したバッファを使い回すことで定常状態ではメモリ確保が発生しなくなる。
+    """
+    def __init__(self, max_buffers: int = 4, min_capacity: int = 44100):
+        self.max_buffers = max_buffers
+        self.min_capacity = min_capacity
+        self._free: list[np.ndarray] = []
+        self._lock = threading.Lock()
+        self.allocations = 0 # 新規確保の回数（定常状態で増えないことの確認用）
+
+    @staticmethod
+    def _round_capacity(n: int) -> int:
+        # 少し長さが変わっただけで再確保しないよう、2のべき乗に切り上げる
+        return 1 << max(0, int(n - 1).bit_length())
+
+    def acquire(self, n_samples: int) -> np.ndarray:
+        """n_samples 以上の容量を持つバッファを返す（中身は未初期化）"""
+        with self._lock:
+            # 条件を満たす中で最小のバッファを選ぶ
+            best_index = None
+            for i, buf in enumerate(self._free):
+                if buf.size >= n_samples and (best_index is None or buf.size < self._free[best_index].size):
+                    best_index = i
+            if best_index is not None:
+                return self._free.pop(best_index)
+
+            self.allocations += 1
+        capacity = self._round_capacity(max(n_samples, self.min_capacity))
+        return np.empty(capacity, dtype=np.float32)
+
+    def release(self, buffer: np.ndarray):
+        """acquire したバッファ（またはそのスライス）をプールへ戻す"""
+        # スライスを渡された場合は元のバッファを戻す
+        while buffer.base is not None and isinstance(buffer.base, np.ndarray):
+            buffer = buffer.base
+        with self._lock:
+            if any(b is buffer for b in self._free):
+                return
+            self._free.append(buffer)
+            # 上限を超えたら小さいものから捨てる
+            if len(self._free) > self.max_buffers:
+                self._free.sort(key=lambda b: b.size)
+                self._free.pop(0)
+
+    def clear(self):
+        with self._lock:
+            self._free = []
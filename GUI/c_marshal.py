@@ -0,0 +1,98 @@
+# c_marshal.py
+# audio_types.h の構造体と同じメモリ配置を持つ NumPy 構造化 dtype を使って、
+# ノート・ピッチイベントをまとめて C 用の配列に詰めるためのモジュール
+
+import ctypes
+import numpy as np
+
+MAX_LYRIC_LENGTH = 256 # audio_types.h の MAX_LYRIC_LENGTH と合わせる
+
+# typedef struct { float time; int value; } CPitchEvent;
+PITCH_EVENT_DTYPE = np.dtype({
+    "names": ["time", "value"],
+    "formats": ["<f4", "<i4"],
+}, align=True)
+
+# typedef struct { int note_number; float start_time; float duration; int velocity;
+#                  char lyrics[256]; char** phonemes; int phoneme_count; } CNoteEvent;
+NOTE_EVENT_DTYPE = np.dtype({
+    "names": ["note_number", "start_time", "duration", "velocity", "lyrics", "phonemes", "phoneme_count"],
+    "formats": ["<i4", "<f4", "<f4", "<i4", f"S{MAX_LYRIC_LENGTH}", np.uintp, "<i4"],
+}, align=True)
+
+
+def check_layout(dtype: np.dtype, c_struct) -> None:
+    """
+    dtype と ctypes 構造体のサイズ・各フィールドのオフセットが一致しているか確認する
+    （ずれていると C 側が壊れた値を読むので、tests/test_c_marshal.py で検出する）
+    """
+    if dtype.itemsize != ctypes.sizeof(c_struct):
+        raise RuntimeError(f"{c_struct.__name__}: サイズ不一致 dtype={dtype.itemsize} ctypes={ctypes.sizeof(c_struct)}")
+
+    c_names = [f[0] for f in c_struct._fields_]
+    if list(dtype.names) != c_names:
+        raise RuntimeError(f"{c_struct.__name__}: フィールド不一致 dtype={dtype.names} ctypes={c_names}")
+
+    for name in c_names:
+        field_dtype, offset = dtype.fields[name][:2]
+        c_field = getattr(c_struct, name)
+        if offset != c_field.offset or field_dtype.itemsize != c_field.size:
+            raise RuntimeError(
+                f"{c_struct.__name__}.{name}: 配置不一致 "
+                f"dtype=(offset {offset}, size {field_dtype.itemsize}) ctypes=(offset {c_field.offset}, size {c_field.size})"
+            )
+
+
+def pitch_events_to_array(py_pitches) -> np.ndarray:
+    """
+    ピッチイベントを PITCH_EVENT_DTYPE の配列に変換する
+    既に PITCH_EVENT_DTYPE の配列が渡された場合はそのまま使う（変換コストなし）
+    """
+    if isinstance(py_pitches, np.ndarray) and py_pitches.dtype == PITCH_EVENT_DTYPE:
+        return np.ascontiguousarray(py_pitches)
+
+    count = len(py_pitches)
+    arr = np.empty(count, dtype=PITCH_EVENT_DTYPE)
+    # 1要素ずつ ctypes オブジェクトを作らず、列ごとにまとめて詰める
+    arr["time"] = np.fromiter((p.time for p in py_pitches), dtype=np.float32, count=count)
+    arr["value"] = np.fromiter((p.value for p in py_pitches), dtype=np.int32, count=count)
+    return arr
+
+
+def pitch_events_from_columns(times, values) -> np.ndarray:
+    """時刻と値の配列から直接 PITCH_EVENT_DTYPE の配列を作る"""
+    times = np.asarray(times, dtype=np.float32)
+    arr = np.empty(times.size, dtype=PITCH_EVENT_DTYPE)
+    arr["time"] = times
+    arr["value"] = np.asarray(values, dtype=np.int32)
+    return arr
+
+
+def notes_to_array(py_notes, keep_alive: list) -> np.ndarray:
+    """
+    ノートを NOTE_EVENT_DTYPE の配列に変換する
+    音素リスト (char**) は C 側実行中に解放されないよう keep_alive に保持する
+    """
+    count = len(py_notes)
+    arr = np.zeros(count, dtype=NOTE_EVENT_DTYPE)
+    arr["note_number"] = np.fromiter((n.note_number for n in py_notes), dtype=np.int32, count=count)
+    arr["start_time"] = np.fromiter((n.start_time for n in py_notes), dtype=np.float32, count=count)
+    arr["duration"] = np.fromiter((n.duration for n in py_notes), dtype=np.float32, count=count)
+    arr["velocity"] = np.fromiter((n.velocity for n in py_notes), dtype=np.int32, count=count)
+    # 終端の '\0' の分を残して切り詰める
+    arr["lyrics"] = [n.lyric.encode('utf-8')[:MAX_LYRIC_LENGTH - 1] for n in py_notes]
+
+    # 音素リストを持つノートだけ char** を構築する
+    for i, n in enumerate(py_notes):
+        if n.phonemes:
+            ph_bytes = [p.encode('utf-8') for p in n.phonemes]
+            ph_array = (ctypes.c_char_p * len(ph_bytes))(*ph_bytes)
+            keep_alive.append(ph_array)
+            arr["phonemes"][i] = ctypes.addressof(ph_array)
+            arr["phoneme_count"][i] = len(ph_bytes)
+    return arr
+
+
+def as_struct_pointer(arr: np.ndarray, c_struct):
+    """構造化配列の先頭を C 構造体へのポインタとして渡す（コピーなし）"""
+    return arr.ctypes.data_as(ctypes.POINTER(c_struct))
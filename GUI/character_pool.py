@@ -0,0 +1,87 @@
+# character_pool.py
+# 最近使ったキャラクターの音源を N 人分メモリに残しておき、キャラクター切り替えを即座に終わらせるためのプール
+
+import os
+import threading
+from collections import OrderedDict
+
+from voicebank_store import VoicebankStore
+
+# 先読みの時にあらかじめ読み込んでおく音素（よく使う母音）
+PREFETCH_SAMPLES = ["あ", "い", "う", "え", "お", "a", "i", "u", "e", "o"]
+
+
+class CharacterPool:
+    """
+    キャラクターID → VoicebankStore の LRU
+    capacity 人を超えたら、最も長く使っていないキャラクターの音源を閉じる
+    """
+    def __init__(self, capacity: int = 4, voicebank_bytes: int = 64 * 1024 * 1024):
+        self.capacity = capacity
+        self.voicebank_bytes = voicebank_bytes
+        self._stores: OrderedDict[str, VoicebankStore] = OrderedDict()
+        self._loading: dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._prefetch_thread = None
+
+    def is_resident(self, char_id: str) -> bool:
+        with self._lock:
+            return char_id in self._stores
+
+    def get(self, char_id: str, audio_dir: str) -> VoicebankStore:
+        """音源を返す。常駐していればすぐに返し、先読み中ならその完了を待つ"""
+        while True:
+            with self._lock:
+                store = self._stores.get(char_id)
+                if store is not None:
+                    self._stores.move_to_end(char_id)
+                    return store
+                loading = self._loading.get(char_id)
+                if loading is None:
+                    loading = self._loading[char_id] = threading.Event()
+                    break
+            # 別スレッドが読み込み中なので終わるのを待ってから取り直す
+            loading.wait()
+
+        try:
+            store = self._load(audio_dir)
+            with self._lock:
+                self._stores[char_id] = store
+                self._evict()
+            return store
+        finally:
+            with self._lock:
+                self._loading.pop(char_id).set()
+
+    def _load(self, audio_dir: str) -> VoicebankStore:
+        store = VoicebankStore(audio_dir, self.voicebank_bytes)
+        for name in PREFETCH_SAMPLES:
+            if name in store:
+                store.get(name)
+        return store
+
+    def _evict(self):
+        while len(self._stores) > self.capacity:
+            _, store = self._stores.popitem(last=False)
+            store.close()
+
+    def prefetch(self, characters: list[tuple[str, str]]):
+        """(キャラクターID, 音源フォルダ) のリストをバックグラウンドで順に読み込む"""
+        targets = [(cid, d) for cid, d in characters[:self.capacity] if d and os.path.isdir(d)]
+        if not targets: return
+
+        def worker():
+            for char_id, audio_dir in targets:
+                try:
+                    self.get(char_id, audio_dir)
+                except Exception as e:
+                    print(f"音源の先読みに失敗しました: {char_id} ({e})")
+
+        self._prefetch_thread = threading.Thread(target=worker, daemon=True)
+        self._prefetch_thread.start()
+
+    def close(self):
+        with self._lock:
+            for store in self._stores.values():
+                store.close()
+            self._stores.clear()
@@ -106,7 +106,7 @@ class CharacterInfo:
     audio_dir: str    # "audio_data/aoi" などのパス
 
 
-@dataclasses.dataclass
+@dataclass
 class PhonemeEvent:
     """
     読み上げ（Talk）の1音素を管理するクラス
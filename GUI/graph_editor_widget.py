@@ -1,7 +1,9 @@
 from PySide6.QtWidgets import QWidget
-from PySide6.QtCore import Qt, Signal, Slot, QSize, QRect, QPoint
-from PySide6.QtGui import QPainter, QColor, QBrush, QPen, QPaintEvent, QMouseEvent
+from PySide6.QtCore import Qt, Signal, Slot, QSize, QRect, QPoint, QPointF
+from PySide6.QtGui import QPainter, QColor, QBrush, QPen, QPaintEvent, QMouseEvent, QPolygonF
+import numpy as np
 from data_models import PitchEvent # PitchEventをインポート
+from pitch_curve import semitones_to_value
 
 class GraphEditorWidget(QWidget):
     # ピッチデータが変更されたことをMainWindowに通知するシグナル
@@ -18,6 +20,10 @@ class GraphEditorWidget(QWidget):
         self.drag_start_pos = None
         self.drag_start_value = None
         self.tempo = 120.0 # MainWindowから同期させる必要がある
+        self.pitch_curves = None # 合成エンジンと共有する PitchCurveCache
+        self.get_notes = None    # () -> ノートのリスト。実際に歌われるピッチ曲線を重ねて描くのに使う
+        self._pitch_curve_list = [] # 描画用のピッチ曲線。ノートやピッチが変わった時だけ作り直す（paintEvent では作らない）
+        self.playback_clock = None # 再生中はこの PlaybackClock からカーソル位置を読む
 
     @Slot(int)
     def set_scroll_x_offset(self, offset_pixels: int):
@@ -34,10 +40,33 @@ class GraphEditorWidget(QWidget):
         self._current_playback_time = time_in_seconds
         self.update()
 
+    def set_playback_clock(self, clock):
+        """再生中のカーソル位置を読む PlaybackClock を設定する（None で解除）"""
+        self.playback_clock = clock
+        self.update()
+
     def set_pitch_events(self, events: list[PitchEvent]):
         self.pitch_events = events
+        self.refresh_pitch_curve()
+
+    def set_pitch_curve_source(self, pitch_curves, get_notes):
+        """合成と同じピッチ曲線を表示するためのキャッシュとノートの取得元を設定する"""
+        self.pitch_curves = pitch_curves
+        self.get_notes = get_notes
+        self.refresh_pitch_curve()
+
+    @Slot()
+    def refresh_pitch_curve(self):
+        """ノートが編集された時に呼ぶ。表示するピッチ曲線をここで作り直す"""
+        self._pitch_curve_list = self._build_pitch_curves()
         self.update()
 
+    def _build_pitch_curves(self) -> list:
+        if self.pitch_curves is None or self.get_notes is None: return []
+        notes = self.get_notes()
+        if not notes: return []
+        return self.pitch_curves.curves_for_song(notes, self.pitch_events)
+
     def seconds_to_beats(self, seconds: float, tempo=120.0) -> float:
         seconds_per_beat = 60.0 / tempo
         return seconds / seconds_per_beat
@@ -87,7 +116,7 @@ class GraphEditorWidget(QWidget):
             self.editing_point_index = None
             self.drag_start_pos = None
             self.drag_start_value = None
-            self.update()
+            self.refresh_pitch_curve()
 
     def mouseDoubleClickEvent(self, event: QMouseEvent):
         if event.button() == Qt.LeftButton:
@@ -101,7 +130,7 @@ class GraphEditorWidget(QWidget):
                     self.pitch_events.pop(i)
                     self.pitch_events.sort(key=lambda p: p.time)
                     self.pitch_data_changed.emit(self.pitch_events)
-                    self.update()
+                    self.refresh_pitch_curve()
                     return # 削除したら新規作成は行わない
 
             # 新規ポイント作成
@@ -122,7 +151,7 @@ class GraphEditorWidget(QWidget):
             self.pitch_events.append(new_pitch_event)
             self.pitch_events.sort(key=lambda p: p.time)
             self.pitch_data_changed.emit(self.pitch_events)
-            self.update()
+            self.refresh_pitch_curve()
 
     # ヘルパー関数: ピッチ値をY座標にマッピング
     def value_to_y(self, value: int, widget_height: int) -> float:
@@ -176,9 +205,26 @@ class GraphEditorWidget(QWidget):
                 painter.setPen(QPen(Qt.black, 1))
                 painter.drawEllipse(int(x)-4, int(y)-4, 8, 8)
 
+        # 合成に使われるピッチ曲線（ノートのある区間だけ）を重ねて描画
+        self._draw_pitch_curves(painter, widget_height)
+
         # 再生カーソルを描画
-        playback_beats = self.seconds_to_beats(self._current_playback_time)
+        cursor_time = self.playback_clock.seconds() if self.playback_clock is not None else self._current_playback_time
+        playback_beats = self.seconds_to_beats(cursor_time)
         cursor_x = (playback_beats * self.pixels_per_beat) - self.scroll_x_offset
         if cursor_x >= 0 and cursor_x <= self.width():
             painter.setPen(QPen(QColor(255, 50, 50), 2))
             painter.drawLine(int(cursor_x), 0, int(cursor_x), self.height())
+
+    def _draw_pitch_curves(self, painter: QPainter, widget_height: int):
+        if not self._pitch_curve_list: return
+
+        painter.setPen(QPen(QColor(255, 170, 0), 1))
+        width = self.width()
+        for curve in self._pitch_curve_list:
+            xs = self.seconds_to_beats(curve.times, self.tempo) * self.pixels_per_beat - self.scroll_x_offset
+            visible = np.nonzero((xs >= -1) & (xs <= width + 1))[0]
+            if visible.size < 2: continue
+            lo, hi = visible[0], visible[-1] + 1
+            ys = self.value_to_y(semitones_to_value(curve.bend[lo:hi]), widget_height)
+            painter.drawPolyline(QPolygonF([QPointF(x, y) for x, y in zip(xs[lo:hi].tolist(), ys.tolist())]))
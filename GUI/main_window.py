@@ -2,7 +2,6 @@
 import sys
 import time
 import json
-from janome.tokenizer import Tokenizer
 import mido 
 
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QMenu, QVBoxLayout, 
@@ -11,15 +10,17 @@ from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QMenu, QVBoxL
 from PySide6.QtGui import QAction, QKeySequence, QKeyEvent
 from PySide6.QtCore import Slot, Qt, QTimer, Signal
 
-from GUI.vo_se_engine import VO_SE_Engine
-
 import numpy as np 
 
-from .timeline_widget import TimelineWidget
-from .keyboard_sidebar_widget import KeyboardSidebarWidget
-from .midi_manager import load_midi_file, MidiInputManager, midi_signals
-from .data_models import NoteEvent, PitchEvent
-from .graph_editor_widget import GraphEditorWidget
+from timeline_widget import TimelineWidget
+from keyboard_sidebar_widget import KeyboardSidebarWidget
+from midi_manager import load_midi_file, MidiInputManager, midi_signals
+from data_models import NoteEvent, PitchEvent
+from graph_editor_widget import GraphEditorWidget
+from render_cache import PhraseRenderer
+from background_renderer import SpeculativeRenderer
+
+LOOP_PREROLL_SECONDS = 0.05 # ループ範囲の手前に余分に合成しておく長さ（継ぎ目のクロスフェード用）
 
 
 class MainWindow(QMainWindow):
@@ -27,8 +28,13 @@ class MainWindow(QMainWindow):
     アプリケーションのメインウィンドウクラス。
     UIの構築、イベント接続、全体的なアプリケーションロジックを管理する。
     """
-    
-    def __init__(self, parent=None):
+    # バックグラウンドでのキャラクター読み込み完了通知 (キャラクターID, 成功したか)
+    character_loaded_signal = Signal(str, bool)
+    # Talk の読み上げで文が鳴り始めた通知 (文の番号, 文, 音素イベント, 読み上げ先頭からの開始秒)
+    talk_sentence_signal = Signal(int, str, object, float)
+
+    def __init__(self, parent=None, engine=None):
+        """engine を渡すとそれを使う（app_main が起動中に別スレッドで読み込んだもの）。省略時はここで作る"""
         super().__init__(parent)
         self.setWindowTitle("VO-SE Pro")
         self.setGeometry(100, 100, 700, 400)
@@ -52,7 +58,12 @@ class MainWindow(QMainWindow):
 
       
         
-        self.vo_se_engine = VO_SE_Engine()
+        if engine is None:
+            from vo_se_engine import VO_SE_Engine # DLL の読み込みを伴うので、必要な時だけ
+            engine = VO_SE_Engine(previews=True)
+        self.vo_se_engine = engine
+        self.phrase_renderer = PhraseRenderer(self.vo_se_engine) # フレーズ単位の合成キャッシュ
+        self.talk_pipeline = None # Talk の解析・合成・再生パイプライン（最初の読み上げで作る）
         self.pitch_data = [] # self.pitch_data をここで初期化
 
         # --- UIコンポーネントの初期化 ---
@@ -92,13 +103,19 @@ class MainWindow(QMainWindow):
         self.is_looping = False
         self.is_looping_selection = False
         self.current_playback_time = 0.0
-        self.start_time_real = 0.0
         self.playing_notes = {}
 
         self.playback_timer = QTimer(self)
         self.playback_timer.timeout.connect(self.update_playback_cursor)
         self.playback_timer.setInterval(10)
 
+        # ループ再生中の編集・範囲変更は、少し落ち着いてから足りない部分だけ合成して差し替える
+        self.loop_refresh_timer = QTimer(self)
+        self.loop_refresh_timer.setSingleShot(True)
+        self.loop_refresh_timer.setInterval(150)
+        self.loop_refresh_timer.timeout.connect(self.refresh_loop_region)
+        self.is_loop_playing = False
+
         # --- レイアウト構築 ---
         timeline_area_layout = QHBoxLayout()
         timeline_area_layout.addWidget(self.keyboard_sidebar)
@@ -153,7 +170,14 @@ class MainWindow(QMainWindow):
         container.setLayout(main_layout)
         self.setCentralWidget(container)
         
-        self.vo_se_engine.set_active_character("char_001")
+        if self.vo_se_engine.active_character_id is None: # 起動時に読み込み済みなら読み込み直さない
+            char_id = self.vo_se_engine.default_character_id("char_001")
+            if char_id is not None:
+                self.vo_se_engine.set_active_character(char_id)
+        # 選択欄を読み込んだキャラクターに合わせる（切り替え処理は走らせない）
+        self.character_selector.blockSignals(True)
+        self.character_selector.setCurrentIndex(self.character_selector.findData(self.vo_se_engine.active_character_id))
+        self.character_selector.blockSignals(False)
 
 
         # --- アクション、メニュー、シグナルの接続 ---
@@ -169,6 +193,8 @@ class MainWindow(QMainWindow):
         self.loop_button.clicked.connect(self.on_loop_button_toggled)
         midi_signals.midi_event_signal.connect(self.update_gui_with_midi)
         midi_signals.midi_event_signal.connect(self.timeline_widget.highlight_note)
+        midi_signals.midi_event_signal.connect(self.on_midi_monitor)
+        self.timeline_widget.note_preview_requested.connect(self.vo_se_engine.preview_note)
         midi_signals.midi_event_record_signal.connect(self.timeline_widget.record_midi_event)
         
         self.h_scrollbar.valueChanged.connect(self.timeline_widget.set_scroll_x_offset)
@@ -181,9 +207,26 @@ class MainWindow(QMainWindow):
         self.timeline_widget.zoom_changed_signal.connect(self.update_scrollbar_range)
         self.timeline_widget.vertical_zoom_changed_signal.connect(self.update_scrollbar_v_range)
         self.timeline_widget.notes_changed_signal.connect(self.update_scrollbar_range)
+        self.timeline_widget.notes_changed_signal.connect(self.phrase_renderer.mark_dirty)
         
         self.graph_editor_widget.pitch_data_changed.connect(self.on_pitch_data_updated)
 
+        # 合成と同じピッチ曲線をグラフエディタに重ねて表示する
+        self.graph_editor_widget.set_pitch_curve_source(self.vo_se_engine.pitch_curves, lambda: self.timeline_widget.notes_list)
+        self.timeline_widget.notes_changed_signal.connect(self.graph_editor_widget.refresh_pitch_curve)
+
+        # 編集が落ち着いたら、変更されたフレーズを裏で先に合成しておく
+        self.speculative_renderer = SpeculativeRenderer(
+            self.phrase_renderer,
+            lambda: (self.timeline_widget.notes_list, self.pitch_data),
+            focus_time=lambda: self.current_playback_time,
+            parent=self
+        )
+        self.timeline_widget.notes_changed_signal.connect(self.speculative_renderer.schedule)
+        self.graph_editor_widget.pitch_data_changed.connect(self.speculative_renderer.schedule)
+        self.timeline_widget.notes_changed_signal.connect(self.loop_refresh_timer.start)
+        self.graph_editor_widget.pitch_data_changed.connect(self.loop_refresh_timer.start)
+
 
         # --- MIDI入力マネージャーの起動 (MIDI接続)---
         available_ports = MidiInputManager.get_available_ports()
@@ -206,6 +249,11 @@ class MainWindow(QMainWindow):
         
         self.timeline_widget.set_current_time(self.current_playback_time)
 
+        # 起動後、名簿のキャラクターの音源をバックグラウンドで先読みしておく
+        self.character_loaded_signal.connect(self.on_character_loaded)
+        self.talk_sentence_signal.connect(self.on_talk_sentence)
+        QTimer.singleShot(0, self.vo_se_engine.prefetch_characters)
+
   
 
 
@@ -234,20 +282,44 @@ class MainWindow(QMainWindow):
         edit_menu.addAction(self.paste_action)
 
 
-     def on_generate_talk(self):
-        text = self.text_input.text()
+    @Slot()
+    def on_generate_talk(self):
+        """
+        入力した文章を読み上げる
+        文ごとに 解析 → 合成 → 再生 を重ねて進めるので、長い文章でも最初の1文が合成でき次第鳴り始める
+        """
+        text = self.text_input.text().strip()
         if not text: return
-        
-        # 1. 解析の実行
-        events = self.analyzer.analyze_to_events(text)
-        
-        # 2. 既存のTimelineWidgetへ反映
-        # 既存の set_notes メソッドを呼び出し
-        self.timeline_widget.set_notes(events)
+        if self.vo_se_engine.lib_path is None:
+            self.status_label.setText("エラー: Talk の合成には C エンジンが必要です。")
+            return
+
+        if self.talk_pipeline is None:
+            # pyopenjtalk の読み込みは重いので、最初に読み上げる時まで遅らせる
+            from text_analyzer import TextAnalyzer
+            from talk_pipeline import TalkPipeline
+            self.talk_pipeline = TalkPipeline(TextAnalyzer(), self.vo_se_engine.render_talk_sentence, self.vo_se_engine.sample_rate)
+            # 再生スレッドから呼ばれるので、シグナル経由で GUI スレッドに渡す
+            self.talk_pipeline.on_sentence = lambda index, sentence, events, start: self.talk_sentence_signal.emit(index, sentence, events, start)
+
+        if self.is_playing:
+            self.on_play_pause_toggled() # 歌の再生中なら止めてから読み上げる
+        self.timeline_widget.set_notes([]) # 音素は文が鳴り始めるたびに on_talk_sentence で並べる
+        self.vo_se_engine.play_stream(self.talk_pipeline.stream(text))
+        self.status_label.setText("VO-SE Talk: 解析・合成しながら読み上げています...")
+
+    @Slot(int, str, object, float)
+    def on_talk_sentence(self, index: int, sentence: str, events: list, start: float):
+        """文が鳴り始めたら、その文の音素を読み上げ先頭からの位置（start 秒）にずらしてタイムラインに並べる"""
+        self.status_label.setText(f"VO-SE Talk: {index + 1}文目「{sentence}」")
+        phonemes = [
+            NoteEvent(int(e["pitch_start"]), start + e["start_time"], e["duration"], 100, e["lyric"])
+            for e in events
+        ]
+        # 表示のためだけに並べる。notes_changed_signal を出すと歌の先読み合成が始まり、Talk の合成と合成ロックを取り合う
+        self.timeline_widget.notes_list.extend(phonemes)
         self.timeline_widget.update()
-        
-        print(f"VO-SE Talk: {len(events)}個の音素を展開しました。")
-  
+        print(f"VO-SE Talk: {len(phonemes)}個の音素を展開しました。")
 
     @Slot()
     def on_play_pause_toggled(self):
@@ -257,10 +329,14 @@ class MainWindow(QMainWindow):
             self.is_playing = False
             self.playback_timer.stop()
             
-            # TODO: VO-SE Engineで再生中の音声があれば停止させる仕組みが必要
-            # 前回のバージョンの停止ロジックを統合
-            if self.vo_se_engine and hasattr(self.vo_se_engine, 'stream') and self.vo_se_engine.stream.is_active():
-                 self.vo_se_engine.stream.stop_stream()
+            # ストリーミング再生とバックグラウンド合成を止める
+            if self.vo_se_engine:
+                self.current_playback_time = self.vo_se_engine.current_time_playback
+                self.vo_se_engine.stop_playback()
+            # カーソルは止めた位置に残す
+            for widget in (self.timeline_widget, self.graph_editor_widget):
+                widget.set_playback_clock(None)
+                widget.set_current_time(self.current_playback_time)
             
             self.play_button.setText("再生/停止")
             self.status_label.setText("再生停止しました。")
@@ -282,26 +358,30 @@ class MainWindow(QMainWindow):
             pitch = self.pitch_data
             
             try:
-                self.status_label.setText("音声生成中...お待ちください。")
-                QApplication.processEvents()
-
-                audio_track = self.vo_se_engine.synthesize_track(notes, pitch, start_time, end_time)
-                
-                # エンジンのストリームが停止中であれば再開する (前回のバージョンのロジック)
-                if hasattr(self.vo_se_engine, 'stream') and not self.vo_se_engine.stream.is_active():
-                    self.vo_se_engine.stream.start_stream()
-
                 self.current_playback_time = start_time
-                self.start_time_real = time.time() - self.current_playback_time
-                
+
+                if self.is_looping:
+                    # ループ範囲を合成しておき、出力側で継ぎ目なしに回す
+                    audio, region_start = self._render_loop_region(start_time, end_time)
+                    self.vo_se_engine.play_loop(audio, region_start, start_time, end_time)
+                    self.is_loop_playing = True
+                else:
+                    # 先頭のフレーズが合成でき次第、再生を始める
+                    # 変更のあったフレーズだけ再合成される（それ以外はキャッシュから）
+                    audio_blocks = self.vo_se_engine.synthesize_stream(
+                        notes, pitch, start_time=start_time, end_time=end_time,
+                        render_phrase=self.phrase_renderer.render_phrase
+                    )
+                    # 出力ストリームは開いたままなので、ブロックを渡すだけですぐに戻る
+                    self.vo_se_engine.play_stream(audio_blocks, start_time=start_time)
+                    self.is_loop_playing = False
+
+                # カーソルは出力デバイスが実際に鳴らしている位置から読む
+                for widget in (self.timeline_widget, self.graph_editor_widget):
+                    widget.set_playback_clock(self.vo_se_engine.playback_clock)
                 self.is_playing = True
                 self.playback_timer.start()
                 
-                import threading
-                playback_thread = threading.Thread(target=self.vo_se_engine.play_audio, args=(audio_track,))
-                playback_thread.daemon = True
-                playback_thread.start()
-                
                 self.play_button.setText("■ 再生中 (停止)")
                 self.status_label.setText(f"再生開始しました (範囲: {start_time:.2f}s - {end_time:.2f}s)。")
 
@@ -309,6 +389,25 @@ class MainWindow(QMainWindow):
                  self.status_label.setText(f"再生エラーが発生しました: {e}")
                  print(f"再生エラーの詳細: {e}")
                 
+    def _render_loop_region(self, start_time: float, end_time: float):
+        """
+        ループ範囲の音声を (音声, 音声の先頭の時刻) で返す
+        継ぎ目のクロスフェードにループ先頭の直前の音を使うので、少し手前から合成する
+        変更のないフレーズはキャッシュから使い、ミックスも変わった区間だけやり直される
+        """
+        region_start = max(0.0, start_time - LOOP_PREROLL_SECONDS)
+        audio = self.phrase_renderer.render_range(self.timeline_widget.notes_list, self.pitch_data, region_start, end_time)
+        return audio, region_start
+
+    @Slot()
+    def refresh_loop_region(self):
+        """ループ再生中にノート・ピッチ・ループ範囲が変わったら、止めずに音声を差し替える"""
+        if not (self.is_playing and self.is_loop_playing): return
+        start_time, end_time = self.timeline_widget.get_selected_notes_range()
+        if start_time >= end_time: return
+        audio, region_start = self._render_loop_region(start_time, end_time)
+        self.vo_se_engine.update_loop(audio, region_start, start_time, end_time)
+
     @Slot()
     def on_loop_button_toggled(self):
         """ループ再生ボタンのハンドラ"""
@@ -318,10 +417,16 @@ class MainWindow(QMainWindow):
             self.loop_button.setText("選択範囲ループ: ON")
             self.status_label.setText("選択範囲でのループ再生を有効にしました。")
             self.is_looping = True
+            if self.is_playing and not self.is_loop_playing:
+                self.status_label.setText("選択範囲でのループ再生を有効にしました（次の再生から）。")
         else:
             self.loop_button.setText("ループ再生: OFF")
             self.status_label.setText("ループ再生を無効にしました。")
             self.is_looping = False
+            if self.is_loop_playing:
+                # ループを抜けて、合成済みの範囲の最後まで再生する
+                self.vo_se_engine.stop_loop()
+                self.is_loop_playing = False
 
     @Slot()
     def on_record_toggled(self):
@@ -344,7 +449,26 @@ class MainWindow(QMainWindow):
     @Slot()
     def on_character_changed(self):
         char_id = self.character_selector.currentData()
-        self.vo_se_engine.set_active_character(char_id)
+        if not char_id: return
+        self.speculative_renderer.cancel() # 読み込みが終わったら on_character_loaded で先読みし直す
+        self.phrase_renderer.mark_dirty() # キャラクターが変わるとキャッシュキーも変わる
+
+        # 常駐していない音源の読み込みでGUIが固まらないよう、別スレッドで切り替える
+        import threading
+        def load():
+            ok = self.vo_se_engine.set_active_character(char_id)
+            self.character_loaded_signal.emit(char_id, bool(ok))
+        self.status_label.setText("キャラクターを読み込み中...")
+        threading.Thread(target=load, daemon=True).start()
+
+    @Slot(str, bool)
+    def on_character_loaded(self, char_id: str, ok: bool):
+        name = self.vo_se_engine.characters[char_id].name if char_id in self.vo_se_engine.characters else char_id
+        if ok:
+            self.status_label.setText(f"キャラクター: {name}")
+            self.speculative_renderer.schedule() # 新しい声で先読みし直す
+        else:
+            self.status_label.setText(f"キャラクター {name} の読み込みに失敗しました。")
 
 
     
@@ -353,8 +477,13 @@ class MainWindow(QMainWindow):
         """タイマーイベントごとに呼び出され、再生カーソル位置とGUIを同期更新する"""
         if self.is_playing:
             # --- 再生時刻の同期 ---
-            # システム時刻から計算するのではなく、VO_SE_Engineの現在時刻を取得する
+            # システム時刻から計算するのではなく、出力デバイスが鳴らしたサンプル数から求めた時刻を使う
             self.current_playback_time = self.vo_se_engine.current_time_playback 
+
+            # 最後まで鳴り終わったら停止状態に戻す
+            if not self.vo_se_engine.is_playback_active:
+                self.on_play_pause_toggled()
+                return
            
             # 再生時間を MM:SS.ms 形式にフォーマット
             mins = int(self.current_playback_time / 60)
@@ -364,22 +493,7 @@ class MainWindow(QMainWindow):
             self.time_display_label.setText(time_str)
           
             
-            # --- ループ処理のロジック ---
-            # ここではGUI側でループ範囲監視と巻き戻しを行う
-            if self.is_looping:
-                project_start_time, project_end_time = self.timeline_widget.get_selected_notes_range()
-                
-                # 再生時間が終了範囲を超えたら、開始時間まで巻き戻す
-                if self.current_playback_time >= project_end_time and project_end_time > project_start_time:
-                    self.current_playback_time = project_start_time
-                    # VO_SE_Engineの内部時刻も巻き戻す必要がある
-                    self.vo_se_engine.current_time_playback = self.current_playback_time 
-                
-                # 再生時間が開始範囲より前なら、開始時間まで進める (通常は発生しない想定だが安全策)
-                if self.current_playback_time < project_start_time:
-                    self.current_playback_time = project_start_time
-                    # VO_SE_Engineの内部時刻も巻き戻す必要がある
-                    self.vo_se_engine.current_time_playback = self.current_playback_time 
+            # ループは出力側で回しているので、ここで巻き戻す必要はない
 
             # --- GUIの更新と自動スクロール ---
             self.timeline_widget.set_current_time(self.current_playback_time)
@@ -471,11 +585,11 @@ class MainWindow(QMainWindow):
             track.append(mido.MetaMessage('track_name', name='Vocal Track 1', time=0))
 
             sorted_notes = sorted(self.timeline_widget.notes_list, key=lambda note: note.start_time)
-            tokenizer = Tokenizer() 
+            # 歌詞の分かち書きはまとめて問い合わせる（共有の janome を使い、同じ歌詞は解析し直さない）
+            lyric_tokens = self.timeline_widget.tokenizer_service.surfaces_many([note.lyrics for note in sorted_notes])
             current_tick = 0
 
-            for note in sorted_notes:
-                tokens = [token.surface for token in tokenizer.tokenize(note.lyrics, wakati=True)]
+            for note, tokens in zip(sorted_notes, lyric_tokens):
                 note_start_beats = self.timeline_widget.seconds_to_beats(note.start_time)
                 note_duration_beats = self.timeline_widget.seconds_to_beats(note.duration)
                 
@@ -597,6 +711,7 @@ class MainWindow(QMainWindow):
         """GraphEditorWidgetから更新されたピッチデータを受け取る"""
         # PitchEvent型への型ヒントを追加
         self.pitch_data: list[PitchEvent] = new_pitch_events
+        self.phrase_renderer.mark_dirty()
         print(f"ピッチデータが更新されました。総ポイント数: {len(self.pitch_data)}")
 
 
@@ -654,6 +769,14 @@ class MainWindow(QMainWindow):
             self.status_label.setText(f"ノートオン: {note_number} (Velocity: {velocity})")
         elif event_type == 'off':
             self.status_label.setText(f"ノートオフ: {note_number}")
+
+    @Slot(int, int, str)
+    def on_midi_monitor(self, note_number: int, velocity: int, event_type: str):
+        """MIDI入力をプレビュー音でモニターする（作り置きの音を鳴らすだけなので再生中でも重ねて鳴る）"""
+        if event_type == 'on':
+            self.vo_se_engine.preview_note(note_number, velocity)
+        elif event_type == 'off':
+            self.vo_se_engine.release_preview(note_number)
           
 
     @Slot()
@@ -680,6 +803,11 @@ class MainWindow(QMainWindow):
         
         if self.midi_manager: 
             self.midi_manager.stop()
+
+        self.speculative_renderer.cancel()
+
+        if self.talk_pipeline is not None:
+            self.talk_pipeline.analyzer.close() # 解析ワーカーのプロセスを終了する
         
         if self.vo_se_engine:
             self.vo_se_engine.close()
@@ -711,7 +839,7 @@ def on_export_button_clicked(self):
         self, 
         "音声ファイルを保存", 
         default_path, 
-        "WAV Files (*.wav);;All Files (*)"
+        "WAV Files (*.wav);;FLAC Files (*.flac);;All Files (*)"
     )
 
     # 3. ユーザーがキャンセルせずにパスを選択した場合のみ実行
@@ -731,23 +859,6 @@ def on_export_button_clicked(self):
 
 
 def on_text_entered(self):
-    text = self.text_input.text()
-    if not text:
-        return
-
-    # 1. 解析を実行
-    # PhonemeEventのリストを取得
-    events = self.analyzer.analyze(text)
-
-    # 2. タイムラインを更新
-    # ユーザーが目で確認できるように即座に表示
-    self.timeline_widget.set_events(events)
-
-    # 3. 自動プレビュー（重要：ここがTalk版の利便性）
-    # 一時的なWAVファイルとして書き出し
-    temp_wav = "output/preview.wav"
-    self.engine_wrapper.render_sentence(events, temp_wav)
-    
-    # 4. 再生（音声出力）
-    self.play_audio(temp_wav)
+    """テキスト入力の確定時（MainWindow.on_generate_talk と同じく、文ごとに解析・合成・再生を重ねて読み上げる）"""
+    MainWindow.on_generate_talk(self)
 
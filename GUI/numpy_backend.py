@@ -0,0 +1,145 @@
+# numpy_backend.py
+# synthesizer_core.h と同じ処理を NumPy だけで行う合成バックエンド
+# C エンジン (engine.dll / engine.dylib) が無い Linux やヘッドレス環境でも合成できるようにする
+
+import os
+
+import numpy as np
+
+from audio_dsp import note_to_hz, apply_crossfade, DEFAULT_FADE_SAMPLES
+from pitch_curve import PitchCurveCache, cumulative_phase
+from render_cache import split_into_phrases
+from resampler import read_at, DEFAULT_QUALITY
+from voicebank_store import VoicebankStore
+
+SAMPLE_BASE_NOTE = 60      # 音源サンプルが収録されている音高（C4 想定）
+ENVELOPE_SECONDS = 0.005   # クリック音防止のアタック・リリース長
+TAIL_SECONDS = 0.5         # VO_SE_Engine.RENDER_TAIL_SECONDS と合わせる
+
+
+class NumpySynthBackend:
+    """
+    VO_SE_Engine から C エンジンの代わりに呼ばれるバックエンド
+    音源フォルダにノートの歌詞（または音素）と同名の WAV があればサンプル再生、なければオシレーターで鳴らす
+    """
+    def __init__(self, sample_rate: int = 44100, waveform_type: str = "sine", voicebank_bytes: int = 64 * 1024 * 1024,
+                 pitch_curves: PitchCurveCache = None, resample_quality: str = DEFAULT_QUALITY):
+        self.sample_rate = sample_rate
+        self.waveform_type = waveform_type
+        self.resample_quality = resample_quality # サンプルを読み出す時の補間 ("linear" / "sinc_fast" / "sinc_best")
+        self.voicebank_bytes = voicebank_bytes
+        self.pitch_curves = pitch_curves or PitchCurveCache() # グラフエディタと共有するピッチ曲線
+        self.char_id = None
+        self.voicebank: VoicebankStore = None
+
+    # --- init_engine(char_id, audio_dir) 相当 ---
+    def init_engine(self, char_id: str, audio_dir: str) -> int:
+        """音源フォルダを登録する（0: 成功, -1: 失敗）。WAV はヘッダーだけ読み、中身は使う時に読む"""
+        if audio_dir and not os.path.isdir(audio_dir):
+            return -1
+        # 音源なしの場合はオシレーターのみで合成する
+        self.set_voicebank(char_id, VoicebankStore(audio_dir, self.voicebank_bytes) if audio_dir else None)
+        return 0
+
+    def set_voicebank(self, char_id: str, store: VoicebankStore):
+        """読み込み済みの音源に切り替える"""
+        self.char_id = char_id
+        self.voicebank = store
+
+    def _find_sample(self, note):
+        for name in [note.lyric] + list(note.phonemes or []):
+            if name and self.voicebank is not None:
+                sample = self.voicebank.get(name)
+                if sample is not None and sample.size > 1:
+                    return sample, self.voicebank.info(name).sample_rate
+        return None, None
+
+    def output_samples(self, notes: list, sample_rate: int = None) -> int:
+        """合成結果の長さ（ノート終端 + 余白）"""
+        if not notes: return 0
+        end_time = max(n.start_time + n.duration for n in notes)
+        return int(np.ceil((end_time + TAIL_SECONDS) * (sample_rate or self.sample_rate)))
+
+    # --- request_synthesis_full 相当 ---
+    def synthesize(self, notes: list, pitch_events: list, sample_rate: int = None) -> np.ndarray:
+        """ノート列を合成して float32 の配列を返す"""
+        out = np.empty(self.output_samples(notes, sample_rate), dtype=np.float32)
+        return self.synthesize_into(notes, pitch_events, out, sample_rate)
+
+    # --- request_synthesis_into 相当 ---
+    def synthesize_into(self, notes: list, pitch_events: list, out: np.ndarray, sample_rate: int = None) -> np.ndarray:
+        """
+        呼び出し側のバッファ out の先頭に合成し、書き込んだ範囲のビューを返す
+        out が合成結果より短い場合は入る所までで切る
+        """
+        sr = sample_rate or self.sample_rate
+        if not notes: return out[:0]
+        out = out[:self.output_samples(notes, sr)]
+        out.fill(0.0)
+
+        # ピッチベンドはフレーズごとの曲線（グラフエディタと共有のキャッシュ）をサンプル単位に補間して使う
+        curves = {}
+        if pitch_events:
+            for phrase in split_into_phrases(notes, pitch_events):
+                curve = self.pitch_curves.get(phrase)
+                for n in phrase.notes:
+                    curves[id(n)] = curve
+
+        for note in sorted(notes, key=lambda n: n.start_time):
+            start = int(round(note.start_time * sr))
+            n_samples = int(round(note.duration * sr))
+            if n_samples <= 0 or start >= out.size: continue
+
+            # 1. ノートの各サンプルの周波数（ピッチベンド込み）
+            f0 = np.full(n_samples, note_to_hz(note.note_number), dtype=np.float64)
+            curve = curves.get(id(note))
+            if curve is not None:
+                f0 *= curve.bend_ratio_at((start + np.arange(n_samples)) / sr)
+
+            # 2. 波形の生成
+            sample, sample_rate = self._find_sample(note)
+            if sample is not None:
+                voice = self._play_sample(sample, f0 * (sample_rate / sr))
+            else:
+                voice = self._oscillate(f0, sr)
+
+            # 3. 音量とエンベロープ
+            voice *= (note.velocity / 127.0) * 0.5
+            fade = min(int(ENVELOPE_SECONDS * sr), n_samples // 2)
+            if fade > 0:
+                ramp = np.linspace(0.0, 1.0, fade, dtype=np.float32)
+                voice[:fade] *= ramp
+                voice[-fade:] *= ramp[::-1]
+
+            apply_crossfade(out, start, voice, DEFAULT_FADE_SAMPLES)
+        return out
+
+    def _oscillate(self, f0: np.ndarray, sr: int) -> np.ndarray:
+        """周波数列から累積位相でオシレーター波形を作る"""
+        cycles = cumulative_phase(f0, sr) # 周期単位の位相
+        if self.waveform_type == "square":
+            wave_data = np.where((cycles % 1.0) < 0.5, 1.0, -1.0)
+        elif self.waveform_type == "sawtooth":
+            wave_data = 2.0 * (cycles % 1.0) - 1.0
+        else:
+            wave_data = np.sin(2.0 * np.pi * cycles)
+        return wave_data.astype(np.float32)
+
+    def _play_sample(self, sample: np.ndarray, f0: np.ndarray) -> np.ndarray:
+        """
+        サンプルを f0 に合わせた速さで読み出す（音高が変わる）
+        f0 はサンプルと出力のサンプリングレートの違いを補正済みの値を渡す
+        ノートより短いサンプルは後半 1/2 をループさせて伸ばす
+        """
+        speed = f0 / note_to_hz(SAMPLE_BASE_NOTE)
+        pos = np.cumsum(speed) - speed[0]
+        last = sample.size - 1
+        loop_start = sample.size // 2
+        loop_len = last - loop_start
+        if loop_len > 0:
+            over = pos > last
+            pos[over] = loop_start + (pos[over] - last) % loop_len
+        else:
+            pos = np.minimum(pos, last)
+        # ループで位置が飛ぶので、フィルタの選択には位置の差ではなく読み出し速度の最大値を渡す
+        return read_at(sample, pos, self.resample_quality, speed=float(speed.max()))
@@ -0,0 +1,106 @@
+# parallel_export.py
+# 曲を休符の位置で区切り、区間ごとに別プロセスで合成してからつなぎ合わせる書き出し処理
+
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from render_cache import Phrase, split_into_phrases, pitch_events_in_range
+
+SEGMENTS_PER_WORKER = 4 # ワーカー1つあたりの区間数（処理時間のばらつきをならすため少し細かく切る）
+TAIL_SECONDS = 0.5      # 区間の後ろに確保しておく余白
+
+# --- ワーカープロセス側 ---
+_worker_engine = None # 各ワーカーで1度だけ作るエンジン
+
+
+def _init_worker(sample_rate: int, backend, resample_quality, char_id, audio_dir):
+    """ワーカー起動時にエンジンと音源を1度だけロードする（呼び出し側と同じバックエンド・補間品質にする）"""
+    global _worker_engine
+    from vo_se_engine import VO_SE_Engine
+    _worker_engine = VO_SE_Engine(sample_rate=sample_rate, backend=backend, resample_quality=resample_quality)
+    if char_id and audio_dir:
+        _worker_engine.load_character(char_id, audio_dir)
+
+
+def _render_segment(segment: Phrase) -> tuple[float, np.ndarray]:
+    # ノート間のクロスフェードは区間の中で通常の合成と同じように行われる
+    audio = _worker_engine.synthesize(segment.local_notes(), segment.pitch_events)
+    return segment.start_time, audio
+
+
+# --- 呼び出し側 ---
+def build_segments(notes: list, pitch_events: list, n_segments: int, sample_rate: int = None) -> list[Phrase]:
+    """
+    フレーズを合計時間がだいたい均等になるように n_segments 個の区間にまとめる
+    sample_rate を渡すと区間の先頭をサンプルの境界にそろえる（区間内のノート位置が通常の合成と1サンプルもずれないように）
+    """
+    phrases = split_into_phrases(notes)
+    if not phrases: return []
+    n_segments = max(1, min(n_segments, len(phrases)))
+
+    total = sum(ph.end_time - ph.start_time for ph in phrases)
+    target = total / n_segments
+    groups, current, length = [], [], 0.0
+    for ph in phrases:
+        current.append(ph)
+        length += ph.end_time - ph.start_time
+        if length >= target and len(groups) < n_segments - 1:
+            groups.append(current)
+            current, length = [], 0.0
+    if current:
+        groups.append(current)
+
+    events = sorted(pitch_events or [], key=lambda p: p.time)
+    times = [p.time for p in events]
+    segments = []
+    for group in groups:
+        start_time = group[0].start_time
+        if sample_rate:
+            start_time = math.floor(start_time * sample_rate) / sample_rate
+        seg = Phrase([n for ph in group for n in ph.notes], start_time, max(ph.end_time for ph in group))
+        seg.pitch_events = pitch_events_in_range(events, seg.start_time, seg.end_time, times)
+        segments.append(seg)
+    return segments
+
+
+def stitch_segments(parts, sample_rate: int, total_samples: int) -> np.ndarray:
+    """
+    (開始秒, 音声) を受け取り、それぞれの位置に足し合わせる
+    区間の境目は休符で、どちらの区間もそこは無音なので、改めてクロスフェードはかけない
+    （かけると通常の合成より1回多くフェードがかかり、後ろの区間の頭が削られる）
+    """
+    out = np.zeros(total_samples, dtype=np.float32)
+    end = 0
+    for start_time, audio in parts:
+        pos = int(round(start_time * sample_rate))
+        if pos + audio.size > out.size:
+            out = np.concatenate([out, np.zeros(pos + audio.size - out.size, dtype=np.float32)])
+        out[pos:pos + audio.size] += audio
+        end = max(end, pos + audio.size)
+    return out[:end]
+
+
+def render_parallel(notes: list, pitch_events: list, sample_rate: int, char_id=None, audio_dir=None,
+                    max_workers: int = None, backend: str = None, resample_quality: str = None) -> np.ndarray:
+    """区間ごとに ProcessPoolExecutor で合成し、1本の音声にして返す"""
+    if not notes: return np.zeros(0, dtype=np.float32)
+
+    max_workers = max_workers or os.cpu_count() or 1
+    segments = build_segments(notes, pitch_events, max_workers * SEGMENTS_PER_WORKER, sample_rate)
+    end_time = max(n.start_time + n.duration for n in notes)
+    total_samples = int(math.ceil((end_time + TAIL_SECONDS) * sample_rate))
+
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                             initargs=(sample_rate, backend, resample_quality, char_id, audio_dir)) as pool:
+        return stitch_segments(pool.map(_render_segment, segments), sample_rate, total_samples)
+
+
+def max_difference(a: np.ndarray, b: np.ndarray) -> float:
+    """2つの音声の最大誤差（長さが違う場合は短い方を無音で延ばして比べる）"""
+    n = max(a.size, b.size)
+    a = np.pad(a, (0, n - a.size))
+    b = np.pad(b, (0, n - b.size))
+    return float(np.max(np.abs(a - b))) if n else 0.0
@@ -0,0 +1,151 @@
+# pitch_curve.py
+# ノート列とピッチベンド (PitchEvent) から、フレームごとの基本周波数 f0 の曲線を作るモジュール
+# 合成バックエンド (numpy_backend) とグラフエディタが同じ計算・同じキャッシュを使う
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+from audio_dsp import note_to_hz
+from render_cache import Phrase, split_into_phrases, phrase_key
+
+PITCH_BEND_RANGE = 2.0       # ピッチベンド ±8192 が何半音に相当するか
+PITCH_BEND_MAX = 8192.0
+CONTROL_FRAME_RATE = 200.0   # キャッシュする曲線のフレームレート (5ms ごと)。合成側はこれをサンプル単位に補間して使う
+DISPLAY_FRAME_RATE = CONTROL_FRAME_RATE # グラフエディタも同じ曲線をそのまま描く
+
+
+@dataclass
+class PitchCurve:
+    """
+    一定間隔のフレームで並べたピッチ曲線
+    bend はノートに関係なく掛かるピッチベンド（半音）、f0 はノートの音高込みの周波数（ノートが無いフレームは 0）
+    """
+    start_time: float
+    frame_rate: float
+    bend: np.ndarray
+    f0: np.ndarray
+
+    @property
+    def times(self) -> np.ndarray:
+        return self.start_time + np.arange(self.f0.size) / self.frame_rate
+
+    @property
+    def end_time(self) -> float:
+        return self.start_time + self.f0.size / self.frame_rate
+
+    def shifted(self, start_time: float) -> "PitchCurve":
+        """配列はそのままで開始時刻だけ変えたものを返す（キャッシュはフレーズ先頭 0 秒で持つため）"""
+        return PitchCurve(start_time, self.frame_rate, self.bend, self.f0)
+
+    def bend_ratio_at(self, times: np.ndarray) -> np.ndarray:
+        """時刻 times（秒）のピッチベンドを周波数の倍率で返す（フレームの間は直線補間、範囲外は端の値で延ばす）"""
+        frames = (np.asarray(times, dtype=np.float64) - self.start_time) * self.frame_rate
+        return np.exp2(np.interp(frames, np.arange(self.bend.size), self.bend) / 12.0)
+
+
+def bend_table(pitch_events: list):
+    """PitchEvent のリストを時刻順の (times, values) 配列にする。空なら (None, None)"""
+    if not pitch_events:
+        return None, None
+    times = np.array([p.time for p in pitch_events], dtype=np.float64)
+    values = np.array([p.value for p in pitch_events], dtype=np.float64)
+    order = np.argsort(times, kind='stable')
+    return times[order], values[order]
+
+
+def bend_semitones(t: np.ndarray, bend_times, bend_values) -> np.ndarray:
+    """時刻 t でのピッチベンド（半音）。ポイント間は直線で補間し、最初と最後の値はそのまま延ばす"""
+    if bend_times is None:
+        return np.zeros(np.shape(t), dtype=np.float64)
+    return np.interp(t, bend_times, bend_values) / PITCH_BEND_MAX * PITCH_BEND_RANGE
+
+
+def value_to_semitones(value):
+    return np.asarray(value, dtype=np.float64) / PITCH_BEND_MAX * PITCH_BEND_RANGE
+
+
+def semitones_to_value(semitones):
+    return np.asarray(semitones, dtype=np.float64) / PITCH_BEND_RANGE * PITCH_BEND_MAX
+
+
+def build_pitch_curve(notes: list, pitch_events: list, frame_rate: float,
+                      start_time: float = 0.0, end_time: float = None) -> PitchCurve:
+    """
+    start_time から end_time までのピッチ曲線を作る
+    ノートが重なっている所は後から始まるノートの音高になる
+    """
+    if end_time is None:
+        end_time = max((n.start_time + n.duration for n in notes), default=start_time)
+    n_frames = max(0, int(np.ceil((end_time - start_time) * frame_rate)))
+    t = start_time + np.arange(n_frames) / frame_rate
+
+    bend = bend_semitones(t, *bend_table(pitch_events))
+
+    f0 = np.zeros(n_frames, dtype=np.float64)
+    if notes and n_frames:
+        ordered = sorted(notes, key=lambda n: n.start_time)
+        starts = np.array([n.start_time for n in ordered])
+        ends = np.array([n.start_time + n.duration for n in ordered])
+        pitches = np.array([n.note_number for n in ordered], dtype=np.float64)
+        # 各フレームの直前に始まったノートを探し、まだ鳴っていれば音高を割り当てる
+        idx = np.searchsorted(starts, t, side='right') - 1
+        active = idx >= 0
+        active[active] = t[active] < ends[idx[active]]
+        f0[active] = note_to_hz(pitches[idx[active]]) * np.exp2(bend[active] / 12.0)
+    return PitchCurve(start_time, frame_rate, bend, f0)
+
+
+def cumulative_phase(f0: np.ndarray, frame_rate: float) -> np.ndarray:
+    """周波数列を積分して位相（周期単位）にする。周波数が変わっても波形が途切れない"""
+    return np.cumsum(f0) / frame_rate
+
+
+class PitchCurveCache:
+    """
+    フレーズ単位のピッチ曲線の LRU キャッシュ
+    曲線はフレーズ先頭を 0 秒として持つので、フレーズを平行移動しても作り直さない
+    合成バックエンドもグラフエディタも CONTROL_FRAME_RATE・フレーズ単位で引くので、片方が作った曲線をもう片方がそのまま使える
+    """
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, PitchCurve] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, phrase: Phrase, frame_rate: float = CONTROL_FRAME_RATE) -> PitchCurve:
+        """フレーズのピッチ曲線（絶対時刻）を返す。無ければ作ってキャッシュする"""
+        key = phrase_key(phrase, "pitch_curve", frame_rate)
+        with self._lock:
+            curve = self._entries.get(key)
+            if curve is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return curve.shifted(phrase.start_time)
+            self.misses += 1
+
+        # フレーズ末尾のサンプルまで補間できるように、1フレーム余分に作る
+        curve = build_pitch_curve(phrase.local_notes(), phrase.pitch_events, frame_rate,
+                                  0.0, phrase.end_time - phrase.start_time + 1.0 / frame_rate)
+        size = curve.bend.nbytes + curve.f0.nbytes
+        with self._lock:
+            if size <= self.max_bytes and key not in self._entries:
+                self._entries[key] = curve
+                self.current_bytes += size
+                while self.current_bytes > self.max_bytes:
+                    _, old = self._entries.popitem(last=False)
+                    self.current_bytes -= old.bend.nbytes + old.f0.nbytes
+        return curve.shifted(phrase.start_time)
+
+    def curves_for_song(self, notes: list, pitch_events: list, frame_rate: float = CONTROL_FRAME_RATE) -> list[PitchCurve]:
+        """曲全体をフレーズに分けて、それぞれのピッチ曲線を返す（グラフエディタ・合成バックエンド用）"""
+        return [self.get(ph, frame_rate) for ph in split_into_phrases(notes, pitch_events)]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
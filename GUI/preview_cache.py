@@ -0,0 +1,126 @@
+# preview_cache.py
+# ノートのクリックや MIDI 入力のモニター用に、MIDI ノート番号ごとの短い母音を合成して持っておくキャッシュ
+# キャラクターを読み込んだ後にバックグラウンドで作り、鳴らす時はエンジンを通さず出力に混ぜるだけにする
+
+import threading
+
+import numpy as np
+
+PREVIEW_LYRIC = "あ"
+PREVIEW_SECONDS = 0.4
+PREVIEW_LOW_NOTE = 36   # C2
+PREVIEW_HIGH_NOTE = 96  # C7
+PREVIEW_CENTER_NOTE = 60 # よく使う音域から先に作る
+FADE_IN_SECONDS = 0.002
+FADE_OUT_SECONDS = 0.03
+
+
+class PreviewCache:
+    """
+    MIDI ノート番号 → プレビュー音の配列
+    render(note_number) は1音分の音声を返す関数（エンジンの合成を呼ぶ）
+    release(audio) を渡すと、render が返した配列を写し終えた後に呼ぶ（プールのバッファを返すため）
+    キャラクターを切り替えたら rebuild() で作り直す（作りかけの古いキャラクターの音は捨てる）
+    """
+    def __init__(self, render, sample_rate: int = 44100, seconds: float = PREVIEW_SECONDS,
+                 low_note: int = PREVIEW_LOW_NOTE, high_note: int = PREVIEW_HIGH_NOTE, release=None):
+        self.render = render
+        self.release = release
+        self.sample_rate = sample_rate
+        self.seconds = seconds
+        self.low_note = low_note
+        self.high_note = high_note
+        self.character_id = None
+        self.hits = 0
+        self.misses = 0
+        self._tones: dict[int, np.ndarray] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _build_order(self) -> list[int]:
+        notes = range(self.low_note, self.high_note + 1)
+        return sorted(notes, key=lambda n: (abs(n - PREVIEW_CENTER_NOTE), n))
+
+    def _render_tone(self, note_number: int) -> np.ndarray:
+        """1音分を合成し、長さを揃えて前後を短くフェードする（途中で止めてもクリックしないように）"""
+        length = int(self.seconds * self.sample_rate)
+        audio = self.render(note_number)
+        tone = np.zeros(length, dtype=np.float32)
+        n = min(length, audio.size)
+        tone[:n] = audio[:n]
+        if self.release is not None:
+            self.release(audio)
+        fade_in = min(n, int(FADE_IN_SECONDS * self.sample_rate))
+        fade_out = min(length, int(FADE_OUT_SECONDS * self.sample_rate))
+        tone[:fade_in] *= np.linspace(0.0, 1.0, fade_in, endpoint=False, dtype=np.float32)
+        tone[length - fade_out:] *= np.linspace(1.0, 0.0, fade_out, dtype=np.float32)
+        return tone
+
+    def rebuild(self, character_id: str):
+        """キャラクターのプレビュー音をバックグラウンドで作り直す（すぐに戻る）"""
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            self._tones.clear()
+            self.character_id = character_id
+
+        def worker():
+            for note_number in self._build_order():
+                with self._lock:
+                    if self._generation != generation: return
+                    if note_number in self._tones: continue
+                try:
+                    tone = self._render_tone(note_number)
+                except Exception as e:
+                    print(f"プレビュー音の合成に失敗しました: MIDI {note_number} ({e})")
+                    return
+                with self._lock:
+                    if self._generation != generation: return
+                    self._tones.setdefault(note_number, tone)
+
+        self._thread = threading.Thread(target=worker, daemon=True)
+        self._thread.start()
+
+    def get(self, note_number: int) -> np.ndarray:
+        """作り終わっていればプレビュー音を返す。まだなら None"""
+        with self._lock:
+            tone = self._tones.get(note_number)
+            if tone is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return tone
+
+    def tone_for(self, note_number: int) -> np.ndarray:
+        """プレビュー音を返す。まだ作っていなければその場で合成する（範囲外の音も含む）"""
+        tone = self.get(note_number)
+        if tone is not None:
+            return tone
+        with self._lock:
+            generation = self._generation
+        try:
+            tone = self._render_tone(note_number)
+        except Exception as e:
+            print(f"プレビュー音の合成に失敗しました: MIDI {note_number} ({e})")
+            return None
+        with self._lock:
+            if self._generation == generation:
+                tone = self._tones.setdefault(note_number, tone)
+        return tone
+
+    @property
+    def ready_count(self) -> int:
+        with self._lock:
+            return len(self._tones)
+
+    def wait(self, timeout: float = None):
+        """バックグラウンドの作成が終わるまで待つ（ベンチマーク・書き出し前の確認用）"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._tones.clear()
+            self.character_id = None
@@ -0,0 +1,281 @@
+# render_cache.py
+# ノート列を休符でフレーズに分割し、フレーズ単位で合成結果をキャッシュするモジュール
+
+import bisect
+import copy
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from data_models import PitchEvent
+
+MIN_REST_SECONDS = 0.05 # これより短い隙間は休符とみなさない（浮動小数の誤差対策）
+
+
+@dataclass
+class Phrase:
+    """休符で区切られたノートのまとまり"""
+    notes: list
+    start_time: float
+    end_time: float
+    pitch_events: list = field(default_factory=list) # フレーズ先頭を 0 秒とした相対時刻
+
+    def local_notes(self) -> list:
+        """フレーズ先頭を 0 秒とした相対時刻のノートを返す"""
+        result = []
+        for n in self.notes:
+            local = copy.copy(n)
+            local.start_time = n.start_time - self.start_time
+            result.append(local)
+        return result
+
+
+def split_into_phrases(notes: list, pitch_events: list = None, min_rest: float = MIN_REST_SECONDS) -> list[Phrase]:
+    """ノートを休符の位置でフレーズに分割し、各フレーズに範囲内のピッチイベントを割り当てる"""
+    if not notes: return []
+
+    phrases = []
+    current = []
+    current_start = current_end = 0.0
+    for n in sorted(notes, key=lambda n: n.start_time):
+        if current and n.start_time >= current_end + min_rest:
+            phrases.append(Phrase(current, current_start, current_end))
+            current = []
+        if not current:
+            current_start = n.start_time
+            current_end = n.start_time + n.duration
+        current.append(n)
+        current_end = max(current_end, n.start_time + n.duration)
+    phrases.append(Phrase(current, current_start, current_end))
+
+    if pitch_events:
+        events = sorted(pitch_events, key=lambda p: p.time)
+        times = [p.time for p in events]
+        for phrase in phrases:
+            phrase.pitch_events = pitch_events_in_range(events, phrase.start_time, phrase.end_time, times)
+    return phrases
+
+
+def split_long_phrase(phrase: Phrase, max_seconds: float) -> list[Phrase]:
+    """
+    max_seconds より長いフレーズを、前のノートが全て鳴り終わったノートの境目で分ける（休符の無い曲でも細かく合成できるように）
+    ノートが重なり続けていて境目が無い場合や、1音が max_seconds より長い場合はそのまま返す
+    """
+    if phrase.end_time - phrase.start_time <= max_seconds: return [phrase]
+    pieces = []
+    current = []
+    current_start = current_end = phrase.start_time
+    for n in sorted(phrase.notes, key=lambda n: n.start_time):
+        if current and n.start_time >= current_end and n.start_time - current_start >= max_seconds:
+            pieces.append(Phrase(current, current_start, current_end))
+            current = []
+        if not current:
+            current_start = n.start_time
+        current.append(n)
+        current_end = max(current_end, n.start_time + n.duration)
+    pieces.append(Phrase(current, current_start, current_end))
+    if len(pieces) == 1: return [phrase]
+
+    # ピッチイベントはフレーズ先頭からの相対時刻なので、そのまま区切り直す
+    times = [p.time for p in phrase.pitch_events]
+    for piece in pieces:
+        piece.pitch_events = pitch_events_in_range(
+            phrase.pitch_events, piece.start_time - phrase.start_time, piece.end_time - phrase.start_time, times
+        )
+    return pieces
+
+
+def pitch_events_in_range(sorted_events: list, start_time: float, end_time: float, times: list = None) -> list:
+    """
+    範囲内のピッチイベントを相対時刻で返す
+    範囲の両端には補間した値を置くので、曲全体で補間した時と同じピッチ曲線になる
+    times は sorted_events の時刻のリスト。フレーズごとに呼ぶ時は一度だけ作って渡すと二分探索だけで済む
+    """
+    if times is None:
+        times = [p.time for p in sorted_events]
+    lo = bisect.bisect_left(times, start_time)
+    hi = bisect.bisect_left(times, end_time, lo)
+    inside = sorted_events[lo:hi]
+    previous = sorted_events[lo - 1] if lo > 0 else None
+    following = sorted_events[hi] if hi < len(sorted_events) else None
+
+    result = [PitchEvent(p.time - start_time, p.value) for p in inside]
+    first = inside[0] if inside else following
+    if (previous or first) is not None and (not result or result[0].time > 0.0):
+        result.insert(0, PitchEvent(0.0, _interp_value(previous, first, start_time)))
+    if following is not None:
+        last = inside[-1] if inside else previous
+        result.append(PitchEvent(end_time - start_time, _interp_value(last, following, end_time)))
+    return result
+
+
+def _interp_value(a, b, t: float):
+    """2つのピッチイベントの間を直線補間した値（片方が無ければもう片方の値のまま）"""
+    if a is None:
+        return b.value
+    if b is None or b.time <= a.time:
+        return a.value
+    return a.value + (b.value - a.value) * (t - a.time) / (b.time - a.time)
+
+
+def phrase_key(phrase: Phrase, character_id, sample_rate: int) -> str:
+    """
+    フレーズの内容ハッシュ
+    ノート・ピッチは相対時刻で計算するので、フレーズごと平行移動しても同じキーになる
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((character_id, sample_rate)).encode('utf-8'))
+    for n in phrase.notes:
+        h.update(repr((
+            n.note_number, round(n.start_time - phrase.start_time, 6), round(n.duration, 6),
+            n.velocity, n.lyric, tuple(n.phonemes or ())
+        )).encode('utf-8'))
+    h.update(b"|")
+    for p in phrase.pitch_events:
+        h.update(repr((round(p.time, 6), p.value)).encode('utf-8'))
+    return h.hexdigest()
+
+
+class PhraseRenderCache:
+    """
+    フレーズ単位の合成結果を保持する LRU キャッシュ
+    保持している音声の合計バイト数が max_bytes を超えたら古いものから捨てる
+    """
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            audio = self._entries.get(key)
+            if audio is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return audio
+
+    def put(self, key: str, audio: np.ndarray):
+        # キャッシュした配列は複数の場所から共有されるので書き換え禁止にしておく
+        audio.flags.writeable = False
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key).nbytes
+            self._entries[key] = audio
+            self.current_bytes += audio.nbytes
+            while self.current_bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+
+class PhraseRenderer:
+    """
+    フレーズキャッシュを使って指定範囲の音声を組み立てる
+    変更のあったフレーズだけを再合成し、ミックスもその区間だけやり直す
+    """
+    def __init__(self, engine, cache: PhraseRenderCache = None):
+        self.engine = engine
+        self.cache = cache if cache is not None else PhraseRenderCache()
+        self._dirty = True
+        self._last_range = None
+        self._mix = None
+        self._placements = [] # [(offset_samples, key, audio)]
+
+    def mark_dirty(self, *args):
+        """notes_changed_signal / pitch_data_changed に接続するスロット"""
+        self._dirty = True
+
+    def render_phrase(self, phrase: Phrase) -> np.ndarray:
+        """フレーズ1つ分の音声を返す（フレーズ先頭が 0 サンプル目）"""
+        return self._render_keyed(phrase)[1]
+
+    def _render_keyed(self, phrase: Phrase) -> tuple[str, np.ndarray]:
+        """
+        (キャッシュキー, 音声) を返す
+        キーは合成と同じロックの中で作るので、途中でキャラクターが切り替わっても、新しい声の音声を古いキャラクターのキーで保存しない
+        """
+        with self.engine.synth_lock:
+            key = phrase_key(phrase, self.engine.active_character_id, self.engine.sample_rate)
+            audio = self.cache.get(key)
+            if audio is None:
+                # プールのバッファに合成し、キャッシュにはちょうどの長さで写して持つ（バッファはすぐに戻す）
+                rendered = self.engine.synthesize_into(phrase.local_notes(), phrase.pitch_events)
+                audio = rendered.copy()
+                self.engine.release_buffer(rendered)
+                self.cache.put(key, audio)
+        return key, audio
+
+    def render_range(self, notes: list, pitch_events: list, start_time: float, end_time: float) -> np.ndarray:
+        """start_time から end_time までの音声を返す（先頭が start_time）"""
+        if not self._dirty and self._last_range == (start_time, end_time) and self._mix is not None:
+            return self._mix
+
+        sr = self.engine.sample_rate
+        placements = []
+        for phrase in split_into_phrases(notes, pitch_events):
+            if phrase.end_time <= start_time or phrase.start_time >= end_time:
+                continue
+            key, audio = self._render_keyed(phrase)
+            offset = int(round((phrase.start_time - start_time) * sr))
+            placements.append((offset, key, audio))
+
+        length = max([int(math.ceil((end_time - start_time) * sr))] + [off + a.size for off, _, a in placements])
+        if self._mix is not None and self._last_range == (start_time, end_time) and self._mix.size == length:
+            self._remix_changed(placements)
+        else:
+            self._mix = np.zeros(length, dtype=np.float32)
+            for off, _, audio in placements:
+                self._add(self._mix, off, audio, 0, length)
+
+        self._placements = placements
+        self._last_range = (start_time, end_time)
+        self._dirty = False
+        return self._mix
+
+    def _remix_changed(self, placements: list):
+        """前回から増減したフレーズの区間だけミックスし直す"""
+        old = {(off, key): audio for off, key, audio in self._placements}
+        new = {(off, key): audio for off, key, audio in placements}
+        changed = [(off, off + audio.size) for (off, key), audio in old.items() if (off, key) not in new]
+        changed += [(off, off + audio.size) for (off, key), audio in new.items() if (off, key) not in old]
+        if not changed: return
+
+        # 重なった区間をまとめてから、その区間を 0 にして重なる全フレーズを足し直す
+        spans = []
+        for a, b in sorted(changed):
+            a, b = max(0, a), min(self._mix.size, b)
+            if a >= b: continue
+            if spans and a <= spans[-1][1]:
+                spans[-1][1] = max(spans[-1][1], b)
+            else:
+                spans.append([a, b])
+        for a, b in spans:
+            self._mix[a:b] = 0.0
+            for off, _, audio in placements:
+                if off < b and off + audio.size > a:
+                    self._add(self._mix, off, audio, a, b)
+
+    @staticmethod
+    def _add(mix: np.ndarray, offset: int, audio: np.ndarray, lo: int, hi: int):
+        """audio を offset の位置に、mix の [lo, hi) の範囲だけ足し込む"""
+        a = max(lo, offset)
+        b = min(hi, offset + audio.size)
+        if a < b:
+            mix[a:b] += audio[a - offset:b - offset]
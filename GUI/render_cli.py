@@ -0,0 +1,164 @@
+# render_cli.py
+# GUI (PySide6) を使わずにプロジェクトJSONをまとめてWAVへ書き出すコマンドラインツール
+# 使い方: python render_cli.py project1.json project2.json ... -o out/ --character char_001 --audio-dir audio_data/aoi
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from data_models import NoteEvent, PitchEvent
+
+PROJECT_APP_ID = "Vocaloid_Clone_App_12345" # MainWindow.save_file_dialog_and_save_midi が書き込むID
+
+
+def load_project(path: str):
+    """保存されたプロジェクトJSONを (notes, pitch_events, tempo) にして返す"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get("app_id") != PROJECT_APP_ID:
+        raise ValueError("サポートされていないプロジェクト形式です。")
+    notes, pitch_events = project_from_dict(data)
+    return notes, pitch_events, data.get("tempo_bpm")
+
+
+def project_from_dict(data: dict):
+    """プロジェクト形式の辞書 (notes / pitch_data) から (notes, pitch_events) を作る"""
+    notes = [
+        NoteEvent(
+            note_number=d['pitch'],
+            start_time=d['start'],
+            duration=d['duration'],
+            velocity=d.get('velocity', 100),
+            lyric=d.get('lyrics', ''),
+            phonemes=d.get('phonemes', [])
+        )
+        for d in data.get("notes", [])
+    ]
+    pitch_events = [PitchEvent(d['time'], d['value']) for d in data.get("pitch_data", [])]
+    return notes, pitch_events
+
+
+# --- ワーカープロセス側 ---
+_worker_engine = None
+
+
+def _init_worker(sample_rate: int, backend, char_id, audio_dir):
+    """ワーカーごとにエンジンと音源を1度だけロードする"""
+    global _worker_engine
+    from vo_se_engine import VO_SE_Engine
+    _worker_engine = VO_SE_Engine(sample_rate=sample_rate, backend=backend)
+    if char_id:
+        _worker_engine.load_character(char_id, audio_dir or "")
+
+
+def _render_file(project_path: str, output_path: str) -> dict:
+    from wav_exporter import write_blocks
+    result = {"project": project_path, "output": output_path, "status": "ok", "error": "",
+              "notes": 0, "audio_seconds": 0.0, "load_seconds": 0.0, "render_seconds": 0.0}
+    try:
+        t0 = time.perf_counter()
+        notes, pitch_events, _ = load_project(project_path)
+        t1 = time.perf_counter()
+        # 合成しながら書き出すので、合成と書き込みの時間はまとめて render_seconds に入る
+        frames = write_blocks(output_path, _worker_engine.synthesize_stream(notes, pitch_events), _worker_engine.sample_rate)
+        t2 = time.perf_counter()
+        result.update(notes=len(notes), audio_seconds=frames / _worker_engine.sample_rate,
+                      load_seconds=t1 - t0, render_seconds=t2 - t1)
+    except Exception as e:
+        result.update(status="error", error=str(e))
+    return result
+
+
+# --- 呼び出し側 ---
+def output_paths(projects: list[str], out_dir: str, fmt: str) -> list[str]:
+    """
+    プロジェクトごとの書き出し先を返す
+    入力の共通フォルダからの相対的なフォルダ構成を out_dir の下に残すので、
+    別のフォルダにある同じ名前のファイル (a/song.json と b/song.json) も上書きし合わない
+    """
+    folders = [os.path.dirname(os.path.abspath(p)) for p in projects]
+    try:
+        common = os.path.commonpath(folders)
+    except ValueError:
+        common = None # Windows でドライブが違う場合は、ドライブ名を除いた絶対パスをそのまま使う
+    outputs = []
+    for project, folder in zip(projects, folders):
+        rel = os.path.relpath(folder, common) if common else os.path.splitdrive(folder)[1].lstrip("\\/")
+        stem = os.path.splitext(os.path.basename(project))[0]
+        outputs.append(os.path.normpath(os.path.join(out_dir, rel, f"{stem}.{fmt}")))
+
+    # 同じファイルを2回指定した場合などは、書き出しを始める前に止める
+    seen = {}
+    for project, output in zip(projects, outputs):
+        if output in seen:
+            raise ValueError(f"書き出し先が重複しています: {seen[output]} と {project} → {output}")
+        seen[output] = project
+    return outputs
+
+
+def write_report(path: str, results: list[dict]):
+    """結果を CSV か JSON（拡張子で判定）で保存する"""
+    if path.lower().endswith(".json"):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        return
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(results[0].keys()))
+        writer.writeheader()
+        writer.writerows(results)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="VO-SE プロジェクトJSONをまとめてWAVに書き出す (GUI不要)")
+    parser.add_argument("projects", nargs="+", help="プロジェクトJSONファイル")
+    parser.add_argument("-o", "--out-dir", default="output", help="WAVの出力先フォルダ")
+    parser.add_argument("--character", default=None, help="キャラクターID")
+    parser.add_argument("--audio-dir", default=None, help="キャラクターの音源フォルダ")
+    parser.add_argument("--sample-rate", type=int, default=44100)
+    parser.add_argument("--backend", default=None, choices=["c", "numpy", "auto"], help="合成バックエンド")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="ワーカープロセス数")
+    parser.add_argument("--format", default="wav", choices=["wav", "flac"], help="書き出し形式 (flac は soundfile が必要)")
+    parser.add_argument("--report", default=None, help="ファイルごとの時間計測結果 (.csv / .json)")
+    args = parser.parse_args(argv)
+
+    try:
+        jobs = list(zip(args.projects, output_paths(args.projects, args.out_dir, args.format)))
+    except ValueError as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        return 2
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    results = []
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs), initializer=_init_worker,
+                             initargs=(args.sample_rate, args.backend, args.character, args.audio_dir)) as pool:
+        futures = [pool.submit(_render_file, project, output) for project, output in jobs]
+        for future in as_completed(futures):
+            r = future.result()
+            results.append(r)
+            if r["status"] == "ok":
+                rtf = r["audio_seconds"] / r["render_seconds"] if r["render_seconds"] > 0 else float('inf')
+                print(f"[{len(results)}/{len(jobs)}] {r['output']}  {r['audio_seconds']:.1f}s の音声を {r['render_seconds']:.2f}s で合成 (x{rtf:.1f})")
+            else:
+                print(f"[{len(results)}/{len(jobs)}] 失敗: {r['project']} ({r['error']})", file=sys.stderr)
+    wall = time.perf_counter() - started
+
+    # 入力の順番に並べ直してから保存する
+    order = {project: i for i, (project, _) in enumerate(jobs)}
+    results.sort(key=lambda r: order[r["project"]])
+    if args.report:
+        write_report(args.report, results)
+
+    ok = [r for r in results if r["status"] == "ok"]
+    total_audio = sum(r["audio_seconds"] for r in ok)
+    print(f"完了: {len(ok)}/{len(results)} ファイル, 音声 {total_audio:.1f} 秒 / 経過 {wall:.1f} 秒 "
+          f"(x{total_audio / wall if wall > 0 else 0:.1f} realtime)")
+    return 0 if len(ok) == len(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
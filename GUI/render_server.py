@@ -0,0 +1,381 @@
+# render_server.py
+# 同じマシン上の他のサービスから合成を呼び出すためのローカルサーバー (127.0.0.1 の HTTP)
+# 使い方: python render_server.py --character char_001=audio_data/aoi --port 8765
+#
+#   POST /synthesize  {"character": "char_001", "notes": [...], "pitch_data": [...]}  (プロジェクトJSONと同じ形式)
+#   POST /talk        {"character": "char_001", "text": "こんにちは"}
+#   GET  /metrics     待ち時間・合成時間などの統計
+#   GET  /health
+#
+# 応答は float32 リトルエンディアンのモノラル PCM を chunked で返す (X-Sample-Rate ヘッダー付き)
+
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from data_models import NoteEvent, PitchEvent
+from render_cli import project_from_dict
+
+BATCH_WINDOW_SECONDS = 0.01  # 小さいリクエストをまとめるために待つ時間
+BATCH_MAX_REQUESTS = 8       # 1回の合成にまとめる最大リクエスト数
+SMALL_REQUEST_SECONDS = 5.0  # これより短い曲はまとめて合成する対象
+BATCH_GAP_SECONDS = 1.0      # まとめる時に曲と曲の間に空ける無音（余韻が隣に混ざらないように）
+STREAM_CHUNK_SECONDS = 0.25  # 長い曲を返す時のブロック長
+STREAM_QUEUE_BLOCKS = 8      # 長い曲を返す時に、ワーカーが送信より先に合成しておくブロック数の上限
+_END = object()              # ブロックのキューの終わりの目印
+
+
+class RenderRequest:
+    """キューに積まれる1件分のリクエスト"""
+    def __init__(self, kind: str, payload):
+        self.kind = kind          # "sing" / "talk"
+        self.payload = payload    # sing: (notes, pitch_events), talk: text
+        self.future = Future()    # 結果: np.ndarray か、ブロックを返すイテレータ
+        self.enqueued_at = time.perf_counter()
+        self.started_at = None
+        self.batch_size = 1
+
+    @property
+    def duration(self) -> float:
+        if self.kind != "sing" or not self.payload[0]: return 0.0
+        return max(n.start_time + n.duration for n in self.payload[0])
+
+
+class BlockQueue:
+    """
+    ワーカーが合成したブロックを HTTP スレッドへ渡す上限付きのキュー（HTTP スレッド側ではブロックのイテレータとして使う）
+    送信が追いつかない時はワーカーが put で待つ。close すると（クライアントの切断など）ワーカー側の put が False を返して合成をやめる
+    """
+    def __init__(self, maxsize: int = STREAM_QUEUE_BLOCKS):
+        self._queue = queue.Queue(maxsize=max(1, maxsize))
+        self._cancelled = threading.Event()
+
+    def put(self, item) -> bool:
+        while not self._cancelled.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> np.ndarray:
+        item = self._queue.get()
+        if item is _END:
+            raise StopIteration
+        if isinstance(item, Exception):
+            raise item # ワーカー側の例外をそのまま伝える
+        return item
+
+    def close(self):
+        self._cancelled.set()
+
+
+class LatencyMetrics:
+    """直近のリクエストの待ち時間・合成時間・全体の時間を記録する"""
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=window)
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.batches = 0
+        self.batched_requests = 0
+
+    def record(self, queue_wait: float, render: float, total: float, ok: bool = True):
+        with self._lock:
+            self._samples.append((queue_wait, render, total))
+            if ok:
+                self.completed += 1
+            else:
+                self.failed += 1
+
+    def record_batch(self, size: int):
+        with self._lock:
+            self.batches += 1
+            self.batched_requests += size
+
+    def record_rejected(self):
+        with self._lock:
+            self.rejected += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            data = np.array(self._samples, dtype=np.float64).reshape(-1, 3)
+            result = {
+                "completed": self.completed, "failed": self.failed, "rejected": self.rejected,
+                "batches": self.batches,
+                "mean_batch_size": self.batched_requests / self.batches if self.batches else 0.0,
+            }
+        for i, name in enumerate(("queue_wait_ms", "render_ms", "total_ms")):
+            if data.shape[0]:
+                p50, p95, p99 = np.percentile(data[:, i] * 1000.0, [50, 95, 99])
+                result[name] = {"p50": p50, "p95": p95, "p99": p99, "max": float(data[:, i].max() * 1000.0)}
+            else:
+                result[name] = None
+        return result
+
+
+class CharacterWorker:
+    """
+    キャラクター1人分の常駐エンジンとリクエストキュー
+    キューが満杯の時は受け付けない（アドミッション制御）
+    """
+    def __init__(self, char_id: str, audio_dir: str, sample_rate: int, backend, max_queue: int, metrics: LatencyMetrics):
+        from vo_se_engine import VO_SE_Engine
+        self.char_id = char_id
+        self.metrics = metrics
+        self.engine = VO_SE_Engine(sample_rate=sample_rate, backend=backend)
+        self.engine.load_character(char_id, audio_dir)
+        self.analyzer = None
+        self.queue: queue.Queue[RenderRequest] = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, request: RenderRequest) -> bool:
+        try:
+            self.queue.put_nowait(request)
+            return True
+        except queue.Full:
+            self.metrics.record_rejected()
+            return False
+
+    def _run(self):
+        while True:
+            first = self.queue.get()
+            batch = [first]
+            # 短い歌唱リクエストは、少しだけ待って同じキャラクター宛てのものをまとめる
+            if first.kind == "sing" and first.duration <= SMALL_REQUEST_SECONDS:
+                deadline = time.perf_counter() + BATCH_WINDOW_SECONDS
+                while len(batch) < BATCH_MAX_REQUESTS:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0: break
+                    try:
+                        nxt = self.queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+                    if nxt.kind == "sing" and nxt.duration <= SMALL_REQUEST_SECONDS:
+                        batch.append(nxt)
+                    else:
+                        self._process([nxt]) # まとめられないものはそのまま処理する
+            self._process(batch)
+
+    def _process(self, batch: list[RenderRequest]):
+        now = time.perf_counter()
+        for r in batch:
+            r.started_at = now
+            r.batch_size = len(batch)
+        try:
+            if batch[0].kind == "talk":
+                batch[0].future.set_result(self._render_talk(batch[0].payload))
+            elif len(batch) == 1 and batch[0].duration > SMALL_REQUEST_SECONDS:
+                self._render_stream(batch[0])
+            else:
+                self._render_batch(batch)
+        except Exception as e:
+            for r in batch:
+                if not r.future.done():
+                    r.future.set_exception(e)
+
+    def _render_stream(self, request: RenderRequest):
+        """
+        長い曲は合成しながら返す。合成はこのワーカーのスレッドで行い、ブロックを BlockQueue 経由で HTTP スレッドへ渡す
+        合成し終わる（またはクライアントが切断する）まで次のリクエストを取らないので、長い曲も max_queue の数に入る
+        """
+        notes, pitch_events = request.payload
+        blocks = BlockQueue()
+        request.future.set_result(blocks)
+        stream = self.engine.synthesize_stream(notes, pitch_events, chunk_seconds=STREAM_CHUNK_SECONDS)
+        try:
+            for block in stream:
+                if not blocks.put(block): return # クライアントが切断した
+            blocks.put(_END)
+        except Exception as e:
+            blocks.put(e)
+        finally:
+            stream.close()
+
+    def _render_batch(self, batch: list[RenderRequest]):
+        """複数の短い曲を時間をずらして並べ、1回の合成で済ませてから切り分ける"""
+        if len(batch) > 1:
+            self.metrics.record_batch(len(batch))
+        sr = self.engine.sample_rate
+        all_notes, all_pitch, spans = [], [], []
+        offset = 0.0
+        edge = BATCH_GAP_SECONDS / 2 - 1e-3
+        for r in batch:
+            notes, pitch_events = r.payload
+            for n in notes:
+                all_notes.append(NoteEvent(n.note_number, n.start_time + offset, n.duration, n.velocity, n.lyric, list(n.phonemes)))
+            # 単独で合成した時と同じピッチになるよう、曲の前後の無音部分に最初と最後の値を置いておく
+            bends = sorted(pitch_events, key=lambda p: p.time)
+            first, last = (bends[0].value, bends[-1].value) if bends else (0, 0)
+            all_pitch.append(PitchEvent(offset - edge, first))
+            all_pitch.extend(PitchEvent(p.time + offset, p.value) for p in bends)
+            all_pitch.append(PitchEvent(offset + r.duration + edge, last))
+            spans.append((offset, r.duration))
+            offset += r.duration + BATCH_GAP_SECONDS
+        if not any(r.payload[1] for r in batch):
+            all_pitch = []
+
+        audio = self.engine.synthesize(all_notes, all_pitch)
+        tail = int(BATCH_GAP_SECONDS / 2 * sr)
+        for r, (start, length) in zip(batch, spans):
+            a = int(round(start * sr))
+            b = min(audio.size, int(round((start + length) * sr)) + tail)
+            r.future.set_result(audio[a:b].copy())
+
+    def _render_talk(self, text: str) -> np.ndarray:
+        """テキストを解析して Talk エンジンで合成する"""
+        if self.engine.lib_path is None:
+            raise RuntimeError("Talk の合成には C エンジンが必要です。")
+        if self.analyzer is None:
+            from text_analyzer import TextAnalyzer
+            self.analyzer = TextAnalyzer()
+        events = self.analyzer.analyze(text)
+        if not events:
+            return np.zeros(0, dtype=np.float32)
+        return self.engine.render_talk_sentence(events)
+
+
+class RenderServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, workers: dict[str, CharacterWorker], metrics: LatencyMetrics, sample_rate: int):
+        super().__init__(address, RenderRequestHandler)
+        self.workers = workers
+        self.metrics = metrics
+        self.sample_rate = sample_rate
+
+
+class RenderRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # chunked で返すため
+
+    def log_message(self, format, *args):
+        pass # アクセスログは出さない（統計は /metrics で見る）
+
+    def _send_json(self, status: int, body: dict, headers: dict = None):
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            body = self.server.metrics.snapshot()
+            body["queue_depth"] = {cid: w.queue.qsize() for cid, w in self.server.workers.items()}
+            self._send_json(200, body)
+        elif self.path == "/health":
+            self._send_json(200, {"status": "ok", "characters": list(self.server.workers)})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path not in ("/synthesize", "/talk"):
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            data = json.loads(self.rfile.read(length).decode('utf-8'))
+            worker = self.server.workers.get(data.get("character"))
+            if worker is None:
+                self._send_json(404, {"error": f"unknown character: {data.get('character')}"})
+                return
+            if self.path == "/synthesize":
+                request = RenderRequest("sing", project_from_dict(data))
+            else:
+                request = RenderRequest("talk", data.get("text", ""))
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        if not worker.submit(request):
+            self._send_json(503, {"error": "queue is full"}, {"Retry-After": "1"})
+            return
+
+        try:
+            result = request.future.result()
+        except Exception as e:
+            total = time.perf_counter() - request.enqueued_at
+            self.server.metrics.record(request.started_at - request.enqueued_at if request.started_at else total, 0.0, total, ok=False)
+            self._send_json(500, {"error": str(e)})
+            return
+        self._stream_pcm(request, result)
+
+    def _stream_pcm(self, request: RenderRequest, result):
+        blocks = [result] if isinstance(result, np.ndarray) else result
+        ok = True
+        try:
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("X-Sample-Rate", str(self.server.sample_rate))
+            self.send_header("X-Sample-Format", "float32le")
+            self.send_header("X-Batch-Size", str(request.batch_size))
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            for block in blocks:
+                data = block.astype('<f4', copy=False).tobytes()
+                if data:
+                    self.wfile.write(f"{len(data):X}\r\n".encode('ascii') + data + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            ok = False # クライアントが途中で切断した
+        finally:
+            if hasattr(blocks, "close"):
+                blocks.close() # 合成中のワーカーを止める
+            done = time.perf_counter()
+            self.server.metrics.record(request.started_at - request.enqueued_at, done - request.started_at,
+                                       done - request.enqueued_at, ok=ok)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="VO-SE ローカル合成サーバー")
+    parser.add_argument("--character", action="append", default=[], metavar="ID=AUDIO_DIR",
+                        help="常駐させるキャラクター (複数指定可)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--sample-rate", type=int, default=44100)
+    parser.add_argument("--backend", default=None, choices=["c", "numpy", "auto"])
+    parser.add_argument("--max-queue", type=int, default=32, help="キャラクターごとの待ち行列の上限")
+    args = parser.parse_args(argv)
+
+    if not args.character:
+        parser.error("--character を1つ以上指定してください。")
+
+    metrics = LatencyMetrics()
+    workers = {}
+    for spec in args.character:
+        char_id, _, audio_dir = spec.partition("=")
+        workers[char_id] = CharacterWorker(char_id, audio_dir, args.sample_rate, args.backend, args.max_queue, metrics)
+    if len(workers) > 1 and any(w.engine.backend_name == "c" for w in workers.values()):
+        # C エンジンは音源を1つしか保持できないので、キャラクターごとにサーバーを分けること
+        print("警告: C エンジンでは複数キャラクターを同時に常駐できません。--backend numpy を使うか、キャラクターごとに起動してください。")
+
+    server = RenderServer((args.host, args.port), workers, metrics, args.sample_rate)
+    print(f"VO-SE render server: http://{args.host}:{args.port} ({', '.join(workers)})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
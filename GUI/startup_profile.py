@@ -0,0 +1,116 @@
+# startup_profile.py
+# 起動時間を段階（フェーズ）ごとに計測して表にするツール
+# python -X importtime のモジュール単位の表示に近いが、「PySide6 の読み込み」「エンジンのロード」のような段階ごとにまとめ、
+# 各段階で新しく読み込まれた重いモジュールも併せて表示する
+# 使い方: VOSE_STARTUP_PROFILE=1 python app_main.py  （ファイル名を入れるとそこにも書き出す）
+
+import builtins
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+STARTUP_PROFILE_ENV_VAR = "VOSE_STARTUP_PROFILE"
+TOP_IMPORTS = 8  # 段階ごとに表示する、時間のかかったモジュールの数
+IMPORT_DEPTH = 2 # 何段目の入れ子の import まで記録するか（1 ならその段階で直接 import したものだけ）
+
+
+class StartupProfile:
+    """
+    phase(name) で囲んだ区間の開始時刻・所要時間・実行スレッドを記録する
+    track_imports() の後は、各段階で新しく読み込まれたモジュールの import の時間も記録する（-X importtime の累積時間と同じ）
+    """
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.origin = time.perf_counter()
+        self.phases = [] # (名前, 開始 [秒], 所要時間 [秒], スレッド名, [(モジュール, 秒, 入れ子の深さ), ...])
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._original_import = None
+
+    # --- import の計測 ---
+    def track_imports(self):
+        """builtins.__import__ を差し替えて、初めて読み込むモジュールの時間を記録する"""
+        if not self.enabled or self._original_import is not None: return
+        self._original_import = original = builtins.__import__
+
+        def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+            imports = getattr(self._local, "imports", None)
+            depth = getattr(self._local, "depth", 0)
+            # 計測中の段階の外、深い入れ子の import、読み込み済みのモジュールはそのまま通す
+            if imports is None or depth >= IMPORT_DEPTH or level > 0 or name in sys.modules:
+                return original(name, globals, locals, fromlist, level)
+            self._local.depth = depth + 1
+            started = time.perf_counter()
+            try:
+                return original(name, globals, locals, fromlist, level)
+            finally:
+                self._local.depth = depth
+                imports.append((name, time.perf_counter() - started, depth))
+
+        builtins.__import__ = timed_import
+
+    def stop_tracking_imports(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    # --- 段階の計測 ---
+    @contextmanager
+    def phase(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        outer = getattr(self._local, "imports", None)
+        self._local.imports = imports = []
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self._local.imports = outer
+            with self._lock:
+                self.phases.append((name, started - self.origin, elapsed, threading.current_thread().name, imports))
+
+    def mark(self, name: str):
+        """時刻だけを記録する（「ウィンドウ表示」など）"""
+        if not self.enabled: return
+        with self._lock:
+            self.phases.append((name, time.perf_counter() - self.origin, 0.0, threading.current_thread().name, []))
+
+    # --- 出力 ---
+    def report(self) -> str:
+        with self._lock:
+            phases = sorted(self.phases, key=lambda p: p[1])
+        lines = [f"{'開始 [ms]':>10} {'時間 [ms]':>10}  {'スレッド':<14} 段階"]
+        for name, start, elapsed, thread, imports in phases:
+            lines.append(f"{start * 1000:10.1f} {elapsed * 1000:10.1f}  {thread:<14} {name}")
+            for module, seconds, depth in sorted(imports, key=lambda m: -m[1])[:TOP_IMPORTS]:
+                lines.append(f"{'':10} {seconds * 1000:10.1f}  {'':<14}   {'  ' * depth}import {module}")
+        if phases:
+            end = max(start + elapsed for _, start, elapsed, _, _ in phases)
+            lines.append(f"合計: {end * 1000:.1f} ms")
+        return "\n".join(lines)
+
+    def write(self, destination: str = None):
+        """表を標準出力へ表示し、destination を渡せばファイルにも書き出す"""
+        text = self.report()
+        print(text)
+        if destination:
+            try:
+                with open(destination, 'w', encoding='utf-8') as f:
+                    f.write(text + "\n")
+            except OSError as e:
+                print(f"起動時間の記録を書き出せませんでした: {destination} ({e})")
+
+
+def profile_from_env() -> tuple[StartupProfile, str]:
+    """
+    環境変数 VOSE_STARTUP_PROFILE から計測の有無と書き出し先を決める
+    "1" なら表示だけ、それ以外の値はファイル名として扱う
+    """
+    value = os.environ.get(STARTUP_PROFILE_ENV_VAR, "")
+    enabled = value not in ("", "0")
+    destination = value if enabled and value != "1" else None
+    return StartupProfile(enabled), destination
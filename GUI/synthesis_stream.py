@@ -0,0 +1,113 @@
+# synthesis_stream.py
+# フレーズ単位でワーカースレッドに合成させ、時間順に固定長ブロックとして取り出すためのモジュール
+
+import queue
+import threading
+
+import numpy as np
+
+_END = object() # ワーカー終了の目印
+
+
+def stream_phrases(phrases, render_phrase, sample_rate: int, chunk_samples: int,
+                   max_in_flight: int = 2, start_time: float = 0.0, release=None, total_samples: int = None):
+    """
+    phrases を先頭から順にワーカースレッドで合成し、float32 のブロックを時間順に yield する
+
+    render_phrase(phrase) はフレーズ先頭を 0 サンプル目とした音声を返す関数。
+    合成済みで未消費のフレーズは最大 max_in_flight 個までしか溜めないので、
+    曲の長さに関係なくメモリ使用量は一定に収まる。
+    release(audio) を渡すと、render_phrase が返した音声をブロックへ足し込んだ後に呼ぶ（バッファをプールへ戻すため）
+    total_samples を渡すと、その長さで出力を打ち切る（残りのフレーズは合成しない）
+    """
+    blocks = _stream_blocks(phrases, render_phrase, sample_rate, chunk_samples, max_in_flight, start_time, release)
+    return blocks if total_samples is None else _truncate(blocks, total_samples)
+
+
+def _truncate(blocks, total_samples: int):
+    """ブロックのイテレータを total_samples サンプルで打ち切る"""
+    remaining = total_samples
+    try:
+        if remaining <= 0: return
+        for block in blocks:
+            if block.size > remaining:
+                block = block[:remaining]
+            remaining -= block.size
+            yield block
+            if remaining <= 0: return
+    finally:
+        blocks.close() # 合成ワーカーも止める
+
+
+def _stream_blocks(phrases, render_phrase, sample_rate: int, chunk_samples: int,
+                   max_in_flight: int, start_time: float, release):
+    results = queue.Queue(maxsize=max(1, max_in_flight))
+    cancelled = threading.Event()
+
+    def put(item):
+        # 消費側が途中でやめた場合に備えて、待ちながらキャンセルを確認する
+        while not cancelled.is_set():
+            try:
+                results.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def worker():
+        try:
+            for phrase in phrases:
+                if cancelled.is_set(): return
+                audio = render_phrase(phrase)
+                offset = int(round((phrase.start_time - start_time) * sample_rate))
+                if not put((offset, audio)): return
+        except Exception as e:
+            put((None, e))
+        finally:
+            put(_END)
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+
+    pending = np.zeros(0, dtype=np.float32) # emitted サンプル目以降のまだ出していない音声
+    emitted = 0
+    try:
+        while True:
+            item = results.get()
+            if item is _END: break
+            offset, audio = item
+            if offset is None: raise audio # ワーカー側の例外をそのまま伝える
+
+            # フレーズは開始時刻順なので、このフレーズより前の区間はもう確定している
+            while emitted + chunk_samples <= offset:
+                block, pending = _take(pending, chunk_samples)
+                emitted += chunk_samples
+                yield block
+
+            # 確定していない区間に足し込む（既に出した部分にかかる先頭は捨てる）
+            skip = max(0, emitted - offset)
+            if skip < audio.size:
+                local = offset + skip - emitted
+                needed = local + audio.size - skip
+                if pending.size < needed:
+                    pending = np.concatenate([pending, np.zeros(needed - pending.size, dtype=np.float32)])
+                pending[local:needed] += audio[skip:]
+            if release is not None:
+                release(audio)
+
+        # 残りを全て出す（最後のブロックだけ短くなる）
+        while pending.size > 0:
+            block, pending = _take(pending, min(chunk_samples, pending.size))
+            yield block
+    finally:
+        cancelled.set()
+        thread.join(timeout=0.5)
+
+
+def _take(pending: np.ndarray, n: int):
+    """pending の先頭 n サンプルを取り出す（足りない分は無音）"""
+    if pending.size >= n:
+        return pending[:n].copy(), pending[n:]
+    block = np.zeros(n, dtype=np.float32)
+    block[:pending.size] = pending
+    return block, np.zeros(0, dtype=np.float32)
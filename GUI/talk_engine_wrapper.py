@@ -1,5 +1,13 @@
 import ctypes
 import os
+import tempfile
+from dataclasses import fields
+
+import numpy as np
+
+from data_models import PhonemeEvent
+
+TALK_TAIL_SECONDS = 0.5 # 音素の長さの合計に足しておく余白（出力バッファの見積もり用）
 
 # C言語側の構造体定義と合わせる (重要)
 class C_PhonemeEvent(ctypes.Structure):
@@ -20,8 +28,18 @@ class TalkEngineWrapper:
             ctypes.POINTER(C_PhonemeEvent), # イベント配列
             ctypes.c_int              # イベント数
         ]
+        # execute_talk_render_into(events, count, sample_rate, float*, capacity) -> int
+        # 古いビルドのエンジンには無いので、ある場合だけ使う（無ければ一時WAV経由）
+        try:
+            self.lib.execute_talk_render_into.argtypes = [
+                ctypes.POINTER(C_PhonemeEvent), ctypes.c_int, ctypes.c_int, ctypes.POINTER(ctypes.c_float), ctypes.c_int
+            ]
+            self.lib.execute_talk_render_into.restype = ctypes.c_int
+            self.has_render_into = True
+        except AttributeError:
+            self.has_render_into = False
 
-    def render_sentence(self, phoneme_events, output_path):
+    def _to_c_array(self, phoneme_events):
         # PythonのクラスをC用の構造体配列に変換
         count = len(phoneme_events)
         c_array = (C_PhonemeEvent * count)()
@@ -32,6 +50,66 @@ class TalkEngineWrapper:
             c_array[i].duration = py_ev.duration
             c_array[i].lyric = py_ev.lyric.encode('utf-8')
             c_array[i].formant_shift = py_ev.formant_shift
+        return c_array, count
 
+    def render_sentence(self, phoneme_events, output_path):
+        c_array, count = self._to_c_array(phoneme_events)
         # C言語エンジンのレンダリング関数を呼び出し
         self.lib.execute_talk_render(output_path.encode('utf-8'), c_array, count)
+
+    def render_sentence_to_array(self, phoneme_events, sample_rate: int, out: np.ndarray = None) -> np.ndarray:
+        """
+        1文をメモリ上の float32 配列へ直接合成する（ファイルを書かない）
+        out を渡すとそこへ書き込み、書いた範囲のビューを返す（足りなければ新しく確保し直す）
+        """
+        if not phoneme_events:
+            return np.zeros(0, dtype=np.float32)
+        c_array, count = self._to_c_array(phoneme_events)
+        if out is None:
+            seconds = sum(ev.duration for ev in phoneme_events) + TALK_TAIL_SECONDS
+            out = np.empty(int(seconds * sample_rate), dtype=np.float32)
+        written = self._render_into(c_array, count, sample_rate, out)
+        if written < 0:
+            # 見積もりが足りなかった時は、エンジンが返した必要サイズで1度だけ確保し直す
+            needed = -written
+            if needed <= out.size:
+                raise RuntimeError(f"Talk の合成に失敗しました: 必要サイズ {needed} がバッファ {out.size} 以下です")
+            out = np.empty(needed, dtype=np.float32)
+            written = self._render_into(c_array, count, sample_rate, out)
+            if written < 0:
+                raise RuntimeError(f"Talk の合成に失敗しました: 確保し直したバッファ ({out.size}) でも {-written} サンプル必要です")
+        return out[:written]
+
+    def _render_into(self, c_array, count: int, sample_rate: int, out: np.ndarray) -> int:
+        ptr = out.ctypes.data_as(ctypes.POINTER(ctypes.c_float))
+        return self.lib.execute_talk_render_into(c_array, count, sample_rate, ptr, out.size)
+
+    def render_sentence_audio(self, phoneme_events, sample_rate: int = None) -> tuple[np.ndarray, int]:
+        """
+        1文を合成して (float32 の音声, サンプリング周波数) を返す
+        sample_rate を渡し、エンジンが render-into に対応していればメモリ上で直接合成する。
+        古いエンジンでは C エンジンが書いた一時 WAV を読み込む
+        """
+        from voicebank_store import read_wav_header, decode_pcm
+        if not phoneme_events:
+            return np.zeros(0, dtype=np.float32), 0
+        if self.has_render_into and sample_rate:
+            return self.render_sentence_to_array(phoneme_events, sample_rate), sample_rate
+        fd, path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        try:
+            self.render_sentence(phoneme_events, path)
+            info = read_wav_header(path)
+            with open(path, 'rb') as f:
+                return decode_pcm(f.read(), info).copy(), info.sample_rate
+        finally:
+            os.remove(path)
+
+
+def phoneme_events_from_dicts(events: list) -> list[PhonemeEvent]:
+    """TextAnalyzer.analyze が返す辞書のリストを PhonemeEvent のリストに変換する"""
+    names = {f.name for f in fields(PhonemeEvent)}
+    return [
+        ev if isinstance(ev, PhonemeEvent) else PhonemeEvent(**{k: v for k, v in ev.items() if k in names})
+        for ev in events
+    ]
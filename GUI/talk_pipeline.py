@@ -0,0 +1,106 @@
+# talk_pipeline.py
+# 長い文章の Talk を「解析 → 合成 → 再生」の3段で文ごとに流すパイプライン
+# N 文目を再生している間に N+1 文目を合成し、N+2 文目を解析する
+# 段の間のキューは小さく固定しているので、本1冊分の文章でもメモリ使用量は一定
+
+import queue
+import threading
+
+import numpy as np
+
+SENTENCE_GAP_SECONDS = 0.15 # 文と文の間に入れる無音
+_END = object()
+
+
+class TalkPipeline:
+    """
+    analyzer は TextAnalyzer（analyze_many を使う）、render_sentence(events) は1文を float32 の音声にする関数
+    stream(text) が返すイテレータをそのまま VO_SE_Engine.play_stream に渡せば、最初の1文の合成が終わった時点で鳴り始める
+    """
+    def __init__(self, analyzer, render_sentence, sample_rate: int = 44100,
+                 analyze_ahead: int = 1, render_ahead: int = 1, gap_seconds: float = SENTENCE_GAP_SECONDS):
+        self.analyzer = analyzer
+        self.render_sentence = render_sentence
+        self.sample_rate = sample_rate
+        self.analyze_ahead = analyze_ahead
+        self.render_ahead = render_ahead
+        self.gap_seconds = gap_seconds
+        self.on_sentence = None # 文が鳴り始める直前に (文の番号, 文, 音素イベント, 読み上げ先頭からの開始秒) で呼ばれる（再生スレッドから）
+
+    def stream(self, text: str):
+        """文ごとの音声ブロックを順に yield する。途中でやめる（close する）と解析・合成も止まる"""
+        analyzed = queue.Queue(maxsize=max(1, self.analyze_ahead))
+        rendered = queue.Queue(maxsize=max(1, self.render_ahead))
+        cancelled = threading.Event()
+
+        def put(q, item):
+            # 消費側が途中でやめた場合に備えて、待ちながらキャンセルを確認する
+            while not cancelled.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def get(q):
+            while not cancelled.is_set():
+                try:
+                    return q.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+            return _END
+
+        def analyze_stage():
+            sentences = self.analyzer.analyze_many(text)
+            try:
+                for index, (sentence, events) in enumerate(sentences):
+                    if not put(analyzed, (index, sentence, events)): return
+            except Exception as e:
+                put(analyzed, (None, None, e))
+            finally:
+                sentences.close() # 途中でやめた時は、まだ始まっていない解析を取り消す
+                put(analyzed, _END)
+
+        def render_stage():
+            try:
+                while True:
+                    item = get(analyzed)
+                    if item is _END: break
+                    index, sentence, events = item
+                    if index is None:
+                        put(rendered, (None, None, events, None)) # 解析の例外をそのまま渡す
+                        break
+                    audio = self.render_sentence(events) if events else np.zeros(0, dtype=np.float32)
+                    if not put(rendered, (index, sentence, events, audio)): return
+            except Exception as e:
+                put(rendered, (None, None, e, None))
+            finally:
+                put(rendered, _END)
+
+        threads = [threading.Thread(target=analyze_stage, daemon=True), threading.Thread(target=render_stage, daemon=True)]
+        for t in threads:
+            t.start()
+
+        gap = np.zeros(int(self.gap_seconds * self.sample_rate), dtype=np.float32)
+        try:
+            first = True
+            position = 0 # ここまでに yield したサンプル数
+            while True:
+                item = get(rendered)
+                if item is _END: break
+                index, sentence, events, audio = item
+                if index is None: raise events # 解析・合成の例外をそのまま伝える
+                if audio.size == 0: continue
+                if not first and gap.size:
+                    yield gap
+                    position += gap.size
+                first = False
+                if self.on_sentence is not None:
+                    self.on_sentence(index, sentence, events, position / self.sample_rate)
+                yield audio
+                position += audio.size
+        finally:
+            cancelled.set()
+            for t in threads:
+                t.join(timeout=0.5)
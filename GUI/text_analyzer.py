@@ -1,7 +1,11 @@
 import os
+import re
 import sys
-import pyopenjtalk
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import lru_cache
 import numpy as np
+from analysis_cache import AnalysisCache, analysis_key, normalize_text
 
 def get_resource_path(relative_path):
     """実行ファイル化してもパスが通るようにするヘルパー関数"""
@@ -9,18 +13,156 @@ def get_resource_path(relative_path):
         return os.path.join(sys._MEIPASS, relative_path)
     return os.path.join(os.path.abspath("."), relative_path)
 
+# 文の区切り（句点・感嘆符・疑問符・改行）。記号は前の文に含める
+_SENTENCE_END = re.compile(r'[^。！？!?\n]*[。！？!?]+|[^。！？!?\n]+')
+
+
+def split_sentences(text: str) -> list[str]:
+    """長い文章を文ごとに分ける（空の行は捨てる）"""
+    return [s.strip() for s in _SENTENCE_END.findall(text) if s.strip()]
+
+
+# --- ワーカープロセス側 ---
+_worker_analyzer = None # 各ワーカーで1度だけ作る解析器
+
+
+def _init_worker(settings: dict):
+    """ワーカー起動時に解析器を作り、pyopenjtalk の辞書を1度だけ読み込んでおく"""
+    global _worker_analyzer
+    _worker_analyzer = TextAnalyzer(use_cache=False)
+    for name, value in settings.items():
+        setattr(_worker_analyzer, name, value)
+    try:
+        import pyopenjtalk
+        pyopenjtalk.extract_fullcontext("あ")
+    except Exception as e:
+        print(f"pyopenjtalk の初期化に失敗しました: {e}")
+
+
+@lru_cache(maxsize=None)
+def _pyopenjtalk_version() -> str:
+    # pyopenjtalk 本体は import せずにパッケージ情報から調べる（キャッシュに当たれば読み込まずに済む）
+    try:
+        from importlib.metadata import version
+        return version("pyopenjtalk")
+    except Exception:
+        return "unknown"
+
+
+def _analyze_in_worker(sentence: str) -> list:
+    return _worker_analyzer.analyze(sentence)
+
+
 class TextAnalyzer:
-    def __init__(self):
+    def __init__(self, cache: AnalysisCache = None, use_cache: bool = True):
         # 辞書フォルダのパスを設定
         self.dict_path = get_resource_path("dict")
-        
+        # 解析の設定（キャッシュのキーにも含める）
+        self.phoneme_duration = 0.12
+        self.base_pitch = 60
+        # 同じ文章を何度も解析しないためのキャッシュ（複数の TextAnalyzer で共有もできる）
+        self.cache = cache if cache is not None else AnalysisCache() if use_cache else None
+        self.max_workers = None # analyze_many のプロセス数（None なら CPU 数）
+        self._pool = None
+        self._pool_settings = None
+
+    @property
+    def dict_version(self) -> str:
+        """辞書が変わったらキャッシュを使わないように、pyopenjtalk のバージョンと辞書の場所をキーに入れる"""
+        return f"{_pyopenjtalk_version()}:{self.dict_path}"
+
+    def settings(self) -> dict:
+        return {"phoneme_duration": self.phoneme_duration, "base_pitch": self.base_pitch}
+
     def analyze(self, text):
         """
         テキストを解析して、VO-SEエンジンが使える音素・ピッチデータのリストを返す
+        同じテキスト（NFKC 正規化後）・同じ設定なら、キャッシュから同じ結果を返す
+        """
+        text = normalize_text(text)
+        if self.cache is None:
+            return self._analyze_uncached(text)
+
+        key = analysis_key(text, self.dict_version, self.settings())
+        events = self.cache.get(key)
+        if events is None:
+            events = self._analyze_uncached(text)
+            if events: # 解析に失敗した時は覚えない
+                self.cache.put(key, events)
+        return events
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        """ワーカープールは使い回す（pyopenjtalk の初期化はワーカーごとに1度だけ）。設定が変わったら作り直す"""
+        settings = self.settings()
+        if self._pool is not None and self._pool_settings != settings:
+            self.close()
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_worker, initargs=(settings,))
+            self._pool_settings = settings
+        return self._pool
+
+    def analyze_many(self, text_or_sentences, window: int = None):
         """
+        長い文章を文ごとに分けて複数プロセスで解析し、(文, 音素イベントのリスト) を文の順に yield する
+        先頭の文から順に、解析が終わり次第返すので、全体の解析を待たずに表示・合成を始められる
+        先読みは window 文まで（省略時はワーカー数の2倍）なので、長い文章でもメモリ使用量は一定
+        各文のイベントは文の先頭を 0 秒とした時刻になる
+        """
+        if isinstance(text_or_sentences, str):
+            sentences = split_sentences(text_or_sentences)
+        else:
+            sentences = [normalize_text(s) for s in text_or_sentences]
+        if not sentences: return
+        if len(sentences) == 1:
+            # 1文だけならプロセスを起こすより直接解析した方が速い
+            yield sentences[0], self.analyze(sentences[0])
+            return
+
+        window = window or 2 * (self.max_workers or os.cpu_count() or 1)
+        pool = None
+        pending = deque() # (文, キー, イベントのリスト か 解析中の Future)
+        next_index = 0
+        try:
+            while pending or next_index < len(sentences):
+                while next_index < len(sentences) and len(pending) < window:
+                    sentence = sentences[next_index]
+                    next_index += 1
+                    key = analysis_key(normalize_text(sentence), self.dict_version, self.settings()) if self.cache else None
+                    events = self.cache.get(key) if self.cache else None
+                    if events is None:
+                        # キャッシュにある文はワーカーに送らない
+                        pool = pool or self._get_pool()
+                        events = pool.submit(_analyze_in_worker, normalize_text(sentence))
+                    pending.append((sentence, key, events))
+
+                sentence, key, events = pending.popleft()
+                if isinstance(events, Future):
+                    try:
+                        events = events.result()
+                    except Exception as e:
+                        print(f"解析エラー: {e}")
+                        events = []
+                    if events and self.cache is not None:
+                        self.cache.put(key, events)
+                yield sentence, events
+        finally:
+            # 途中でやめた場合は、まだ始まっていない解析を取り消す
+            for _, _, events in pending:
+                if isinstance(events, Future):
+                    events.cancel()
+
+    def close(self):
+        """analyze_many のワーカープロセスを終了する"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            self._pool_settings = None
+
+    def _analyze_uncached(self, text):
         # 1. 音素と抑揚の抽出
         # labelsには詳細な情報、featuresには[音素, タイミング, 抑揚]の簡易データが入る
         try:
+            import pyopenjtalk # 読み込みが重いので、実際に解析する時まで遅らせる
             # 日本語テキストを解析
             fullcontext = pyopenjtalk.extract_fullcontext(text)
             # 簡易的な音素・ピッチ情報の取得
@@ -43,12 +185,12 @@ class TextAnalyzer:
                 p_name = 'pau' # 無音系はpauに統一
             
             # 音の長さの計算
-            duration = 0.12 # デフォルト
+            duration = self.phoneme_duration # デフォルト
             
             # アクセント（抑揚）の計算
             # 62(D4)を高い音、60(C4)を低い音として初期設定
             # 本来はOpenJTalkのアクセント句情報から数値を算出
-            pitch = 60
+            pitch = self.base_pitch
             
             event = {
                 "lyric": p_name,
@@ -9,7 +9,7 @@ from PySide6.QtWidgets import QWidget, QApplication, QInputDialog, QLineEdit
 from PySide6.QtWidgets import QWidget
 from PySide6.QtCore import Qt, Signal
 from data_models import NoteEvent
-from janome.tokenizer import Tokenizer
+from tokenizer_service import get_tokenizer_service
 from PySide6.QtCore import Qt, Signal, Slot
 from PySide6.QtGui import QMouseEvent, QPaintEvent
 from PySide6.QtGui import QMouseEvent, QPaintEvent, QPainter
@@ -27,59 +27,8 @@ class TimelineWidget(QWidget):
     zoom_changed_signal = Signal()
     vertical_zoom_changed_signal = Signal()
     notes_changed_signal = Signal()
+    note_preview_requested = Signal(int) # ノートをクリック・上下に動かした時の音程（プレビュー音を鳴らす）
  
-    def __init__(self, parent=None):
-   def __init__(self, parent=None):
-        super().__init__(parent)
-        self.engine = VoSeEngineWrapper()
-        self.pixels_per_second = 100
-        self.note_height = 20  # 1音階の高さ
-        self.base_midi = 84    # 上端の音程(C5)
-        self.notes = []
-
-    def y_to_midi(self, y):
-        return self.base_midi - (y // self.note_height)
-
-    def mousePressEvent(self, event):
-        # クリックした場所の音程を取得
-        midi_note = self.y_to_midi(event.position().y())
-        
-        # エンジンに音程を伝えて音を出す（プレビュー）
-        self.engine.set_pitch(midi_note)
-        self.engine.play_preview() 
-        self.update()
-
-    def paintEvent(self, event):
-        painter = QPainter(self)
-        # 背景（ピアノロール風の横線）
-        self._draw_piano_roll_grid(painter)
-        
-        for note in self.notes:
-            # note.pitch にMIDI番号が入っている想定
-            x = int(note.start_time * self.pixels_per_second)
-            y = self.midi_to_y(note.pitch)
-            width = int(note.duration * self.pixels_per_second)
-            
-            rect = QRect(x, y, width, self.note_height)
-            painter.setBrush(QColor(150, 200, 255))
-            painter.drawRect(rect)
-            painter.drawText(rect, Qt.AlignmentFlag.AlignCenter, note.lyric)
-
-    def _draw_piano_roll_grid(self, painter):
-        painter.setPen(QPen(QColor(230, 230, 230), 1))
-        for i in range(0, self.height(), self.note_height):
-            painter.drawLine(0, i, self.width(), i)
-
-    def mouseReleaseEvent(self, event):
-        # クリックした位置から音程を特定
-        midi_note = self.y_to_midi(int(event.position().y()))
-        print(f"選択された音程: MIDI {midi_note}")
-        
-        # 【重要】ここでC言語エンジンへ音程変更を通知する
-        # self.engine.set_pitch(midi_note) 
-        # self.engine.render_preview()
-
-
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setMinimumSize(400, 200)
@@ -95,6 +44,7 @@ class TimelineWidget(QWidget):
         self.scroll_y_offset = 0
         self.tempo = 120
         self._current_playback_time = 0.0
+        self.playback_clock = None # 再生中はこの PlaybackClock からカーソル位置を読む
         
         self.edit_mode = None
         self.drag_start_pos = None
@@ -107,20 +57,15 @@ class TimelineWidget(QWidget):
         self.is_recording = False
         self.recording_start_system_time = 0.0
         self.open_recorded_notes = {}
-        self.tokenizer = Tokenizer() 
+        # janome はプロセスで1つだけ。辞書はここからバックグラウンドで読み込み始める
+        self.tokenizer_service = get_tokenizer_service()
+        self.tokenizer_service.start_loading()
 
     #---  ---
 
     def _get_yomi_from_lyrics(self, lyrics: str) -> list[str]:
-        tokens = self.tokenizer.tokenize(lyrics)
-        yomi_list = []
-        for token in tokens:
-            # janomeの feature には '読み' が含まれている
-            yomi = token.read
-            if yomi:
-                # カタカナ1文字ずつに分割してリストに追加
-                yomi_list.extend(list(yomi))
-        return yomi_list
+        # 読みをカタカナ1文字ずつのリストで返す（同じ歌詞は覚えておいた結果を使う）
+        return self.tokenizer_service.reading(lyrics)
  
     # --- SEKOIAとヘルパー関数の愉快な仲間達---
     def seconds_to_beats(self, seconds: float) -> float:
@@ -150,6 +95,11 @@ class TimelineWidget(QWidget):
         self._current_playback_time = time_in_seconds
         self.update()
  
+    def set_playback_clock(self, clock):
+        """再生中のカーソル位置を読む PlaybackClock を設定する（None で解除）"""
+        self.playback_clock = clock
+        self.update()
+ 
     def set_notes(self, new_notes: list[NoteEvent]):
         self.notes_list = new_notes
         self.update()
@@ -281,7 +231,8 @@ class TimelineWidget(QWidget):
                 text_rect = QRect(int(start_x + 2), int(y_pos), int(width - 4), int(height))
                 painter.drawText(text_rect, Qt.AlignLeft | Qt.AlignVCenter | Qt.ElideRight, note.lyrics)
             
-        playback_beats = self.seconds_to_beats(self._current_playback_time)
+        cursor_time = self.playback_clock.seconds() if self.playback_clock is not None else self._current_playback_time
+        playback_beats = self.seconds_to_beats(cursor_time)
         cursor_x = (playback_beats * self.pixels_per_beat) - self.scroll_x_offset
         if cursor_x >= 0 and cursor_x <= self.width():
             painter.setPen(QPen(QColor(255, 50, 50), 2)) # 再生カーソル（赤）
@@ -318,6 +269,7 @@ class TimelineWidget(QWidget):
                     self.drag_start_pos = clicked_point
                     self.drag_start_note_pos = {'start': note.start_time, 'duration': note.duration, 'pitch': note.note_number}
                     self.edit_mode = 'resize' if abs(clicked_point.x() - (start_x + width)) < 5 else 'move'
+                    self.note_preview_requested.emit(note.note_number)
                     break
             if not clicked_on_note:
                 if not self.is_additive_selection_mode:
@@ -334,7 +286,10 @@ class TimelineWidget(QWidget):
                 delta_beats = delta_x / self.pixels_per_beat
                 delta_pitch = round(delta_y / self.key_height_pixels)
                 self.target_note.start_time = self.beats_to_seconds(self.seconds_to_beats(self.drag_start_note_pos['start']) + delta_beats)
-                self.target_note.note_number = self.drag_start_note_pos['pitch'] - delta_pitch
+                new_pitch = self.drag_start_note_pos['pitch'] - delta_pitch
+                if new_pitch != self.target_note.note_number:
+                    self.note_preview_requested.emit(new_pitch)
+                self.target_note.note_number = new_pitch
             elif self.edit_mode == 'resize' and self.target_note:
                 delta_x = event.position().x() - self.drag_start_pos.x()
                 delta_beats = delta_x / self.pixels_per_beat
@@ -0,0 +1,135 @@
+# tokenizer_service.py
+# プロセス全体で1つだけ持つ janome の形態素解析サービス
+# 辞書の読み込みは数秒かかり、メモリも大きいので、最初に必要になった時にバックグラウンドで1度だけ読み込む
+# 歌詞 → 読み / 分かち書き の結果は覚えておき、同じ歌詞は解析し直さない
+
+import threading
+from collections import OrderedDict
+
+
+class TokenizerService:
+    """
+    janome の Tokenizer を遅延読み込みして共有する
+    start_loading() で先にバックグラウンド読み込みを始めておけば、最初の問い合わせで待たずに済む
+    """
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._tokenizer = None
+        self._load_error = None
+        self._ready = threading.Event()
+        self._load_lock = threading.Lock()
+        self._loader = None
+        self._tokenize_lock = threading.Lock() # janome の Tokenizer はスレッドセーフではない
+        self._readings: OrderedDict[str, tuple] = OrderedDict()
+        self._surfaces: OrderedDict[str, tuple] = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    # --- 読み込み ---
+    def start_loading(self):
+        """辞書の読み込みをバックグラウンドで始める（何度呼んでも1度だけ）"""
+        with self._load_lock:
+            if self._loader is not None: return
+            self._loader = threading.Thread(target=self._load, daemon=True)
+            self._loader.start()
+
+    def _load(self):
+        try:
+            from janome.tokenizer import Tokenizer # import だけでも重いので、ここまで遅らせる
+            self._tokenizer = Tokenizer()
+        except Exception as e:
+            self._load_error = e
+            print(f"janome の読み込みに失敗しました: {e}")
+        finally:
+            self._ready.set()
+
+    @property
+    def is_ready(self) -> bool:
+        return self._ready.is_set() and self._tokenizer is not None
+
+    def wait_ready(self, timeout: float = None) -> bool:
+        """読み込みが終わるまで待つ（まだ始まっていなければ始める）"""
+        self.start_loading()
+        return self._ready.wait(timeout) and self._tokenizer is not None
+
+    def _tokenize(self, text: str) -> list:
+        if not self.wait_ready():
+            raise RuntimeError(f"janome が使えません: {self._load_error}")
+        with self._tokenize_lock:
+            return list(self._tokenizer.tokenize(text))
+
+    # --- 問い合わせ ---
+    def _lookup(self, table: OrderedDict, key: str):
+        with self._cache_lock:
+            value = table.get(key)
+            if value is not None:
+                table.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+            return value
+
+    def _store(self, table: OrderedDict, key: str, value: tuple):
+        with self._cache_lock:
+            table[key] = value
+            table.move_to_end(key)
+            while len(table) > self.max_entries:
+                table.popitem(last=False)
+
+    def reading(self, lyric: str) -> list[str]:
+        """歌詞の読みをカタカナ1文字ずつのリストで返す（"こんにちは" → ["コ", "ン", "ニ", "チ", "ハ"]）"""
+        if not lyric: return []
+        value = self._lookup(self._readings, lyric)
+        if value is None:
+            value = tuple(ch for token in self._tokenize(lyric) for ch in _token_reading(token))
+            self._store(self._readings, lyric, value)
+        return list(value)
+
+    def surfaces(self, lyric: str) -> list[str]:
+        """歌詞を分かち書きした単語のリストを返す（MIDI の歌詞メタイベント用）"""
+        if not lyric: return []
+        value = self._lookup(self._surfaces, lyric)
+        if value is None:
+            value = tuple(token.surface for token in self._tokenize(lyric))
+            self._store(self._surfaces, lyric, value)
+        return list(value)
+
+    def readings_many(self, lyrics: list[str]) -> list[list[str]]:
+        """複数の歌詞の読みをまとめて返す（同じ歌詞は1度だけ解析する）"""
+        unique = {lyric: self.reading(lyric) for lyric in dict.fromkeys(lyrics)}
+        return [list(unique[lyric]) for lyric in lyrics]
+
+    def surfaces_many(self, lyrics: list[str]) -> list[list[str]]:
+        """複数の歌詞の分かち書きをまとめて返す（同じ歌詞は1度だけ解析する）"""
+        unique = {lyric: self.surfaces(lyric) for lyric in dict.fromkeys(lyrics)}
+        return [list(unique[lyric]) for lyric in lyrics]
+
+    def stats(self) -> dict:
+        with self._cache_lock:
+            return {"ready": self.is_ready, "entries": len(self._readings) + len(self._surfaces),
+                    "hits": self.hits, "misses": self.misses}
+
+    def clear(self):
+        with self._cache_lock:
+            self._readings.clear()
+            self._surfaces.clear()
+
+
+def _token_reading(token) -> str:
+    # 辞書に読みが無い語（記号・未知語）は "*" になるので、表層形をそのまま使う
+    reading = getattr(token, "reading", "")
+    return reading if reading and reading != "*" else token.surface
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_tokenizer_service() -> TokenizerService:
+    """プロセス全体で共有するサービスを返す（辞書はまだ読み込まない）"""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = TokenizerService()
+        return _service
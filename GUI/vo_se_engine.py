@@ -4,21 +4,33 @@ import ctypes
 import os
 import platform
 import numpy as np
-import pyaudio
 from data_models import NoteEvent, PitchEvent, CharacterInfo
-import ctypes
+from buffer_pool import OutputBufferPool
+import c_marshal
+from render_cache import split_into_phrases, split_long_phrase
+from synthesis_stream import stream_phrases
+from parallel_export import render_parallel, max_difference
+from wav_exporter import write_blocks
+from numpy_backend import NumpySynthBackend
+from character_pool import CharacterPool
+from pitch_curve import PitchCurveCache
+from audio_output import AudioOutput
+from preview_cache import PreviewCache, PREVIEW_LYRIC
+from resampler import DEFAULT_QUALITY as DEFAULT_RESAMPLE_QUALITY, resample
+from talk_engine_wrapper import TalkEngineWrapper, phoneme_events_from_dicts
 import math
 import sys
+import threading
+import weakref
 
 def get_resource_path(relative_path):
     # PyInstallerが展開する一時フォルダのパス、または通常実行時のパスを取得
     base_path = getattr(sys, '_MEIPASS', os.path.abspath("."))
     return os.path.join(base_path, relative_path)
 
-# DLLの読み込み部分
+# DLLの場所（読み込みは VO_SE_Engine を作った時に行う。import しただけでは何もしない）
 dll_name = "engine.dll" if os.name == 'nt' else "engine.dylib"
 dll_path = get_resource_path(f"VO_SE_engine_C/lib/{dll_name}")
-self.lib = ctypes.CDLL(dll_path)
 if getattr(sys, 'frozen', False):
     # インストーラー（実行ファイル）として動いている場合
     base_dir = sys._MEIPASS
@@ -78,9 +90,9 @@ class VoSeEngineWrapper:
         print(f"DEBUG: 周波数 {hz:.2f}Hz をエンジンに送信")
         self.lib.set_frequency(hz)
     def set_talk_pitch(self, start_hz, end_hz):
-    """C言語エンジンに対して滑らかなピッチ変化を命令する"""
-    # 既存の engine.dll に追加した関数を呼び出す
-    self.lib.set_pitch_range(ctypes.c_float(start_hz), ctypes.c_float(end_hz))
+        """C言語エンジンに対して滑らかなピッチ変化を命令する"""
+        # 既存の engine.dll に追加した関数を呼び出す
+        self.lib.set_pitch_range(ctypes.c_float(start_hz), ctypes.c_float(end_hz))
 
     
 
@@ -109,83 +121,6 @@ lib_path = os.path.join(base, "VO_SE_engine_C", "lib", f"engine{ext}")
 # 音源フォルダのパスを結合
 audio_dir = os.path.join(base, "audio_data")
 
-print(f"Loading Engine from: {lib_path}")
-print(f"Audio Data Path: {audio_dir}")
-
-
-
-class VO_SE_Engine:
-    def __init__(self, sample_rate: int = 44100):
-        self.sample_rate = sample_rate
-        self.active_character_id = None
-        self._keep_alive = []  # C側へ渡すデータのメモリ解放を防ぐ
-
-        # --- 1. C 言語ライブラリ (.dylib / .dll) のパスを特定 ---
-        # OS に応じて拡張子を自動判別
-        ext = ".dylib" if platform.system() == "Darwin" else ".dll"
-        # ライブラリの保存場所（VO_SE_engine_C/lib/ 内）を指定
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        lib_path = os.path.join(base_dir, "../VO_SE_engine_C/lib/engine" + ext)
-
-        # --- 2. ライブラリを Python にロード ---
-        try:
-            # これが「連絡口」を開く核心の処理です
-            self.lib = ctypes.CDLL(lib_path)
-            
-            # C 言語の関数の「引数」と「戻り値」の型を Python に教えてあげる (大事！)
-            self._setup_c_interfaces()
-            print(f"C-Engine Loaded Successfully: {lib_path}")
-        except Exception as e:
-            print(f"C-Engine Load Error: {e}")
-            print("注意: 先に 'make' 等で C 言語をビルドして engine" + ext + " を作成してください。")
-
-        # --- 3. 音声再生用 (PyAudio) の初期化 ---
-        self.pyaudio_instance = pyaudio.PyAudio()
-
-    def _setup_c_interfaces(self):
-        """C 言語の関数を Python で正しく呼べるように設定する"""
-        # init_engine(char* char_id, char* audio_dir)
-        self.lib.init_engine.argtypes = [ctypes.c_char_p, ctypes.c_char_p]
-        self.lib.init_engine.restype = ctypes.c_int
-
-        # request_synthesis_full(...) -> float*
-        from .vo_se_engine import SynthesisRequest # 構造体定義
-        self.lib.request_synthesis_full.argtypes = [SynthesisRequest, ctypes.POINTER(ctypes.c_int)]
-        self.lib.request_synthesis_full.restype = ctypes.POINTER(ctypes.c_float)
-
-        # vse_free_buffer(float*)
-        self.lib.vse_free_buffer.argtypes = [ctypes.POINTER(ctypes.c_float)]
-        self.lib.vse_free_buffer.restype = None
-
-
-    def switch_character(self, char_id: str):
-        """
-        GUIから選ばれたIDを元に、Cエンジンへ切り替えを指示する
-        """
-        if char_id not in self.available_characters:
-            print(f"エラー: {char_id} というキャラクターは名簿にありません。")
-            return False
-        
-        char = self.available_characters[char_id]
-        
-        # パスを絶対パスに変換（C言語側で確実に読み込むため）
-        abs_path = os.path.abspath(char.audio_dir)
-        
-        # C言語の init_engine(char* id, char* dir) を呼び出し
-        # 2025年現在、文字列は .encode('utf-8') で渡すのが鉄則です
-        result = self.lib.init_engine(
-            char.id.encode('utf-8'), 
-            abs_path.encode('utf-8')
-        )
-        
-        if result == 0:
-            self.current_char_id = char_id
-            print(f"C-Engine: {char.name} への切り替えに成功しました。")
-            return True
-        else:
-            print(f"C-Engine: {char.name} の音源ロードに失敗しました。")
-            return False
-
 
 
 # --- 1. C言語と共通のデータ構造定義 (ctypes) ---
@@ -213,42 +148,181 @@ class SynthesisRequest(ctypes.Structure):
         ("sample_rate", ctypes.c_int)
     ]
 
+class _CBufferOwner:
+    """
+    C側が確保した float バッファを NumPy から直接参照させるための所有者オブジェクト。
+    この参照が全て消えた時点 (スライスやビューを含む) で vse_free_buffer が呼ばれる。
+    """
+    def __init__(self, lib, audio_ptr, count: int):
+        address = ctypes.cast(audio_ptr, ctypes.c_void_p).value
+        self.__array_interface__ = {
+            "shape": (count,),
+            "typestr": "<f4",
+            "data": (address, False),
+            "version": 3,
+        }
+        # self を参照しない形で解放処理を登録する (循環参照で解放が遅れないように)
+        weakref.finalize(self, lib.vse_free_buffer, audio_ptr)
+
+
+def _wrap_c_buffer(lib, audio_ptr, count: int) -> np.ndarray:
+    """Cのバッファをコピーせずに NumPy 配列として返す (解放は GC に任せる)"""
+    return np.asarray(_CBufferOwner(lib, audio_ptr, count))
+
+
 # --- 2. エンジン本体のクラス ---
 
+# ノート終端の後ろに確保しておく余白（リリース部分が収まるように）
+RENDER_TAIL_SECONDS = 0.5
+
+# 合成バックエンドの選択: "c" / "numpy" / "auto"（Cエンジンが読めなければ NumPy）
+BACKEND_ENV_VAR = "VOSE_BACKEND"
+# NumPy バックエンドのリサンプリング品質: "linear" / "sinc_fast" / "sinc_best"
+RESAMPLE_QUALITY_ENV_VAR = "VOSE_RESAMPLE_QUALITY"
+# ファイル書き出しで一度に書き込む長さ
+EXPORT_CHUNK_SECONDS = 2.0
+# ストリーミング合成で1度に合成する長さの上限（休符の無い長いフレーズはこれより細かく分ける）
+STREAM_MAX_PHRASE_SECONDS = 4.0
+# 音源フォルダの置き場所（この下のフォルダ1つが1キャラクター。フォルダ名がID・表示名になる）
+VOICEBANK_ROOT = os.path.join(get_base_path(), "audio_data")
+
 class VO_SE_Engine:
-    def __init__(self, sample_rate: int = 44100):
+    def __init__(self, sample_rate: int = 44100, backend: str = None, resample_quality: str = None, previews: bool = False):
         self.sample_rate = sample_rate
         self.active_character_id = None
-        self.pyaudio_instance = pyaudio.PyAudio()
+        self.previews = previews # True ならキャラクターを読み込むたびにプレビュー音を作り置きする（GUI 用。書き出し・サーバーでは不要）
+        self._audio_output = None # 再生用の出力ストリーム（最初の再生時に開く）
         self._keep_alive = [] # Cへ渡すデータのメモリ解放を防ぐためのリスト
+        self.buffer_pool = OutputBufferPool() # render-into 用の出力バッファ置き場
+        self.has_render_into = False
+        self.active_audio_dir = None # 並列書き出しのワーカーが同じ音源をロードするために保持
+        self.characters: dict[str, CharacterInfo] = {} # キャラクター選択UIに並べる名簿
+        self.character_pool = CharacterPool() # 最近使ったキャラクターの音源を常駐させる
+        self.pitch_curves = PitchCurveCache() # NumPy バックエンドとグラフエディタが共有するピッチ曲線
+        self._synth_lock = threading.RLock() # Cエンジンと _keep_alive を複数スレッドから同時に触らせない
+        self.preview_cache = PreviewCache(self._render_preview_tone, sample_rate, release=self.release_buffer) # ノートのクリック・MIDI入力のモニター用
+
+        self.lib = None
+        self.lib_path = None # Talk 用の TalkEngineWrapper も同じライブラリを使う
+        self._talk_engine = None # Talk を最初に合成する時に作る
+        self.numpy_backend = None
+        backend = (backend or os.environ.get(BACKEND_ENV_VAR, "auto")).lower()
+        if backend not in ("c", "numpy", "auto"):
+            raise ValueError(f"未対応のバックエンドです: {backend}（c / numpy / auto のいずれかを指定してください）")
+        load_error = None
 
         # --- C言語ライブラリのロード (OS自動判別) ---
-        ext = ".dylib" if platform.system() == "Darwin" else ".dll"
-        lib_path = os.path.abspath(os.path.join(os.path.dirname(__file__), f"../VO_SE_engine_C/lib/engine{ext}"))
-        
-        try:
-            self.lib = ctypes.CDLL(lib_path)
-            self._setup_c_interfaces()
-            print(f"C-Engine Loaded: {lib_path}")
-        except Exception as e:
-            print(f"C-Engine Load Error: {e}\nビルドされたライブラリが lib/ にあるか確認してください。")
-
-    　　# GUI/vo_se_engine.py の VO_SE_Engine クラス内に追加
-
-　　　def load_character(self, char_id: str, folder_path: str):
+        if backend in ("c", "auto"):
+            system = platform.system()
+            ext = ".dylib" if system == "Darwin" else ".dll" if system == "Windows" else ".so"
+            lib_path = os.path.abspath(os.path.join(os.path.dirname(__file__), f"../VO_SE_engine_C/lib/engine{ext}"))
+
+            try:
+                self.lib = ctypes.CDLL(lib_path)
+                self._setup_c_interfaces()
+                self.lib_path = lib_path
+                print(f"C-Engine Loaded: {lib_path}")
+            except Exception as e:
+                self.lib = None
+                load_error = e
+                print(f"C-Engine Load Error: {e}\nビルドされたライブラリが lib/ にあるか確認してください。")
+
+        # --- NumPy バックエンド (Cエンジンが無い環境用) ---
+        if self.lib is None and backend in ("numpy", "auto"):
+            quality = resample_quality or os.environ.get(RESAMPLE_QUALITY_ENV_VAR, DEFAULT_RESAMPLE_QUALITY)
+            self.numpy_backend = NumpySynthBackend(sample_rate, pitch_curves=self.pitch_curves, resample_quality=quality)
+            print("NumPy バックエンドで合成します。")
+        self.backend_name = "c" if self.lib is not None else "numpy" if self.numpy_backend else None
+        if self.backend_name is None:
+            # 指定されたバックエンドが使えないまま作ると、最初の合成で AttributeError になるので、ここで止める
+            raise RuntimeError(
+                f"Cエンジンを読み込めませんでした ({load_error})。"
+                f"ライブラリをビルドするか、backend=\"numpy\"（環境変数 {BACKEND_ENV_VAR}=numpy）を指定してください。"
+            )
+        self.discover_characters()
+
+    def _init_backend(self, char_id: str, audio_dir: str) -> int:
         """
-        C言語エンジンに音源の読み込みを命令する
+        選択中のバックエンドに音源をロードさせる (init_engine 相当)
+        成功したら active_character_id も同じロックの中で切り替える（キャッシュキーと合成される声が食い違わないように）
         """
-        path_bytes = os.path.abspath(folder_path).encode('utf-8')
-        id_bytes = char_id.encode('utf-8')
-    
-        # C言語の init_engine を呼び出す
-        result = self.lib.init_engine(id_bytes, path_bytes)
+        if self.numpy_backend is not None:
+            if audio_dir and not os.path.isdir(audio_dir):
+                return -1
+            # プールに常駐していれば読み込み直さずに切り替える（時間のかかる読み込みはロックの外で行う）
+            store = self.character_pool.get(char_id, audio_dir) if audio_dir else None
+            with self._synth_lock: # 合成中に音源を差し替えない
+                self.numpy_backend.set_voicebank(char_id, store)
+                self._set_active(char_id, audio_dir)
+            return 0
+        with self._synth_lock:
+            result = self.lib.init_engine(char_id.encode('utf-8'), audio_dir.encode('utf-8'))
+            if result == 0:
+                self._set_active(char_id, audio_dir)
+            return result
+
+    def _set_active(self, char_id: str, audio_dir: str):
+        self.active_character_id = char_id
+        self.active_audio_dir = audio_dir
+
+    @property
+    def synth_lock(self):
+        """合成とキャラクターの切り替えを排他にするロック（キャッシュキーを作ってから合成し終えるまで声を変えさせない時に使う）"""
+        return self._synth_lock
+
+    def register_character(self, char_info: CharacterInfo):
+        """キャラクターを名簿に登録する"""
+        self.characters[char_info.id] = char_info
+
+    def discover_characters(self, root: str = None) -> list[str]:
+        """
+        音源フォルダの置き場所 (audio_data/) の下のフォルダを名簿に登録し、登録したIDを返す
+        登録済みのIDは上書きしない（register_character で名前を付けたものを優先する）
+        """
+        root = root or VOICEBANK_ROOT
+        if not os.path.isdir(root): return []
+        found = []
+        for name in sorted(os.listdir(root)):
+            path = os.path.join(root, name)
+            if name.startswith(".") or not os.path.isdir(path) or name in self.characters: continue
+            self.register_character(CharacterInfo(id=name, name=name, audio_dir=path))
+            found.append(name)
+        return found
+
+    def default_character_id(self, preferred: str = None) -> str:
+        """preferred が名簿にあればそれを、無ければ名簿の先頭のIDを返す（名簿が空なら None）"""
+        if preferred in self.characters:
+            return preferred
+        return next(iter(self.characters), None)
+
+    def prefetch_characters(self, char_ids: list[str] = None):
+        """
+        名簿のキャラクターの音源をバックグラウンドで先読みする
+        (C エンジンは音源を1つしか保持できないので、NumPy バックエンドの時だけ有効)
+        """
+        if self.numpy_backend is None: return
+        ids = char_ids if char_ids is not None else list(self.characters)
+        targets = [
+            (cid, os.path.abspath(self.characters[cid].audio_dir))
+            for cid in ids if cid in self.characters and self.characters[cid].audio_dir
+        ]
+        self.character_pool.prefetch(targets)
+
+    def load_character(self, char_id: str, folder_path: str) -> bool:
+        """
+        C言語エンジンに音源の読み込みを命令する（folder_path が空なら音源なしで鳴らす）
+        """
+        audio_dir = os.path.abspath(folder_path) if folder_path else ""
+        # C言語の init_engine (または NumPy バックエンド) を呼び出す
+        result = self._init_backend(char_id, audio_dir)
     
         if result == 0:
+           self._refresh_previews(char_id)
            print(f"成功: キャラクター {char_id} をロードしました。")
+           return True
         else:
            print(f"失敗: {folder_path} が見つからないか、読み込めませんでした。")
+           return False
 
 
     def _setup_c_interfaces(self):
@@ -265,48 +339,64 @@ class VO_SE_Engine:
         self.lib.vse_free_buffer.argtypes = [ctypes.POINTER(ctypes.c_float)]
         self.lib.vse_free_buffer.restype = None
 
-    def set_active_character(self, char_info: CharacterInfo):
-        """キャラクターを切り替え、Cエンジンに音源をロードさせる"""
-        self.active_character_id = char_info.id
-        audio_dir = os.path.abspath(char_info.engine_params.get("audio_dir", ""))
-        result = self.lib.init_engine(char_info.id.encode('utf-8'), audio_dir.encode('utf-8'))
+        # request_synthesis_into(SynthesisRequest, float*, int) -> int
+        # 古いビルドのエンジンには無いので、ある場合だけ使う
+        try:
+            self.lib.request_synthesis_into.argtypes = [SynthesisRequest, ctypes.POINTER(ctypes.c_float), ctypes.c_int]
+            self.lib.request_synthesis_into.restype = ctypes.c_int
+            self.has_render_into = True
+        except AttributeError:
+            self.has_render_into = False
+
+    def set_active_character(self, char_info: CharacterInfo) -> bool:
+        """キャラクターを切り替え、Cエンジンに音源をロードさせる (IDを渡した場合は名簿から探す)"""
+        if isinstance(char_info, str):
+            if char_info not in self.characters:
+                print(f"エラー: {char_info} というキャラクターは名簿にありません。")
+                return False
+            char_info = self.characters[char_info]
+        audio_dir = os.path.abspath(char_info.audio_dir) if char_info.audio_dir else ""
+        result = self._init_backend(char_info.id, audio_dir)
         if result == 0:
             print(f"Character {char_info.name} loaded successfully.")
+            self._refresh_previews(char_info.id)
+            return True
         else:
             print(f"Failed to load character {char_info.name}.")
+            return False
 
     def _convert_to_c_structs(self, py_notes, py_pitches):
-        """PythonのリストをCの構造体配列に変換"""
+        """PythonのリストをCの構造体配列に変換 (NumPy構造化配列経由でまとめて詰める)"""
         self._keep_alive = [] # 以前のデータをクリア
-        
+
         # 1. ノートの変換
-        c_notes = (CNoteEvent * len(py_notes))()
-        for i, n in enumerate(py_notes):
-            c_notes[i].note_number = n.note_number
-            c_notes[i].start_time = n.start_time
-            c_notes[i].duration = n.duration
-            c_notes[i].velocity = n.velocity
-            c_notes[i].lyrics = n.lyric.encode('utf-8')
-            
-            # 音素リスト(char**)の構築
-            if n.phonemes:
-                ph_bytes = [p.encode('utf-8') for p in n.phonemes]
-                ph_array = (ctypes.c_char_p * len(ph_bytes))(*ph_bytes)
-                self._keep_alive.append(ph_array) # C側実行中に消えないよう保持
-                c_notes[i].phonemes = ph_array
-                c_notes[i].phoneme_count = len(ph_bytes)
-
-        # 2. ピッチイベントの変換
-        c_pitches = (CPitchEvent * len(py_pitches))(*[
-            CPitchEvent(p.time, p.value) for p in py_pitches
-        ])
-        
+        note_array = c_marshal.notes_to_array(py_notes, self._keep_alive)
+
+        # 2. ピッチイベントの変換 (ctypes オブジェクトを1点ずつ作らない)
+        pitch_array = c_marshal.pitch_events_to_array(py_pitches)
+
+        # C側実行中に配列が解放されないよう保持し、先頭ポインタだけを渡す
+        self._keep_alive.extend([note_array, pitch_array])
+        c_notes = c_marshal.as_struct_pointer(note_array, CNoteEvent)
+        c_pitches = c_marshal.as_struct_pointer(pitch_array, CPitchEvent)
         return c_notes, c_pitches
 
-    def synthesize(self, notes: list[NoteEvent], pitch_events: list[PitchEvent]) -> np.ndarray:
-        """Cエンジンを呼び出して音声を合成し、NumPy配列を返す"""
+    def synthesize(self, notes: list[NoteEvent], pitch_events: list[PitchEvent], zero_copy: bool = False) -> np.ndarray:
+        with self._synth_lock:
+            return self._synthesize_locked(notes, pitch_events, zero_copy)
+
+    def _synthesize_locked(self, notes: list[NoteEvent], pitch_events: list[PitchEvent], zero_copy: bool = False) -> np.ndarray:
+        """
+        Cエンジンを呼び出して音声を合成し、NumPy配列を返す
+
+        zero_copy=True の場合はC側のバッファをコピーせずにそのまま返す。
+        返した配列 (とそのスライス・ビュー) が全て GC された時点でC側のメモリが解放される。
+        """
         if not notes: return np.zeros(0, dtype=np.float32)
 
+        if self.numpy_backend is not None:
+            return self.numpy_backend.synthesize(notes, pitch_events, self.sample_rate)
+
         c_notes, c_pitches = self._convert_to_c_structs(notes, pitch_events)
         
         req = SynthesisRequest(
@@ -321,6 +411,13 @@ class VO_SE_Engine:
         # C関数の呼び出し
         audio_ptr = self.lib.request_synthesis_full(req, ctypes.byref(out_count))
 
+        if audio_ptr and zero_copy:
+            # コピーせずにC側のバッファを所有する配列として返す (長尺レンダリングでのピークメモリ削減)
+            if out_count.value <= 0:
+                self.lib.vse_free_buffer(audio_ptr)
+                return np.zeros(0, dtype=np.float32)
+            return _wrap_c_buffer(self.lib, audio_ptr, out_count.value)
+
         if audio_ptr:
             # ポインタからNumPy配列を作成し、Python側へコピー
             raw_data = np.ctypeslib.as_array(audio_ptr, shape=(out_count.value,))
@@ -332,17 +429,252 @@ class VO_SE_Engine:
         
         return np.zeros(0, dtype=np.float32)
 
-    def play_audio(self, audio_data: np.ndarray):
-        """合成した音声を再生する"""
+    def _estimate_output_samples(self, notes: list[NoteEvent]) -> int:
+        """ノートの終端から出力に必要なサンプル数を見積もる"""
+        end_time = max(n.start_time + n.duration for n in notes)
+        return int(math.ceil((end_time + RENDER_TAIL_SECONDS) * self.sample_rate))
+
+    def synthesize_into(self, notes: list[NoteEvent], pitch_events: list[PitchEvent], out: np.ndarray = None) -> np.ndarray:
+        with self._synth_lock:
+            return self._synthesize_into_locked(notes, pitch_events, out)
+
+    def _synthesize_into_locked(self, notes: list[NoteEvent], pitch_events: list[PitchEvent], out: np.ndarray = None) -> np.ndarray:
+        """
+        呼び出し側のバッファに直接合成する (render-into)
+
+        out を省略した場合はプールのバッファを使う。戻り値は書き込まれた範囲のビューで、
+        使い終わったら release_buffer() でプールへ戻すこと。
+        """
+        if not notes: return np.zeros(0, dtype=np.float32)
+
+        if self.numpy_backend is not None:
+            if out is None:
+                out = self.buffer_pool.acquire(self._estimate_output_samples(notes))
+            elif out.size < self._estimate_output_samples(notes):
+                print(f"警告: 出力バッファが不足しています ({out.size} < {self._estimate_output_samples(notes)})")
+            return self.numpy_backend.synthesize_into(notes, pitch_events, out, self.sample_rate)
+
+        if not self.has_render_into:
+            # 古いエンジンでは従来の経路で合成してからバッファへ書き込む
+            audio = self.synthesize(notes, pitch_events, zero_copy=True)
+            if out is None or out.size < audio.size:
+                if out is not None and out.size < audio.size:
+                    print(f"警告: 出力バッファが不足しています ({out.size} < {audio.size})")
+                out = self.buffer_pool.acquire(audio.size)
+            out[:audio.size] = audio
+            return out[:audio.size]
+
+        c_notes, c_pitches = self._convert_to_c_structs(notes, pitch_events)
+        req = SynthesisRequest(
+            notes=c_notes,
+            note_count=len(notes),
+            pitch_events=c_pitches,
+            pitch_event_count=len(pitch_events),
+            sample_rate=self.sample_rate
+        )
+
+        pooled = out is None
+        if pooled:
+            out = self.buffer_pool.acquire(self._estimate_output_samples(notes))
+        elif out.dtype != np.float32 or not out.flags['C_CONTIGUOUS']:
+            raise ValueError("出力バッファは連続した float32 の配列である必要があります。")
+
+        written = self.lib.request_synthesis_into(req, out.ctypes.data_as(ctypes.POINTER(ctypes.c_float)), out.size)
+        if written < 0:
+            # 容量不足: 必要なサイズのバッファを用意してやり直す
+            if pooled:
+                self.buffer_pool.release(out)
+            out = self.buffer_pool.acquire(-written)
+            written = self.lib.request_synthesis_into(req, out.ctypes.data_as(ctypes.POINTER(ctypes.c_float)), out.size)
+            if written < 0:
+                print("C-Engine: 出力バッファへの合成に失敗しました。")
+                return np.zeros(0, dtype=np.float32)
+        return out[:written]
+
+    def synthesize_stream(self, notes: list[NoteEvent], pitch_events: list[PitchEvent], chunk_seconds: float = 0.5,
+                          start_time: float = 0.0, end_time: float = None, max_in_flight: int = 2, render_phrase=None,
+                          max_phrase_seconds: float = STREAM_MAX_PHRASE_SECONDS):
+        """
+        フレーズ単位でバックグラウンド合成しながら、float32 のブロックを時間順に yield する
+        最初のフレーズが合成できた時点で最初のブロックが返るので、曲全体の合成を待たずに再生を始められる
+        max_phrase_seconds より長いフレーズはノートの境目で分けて合成する。end_time を渡すとそこで出力を切る
+
+        render_phrase を渡すと合成をそちらに任せる (PhraseRenderer.render_phrase を渡せばキャッシュが効く)
+        """
+        phrases = [
+            piece for ph in split_into_phrases(notes, pitch_events) for piece in split_long_phrase(ph, max_phrase_seconds)
+            if piece.end_time > start_time and (end_time is None or piece.start_time < end_time)
+        ]
+        release = None
+        if render_phrase is None:
+            # プールのバッファに合成し、ブロックへ足し込んだら戻す（再生中に毎フレーズ確保し直さない）
+            render_phrase = lambda ph: self.synthesize_into(ph.local_notes(), ph.pitch_events)
+            release = self.release_buffer
+        chunk_samples = max(1, int(chunk_seconds * self.sample_rate))
+        total_samples = None if end_time is None else max(0, int(round((end_time - start_time) * self.sample_rate)))
+        return stream_phrases(phrases, render_phrase, self.sample_rate, chunk_samples,
+                              max_in_flight=max_in_flight, start_time=start_time, release=release,
+                              total_samples=total_samples)
+
+    def release_buffer(self, buffer: np.ndarray):
+        """synthesize_into が返したバッファをプールへ戻す"""
+        if buffer is not None and buffer.size > 0:
+            self.buffer_pool.release(buffer)
+
+    @property
+    def audio_output(self) -> AudioOutput:
+        """開いたままの出力ストリーム（PyAudio は最初の再生の時に読み込む）"""
+        if self._audio_output is None:
+            self._audio_output = AudioOutput(self.sample_rate)
+        return self._audio_output
+
+    def play_audio(self, audio_data: np.ndarray, wait: bool = False):
+        """合成した音声を再生する（wait=True なら鳴り終わるまで待つ）"""
         if audio_data.size == 0: return
-        stream = self.pyaudio_instance.open(
-            format=pyaudio.paFloat32, channels=1, rate=self.sample_rate, output=True
+        self.audio_output.play_buffer(audio_data)
+        if wait:
+            self.audio_output.wait()
+
+    def export_wav(self, notes: list[NoteEvent], pitch_events: list[PitchEvent], output_path: str = "output/output.wav",
+                   parallel: bool = False, max_workers: int = None, verify_tolerance: float = None) -> bool:
+        """
+        WAVファイル（拡張子が .flac なら FLAC）として書き出す
+
+        通常はフレーズ単位で合成したブロックをそのままファイルへ追記するので、曲の長さに関係なくメモリ使用量は一定。
+        parallel=True の場合は休符で区切った区間を複数プロセスで合成してからつなぎ合わせる（曲全体をメモリに置く）。
+        verify_tolerance を指定すると通常の合成結果とも比較し、誤差が超えたら警告を出す。
+        """
+        if not notes: return False
+
+        try:
+            if parallel:
+                quality = self.numpy_backend.resample_quality if self.numpy_backend is not None else None
+                audio = render_parallel(notes, pitch_events, self.sample_rate, self.active_character_id,
+                                        self.active_audio_dir, max_workers=max_workers,
+                                        backend=self.backend_name, resample_quality=quality)
+                if verify_tolerance is not None:
+                    diff = max_difference(audio, self.synthesize(notes, pitch_events))
+                    if diff > verify_tolerance:
+                        print(f"警告: 並列書き出しの結果が通常の合成と一致しません (最大誤差 {diff:.6f})")
+                write_blocks(output_path, [audio], self.sample_rate)
+            else:
+                write_blocks(output_path, self.synthesize_stream(notes, pitch_events, chunk_seconds=EXPORT_CHUNK_SECONDS),
+                             self.sample_rate)
+        except Exception as e:
+            print(f"書き出しに失敗しました: {output_path} ({e})")
+            return False
+        return True
+
+    def play_stream(self, blocks, start_time: float = 0.0):
+        """
+        synthesize_stream のブロックを届いた順に再生する（すぐに戻る。stop_playback で中断）
+        start_time は synthesize_stream に渡した開始時刻（再生位置の表示に使う）
+        """
+        self.audio_output.play_blocks(blocks, timeline_offset=int(round(start_time * self.sample_rate)))
+
+    def render_talk_sentence(self, events: list) -> np.ndarray:
+        """
+        Talk の1文（TextAnalyzer の結果か PhonemeEvent のリスト）を合成し、このエンジンのサンプリング周波数で返す
+        歌の合成と同じ C エンジンを使うので、同時に呼ばれないように合成ロックを取る
+        """
+        if self.lib_path is None:
+            raise RuntimeError("Talk の合成には C エンジンが必要です。")
+        events = phoneme_events_from_dicts(events)
+        with self._synth_lock:
+            if self._talk_engine is None:
+                self._talk_engine = TalkEngineWrapper(self.lib_path)
+            # 対応していればメモリ上でこのエンジンのサンプリング周波数のまま合成する（一時ファイルを使わない）
+            audio, rate = self._talk_engine.render_sentence_audio(events, self.sample_rate)
+        if rate and rate != self.sample_rate and audio.size:
+            audio = resample(audio, int(round(audio.size * self.sample_rate / rate)))
+        return audio
+
+    def _refresh_previews(self, char_id: str):
+        """キャラクターが変わったらプレビュー音を作り直す（previews=False なら古い音を捨てるだけで、鳴らす時にその場で合成する）"""
+        if self.previews:
+            self.preview_cache.rebuild(char_id) # バックグラウンドで作る
+        else:
+            self.preview_cache.clear()
+
+    def _render_preview_tone(self, note_number: int) -> np.ndarray:
+        """プレビュー音1つ分を合成する（PreviewCache から呼ばれる）"""
+        note = NoteEvent(note_number, 0.0, self.preview_cache.seconds, lyric=PREVIEW_LYRIC)
+        # PreviewCache が自分の配列へ写した後に release_buffer で戻すので、合成先はプールのバッファを使い回す
+        return self.synthesize_into([note], [])
+
+    def preview_note(self, note_number: int, velocity: int = 100) -> bool:
+        """
+        ノートのプレビュー音を鳴らす（ノートのクリック・MIDIのノートオン用）
+        作り置きの音を出力に混ぜるだけなので、再生中でも止めずに重ねて鳴る
+        """
+        tone = self.preview_cache.tone_for(note_number)
+        if tone is None: return False
+        self.audio_output.play_one_shot(tone, gain=max(0, min(velocity, 127)) / 127.0, tag=note_number)
+        return True
+
+    def release_preview(self, note_number: int):
+        """MIDIのノートオフでプレビュー音を止める"""
+        if self._audio_output is not None:
+            self._audio_output.release_one_shot(note_number)
+
+    def play_loop(self, audio: np.ndarray, region_start: float, loop_start: float, loop_end: float, start_time: float = None):
+        """
+        合成済みの audio（先頭が region_start 秒）の [loop_start, loop_end) を継ぎ目なしでループ再生する
+        ループは出力側で回すので、巻き戻しのたびに合成し直すことはない
+        """
+        sr = self.sample_rate
+        offset = int(round(region_start * sr))
+        first = loop_start if start_time is None else start_time
+        self.audio_output.play_buffer(
+            audio, start_sample=int(round(first * sr)) - offset, timeline_offset=offset,
+            loop_range=(int(round(loop_start * sr)), int(round(loop_end * sr)))
         )
-        stream.write(audio_data.tobytes())
-        stream.stop_stream()
-        stream.close()
+
+    def update_loop(self, audio: np.ndarray, region_start: float, loop_start: float, loop_end: float) -> bool:
+        """ループ再生を止めずに音声とループ範囲を差し替える（編集やループ範囲の変更を反映する）"""
+        if self._audio_output is None: return False
+        sr = self.sample_rate
+        if not self._audio_output.replace_buffer(audio, timeline_offset=int(round(region_start * sr))):
+            return False
+        return self._audio_output.set_loop(int(round(loop_start * sr)), int(round(loop_end * sr)))
+
+    def stop_loop(self):
+        """ループを解除して、そのまま最後まで再生させる"""
+        if self._audio_output is not None:
+            self._audio_output.clear_loop()
+
+    @property
+    def playback_clock(self):
+        """出力デバイスが実際に鳴らしている位置（TimelineWidget / GraphEditorWidget のカーソル用）"""
+        return self.audio_output.clock
+
+    @property
+    def current_time_playback(self) -> float:
+        """今聞こえている位置（秒）。デバイスの出力遅延を差し引いた、サンプル単位の値"""
+        if self._audio_output is None: return 0.0
+        return self._audio_output.clock.seconds()
+
+    @current_time_playback.setter
+    def current_time_playback(self, seconds: float):
+        self.seek_playback(seconds)
+
+    @property
+    def is_playback_active(self) -> bool:
+        return self._audio_output is not None and self._audio_output.is_playing
+
+    def seek_playback(self, seconds: float) -> bool:
+        """再生位置を移す（合成済みの音声を再生している時だけ）"""
+        if self._audio_output is None: return False
+        return self._audio_output.seek(int(round(seconds * self.sample_rate)))
+
+    def stop_playback(self):
+        """再生を止める（出力ストリームは開いたまま）"""
+        if self._audio_output is not None:
+            self._audio_output.stop()
 
     def close(self):
         """終了処理"""
-        self.pyaudio_instance.terminate()
+        if self._audio_output is not None:
+            self._audio_output.close()
+            self._audio_output = None
 
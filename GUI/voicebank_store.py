@@ -0,0 +1,190 @@
+# voicebank_store.py
+# 音源フォルダの WAV をメモリマップで開き、必要になった音素だけを読み込むサンプル置き場
+# 起動時はヘッダー (fmt / data チャンクの位置) だけを読むので、音源が大きくてもすぐに使い始められる
+
+import mmap
+import os
+import struct
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+@dataclass
+class WavInfo:
+    """WAV ファイルのヘッダー情報（データ本体は読まない）"""
+    path: str
+    format_tag: int
+    channels: int
+    sample_rate: int
+    bits_per_sample: int
+    data_offset: int
+    data_size: int
+
+    @property
+    def frame_count(self) -> int:
+        return self.data_size // (self.channels * (self.bits_per_sample // 8))
+
+
+def read_wav_header(path: str) -> WavInfo:
+    """RIFF チャンクをたどって fmt と data の位置だけを調べる（dr_wav の初期化と同じ考え方）"""
+    with open(path, 'rb') as f:
+        riff, _, wave_id = struct.unpack('<4sI4s', f.read(12))
+        if riff != b'RIFF' or wave_id != b'WAVE':
+            raise ValueError(f"WAVファイルではありません: {path}")
+
+        fmt = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"data チャンクが見つかりません: {path}")
+            chunk_id, chunk_size = struct.unpack('<4sI', header)
+            if chunk_id == b'fmt ':
+                body = f.read(chunk_size)
+                format_tag, channels, sample_rate, _, _, bits = struct.unpack('<HHIIHH', body[:16])
+                if format_tag == WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+                    # SubFormat GUID の先頭2バイトが実際のフォーマット
+                    format_tag = struct.unpack('<H', body[24:26])[0]
+                fmt = (format_tag, channels, sample_rate, bits)
+            elif chunk_id == b'data':
+                if fmt is None:
+                    raise ValueError(f"fmt チャンクが data より後ろにあります: {path}")
+                file_size = os.fstat(f.fileno()).st_size
+                data_offset = f.tell()
+                data_size = min(chunk_size, file_size - data_offset) # 書きかけのファイル対策
+                return WavInfo(path, fmt[0], fmt[1], fmt[2], fmt[3], data_offset, data_size)
+            else:
+                f.seek(chunk_size, os.SEEK_CUR)
+            if chunk_size % 2:
+                f.seek(1, os.SEEK_CUR) # チャンクは2バイト境界に揃えられている
+
+
+def decode_pcm(buffer, info: WavInfo) -> np.ndarray:
+    """data チャンクのバイト列を float32 のモノラル音声に変換する"""
+    count = info.frame_count * info.channels
+    bits = info.bits_per_sample
+    if info.format_tag == WAVE_FORMAT_IEEE_FLOAT and bits == 32:
+        data = np.frombuffer(buffer, dtype='<f4', count=count, offset=info.data_offset)
+    elif info.format_tag == WAVE_FORMAT_IEEE_FLOAT and bits == 64:
+        data = np.frombuffer(buffer, dtype='<f8', count=count, offset=info.data_offset).astype(np.float32)
+    elif info.format_tag == WAVE_FORMAT_PCM and bits == 16:
+        data = np.frombuffer(buffer, dtype='<i2', count=count, offset=info.data_offset).astype(np.float32) / 32768.0
+    elif info.format_tag == WAVE_FORMAT_PCM and bits == 8:
+        data = (np.frombuffer(buffer, dtype=np.uint8, count=count, offset=info.data_offset).astype(np.float32) - 128.0) / 128.0
+    elif info.format_tag == WAVE_FORMAT_PCM and bits == 24:
+        raw = np.frombuffer(buffer, dtype=np.uint8, count=count * 3, offset=info.data_offset).reshape(-1, 3).astype(np.int32)
+        ints = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        ints = np.where(ints >= 0x800000, ints - 0x1000000, ints)
+        data = ints.astype(np.float32) / 8388608.0
+    elif info.format_tag == WAVE_FORMAT_PCM and bits == 32:
+        data = np.frombuffer(buffer, dtype='<i4', count=count, offset=info.data_offset).astype(np.float32) / 2147483648.0
+    else:
+        raise ValueError(f"未対応のWAV形式です (format={info.format_tag}, bits={bits}): {info.path}")
+
+    if info.channels > 1:
+        data = data.reshape(-1, info.channels).mean(axis=1, dtype=np.float32)
+    return data
+
+
+class VoicebankStore:
+    """
+    音素名 → サンプルの置き場
+    読み込んだサンプルは LRU で保持し、合計が max_bytes を超えたら古いものから手放す
+    32bit float モノラルの WAV はメモリマップをそのまま参照するので、実際に触ったページしか読み込まれない
+    """
+    def __init__(self, audio_dir: str, max_bytes: int = 64 * 1024 * 1024):
+        self.audio_dir = audio_dir
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._infos: dict[str, WavInfo] = {}
+        self._maps: dict[str, mmap.mmap] = {}
+        self._cache: OrderedDict[str, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self._scan()
+
+    def _scan(self):
+        """フォルダ内の WAV のヘッダーだけを読む"""
+        if not self.audio_dir or not os.path.isdir(self.audio_dir):
+            return
+        for name in os.listdir(self.audio_dir):
+            stem, ext = os.path.splitext(name)
+            if ext.lower() != ".wav": continue
+            path = os.path.join(self.audio_dir, name)
+            try:
+                self._infos[stem] = read_wav_header(path)
+            except (OSError, ValueError, struct.error) as e:
+                print(f"音源ファイルを読み込めません: {path} ({e})")
+
+    def names(self) -> list[str]:
+        return list(self._infos)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._infos
+
+    def info(self, name: str):
+        return self._infos.get(name)
+
+    def get(self, name: str):
+        """音素のサンプルを float32 のモノラル配列で返す（無ければ None）"""
+        info = self._infos.get(name)
+        if info is None:
+            return None
+
+        with self._lock:
+            data = self._cache.get(name)
+            if data is not None:
+                self._cache.move_to_end(name)
+                self.hits += 1
+                return data
+            self.misses += 1
+
+            data = decode_pcm(self._map(info), info)
+            data.flags.writeable = False
+            self._cache[name] = data
+            self.current_bytes += data.nbytes
+            while self.current_bytes > self.max_bytes and len(self._cache) > 1:
+                _, evicted = self._cache.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+                self.evictions += 1
+            return data
+
+    def _map(self, info: WavInfo) -> mmap.mmap:
+        mm = self._maps.get(info.path)
+        if mm is None:
+            with open(info.path, 'rb') as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[info.path] = mm
+        return mm
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "files": len(self._infos),
+                "resident": len(self._cache),
+                "resident_bytes": self.current_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+    def close(self):
+        with self._lock:
+            self._cache.clear()
+            self.current_bytes = 0
+            for mm in self._maps.values():
+                try:
+                    mm.close()
+                except BufferError:
+                    pass # まだどこかで配列が参照されている場合は GC に任せる
+            self._maps = {}
@@ -0,0 +1,125 @@
+# wav_exporter.py
+# 合成したブロックを届いた順にファイルへ追記していく書き出し
+# WAV は先にヘッダーを書いておき、最後にサイズだけ書き直す。曲の長さに関係なくメモリ使用量は一定
+# FLAC（可逆圧縮）は soundfile がインストールされている場合だけ使える
+
+import os
+import struct
+
+import numpy as np
+
+WAV_MAX_DATA_BYTES = 0xFFFFFFFF - 36 # RIFF のサイズ欄は 32bit（16bit モノラル 44.1kHz で約13.5時間）
+CONVERT_BLOCK = 65536                # 16bit への変換を一度に行うサンプル数（大きなブロックも分けて変換する）
+
+
+class StreamingWavWriter:
+    """16bit PCM モノラルの WAV をブロックごとに追記する"""
+    def __init__(self, path: str, sample_rate: int):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.frames = 0
+        self._file = open(path, 'wb')
+        self._write_header(0)
+
+    def _write_header(self, data_bytes: int):
+        self._file.write(b'RIFF')
+        self._file.write(struct.pack('<I', 36 + data_bytes))
+        self._file.write(b'WAVE')
+        # fmt チャンク: PCM, モノラル, sample_rate, バイト/秒, ブロック境界 2, 16bit
+        self._file.write(b'fmt ')
+        self._file.write(struct.pack('<IHHIIHH', 16, 1, 1, self.sample_rate, self.sample_rate * 2, 2, 16))
+        self._file.write(b'data')
+        self._file.write(struct.pack('<I', data_bytes))
+
+    def write(self, block: np.ndarray):
+        block = np.asarray(block, dtype=np.float32)
+        if (self.frames + block.size) * 2 > WAV_MAX_DATA_BYTES:
+            raise ValueError("WAV の最大サイズ (4GB) を超えます。FLAC で書き出してください。")
+        for lo in range(0, block.size, CONVERT_BLOCK):
+            part = block[lo:lo + CONVERT_BLOCK]
+            self._file.write((np.clip(part, -1.0, 1.0) * 32767.0).astype('<i2').tobytes())
+        self.frames += block.size
+
+    def close(self):
+        """ヘッダーのサイズ欄を実際の長さで書き直して閉じる"""
+        if self._file is None: return
+        data_bytes = self.frames * 2
+        self._file.seek(4)
+        self._file.write(struct.pack('<I', 36 + data_bytes))
+        self._file.seek(40)
+        self._file.write(struct.pack('<I', data_bytes))
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class StreamingFlacWriter:
+    """soundfile (libsndfile) で 16bit FLAC をブロックごとに追記する"""
+    def __init__(self, path: str, sample_rate: int):
+        try:
+            import soundfile # 使う時だけ読み込む（無い環境では WAV だけ使える）
+        except ImportError:
+            raise RuntimeError("FLAC の書き出しには soundfile が必要です (pip install soundfile)")
+        self.path = path
+        self.sample_rate = sample_rate
+        self.frames = 0
+        self._file = soundfile.SoundFile(path, 'w', samplerate=sample_rate, channels=1, format='FLAC', subtype='PCM_16')
+
+    def write(self, block: np.ndarray):
+        block = np.clip(np.asarray(block, dtype=np.float32), -1.0, 1.0)
+        self._file.write(block)
+        self.frames += block.size
+
+    def close(self):
+        if self._file is None: return
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def format_from_path(path: str) -> str:
+    """拡張子から書き出し形式を決める（.flac 以外は WAV）"""
+    return "flac" if path.lower().endswith(".flac") else "wav"
+
+
+def open_writer(path: str, sample_rate: int, fmt: str = None):
+    """書き出し先を開く。fmt を省略すると拡張子で判定する"""
+    fmt = (fmt or format_from_path(path)).lower()
+    out_dir = os.path.dirname(path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    if fmt == "flac":
+        return StreamingFlacWriter(path, sample_rate)
+    if fmt == "wav":
+        return StreamingWavWriter(path, sample_rate)
+    raise ValueError(f"未対応の書き出し形式です: {fmt}")
+
+
+def write_blocks(path: str, blocks, sample_rate: int, fmt: str = None) -> int:
+    """
+    ブロックのイテレータ（synthesize_stream など）を順にファイルへ書き出し、書き出したサンプル数を返す
+    途中で失敗した場合は書きかけのファイルを消す
+    """
+    writer = open_writer(path, sample_rate, fmt)
+    try:
+        for block in blocks:
+            writer.write(block)
+    except BaseException:
+        writer.close()
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        raise
+    writer.close()
+    return writer.frames
@@ -46,6 +46,24 @@ void vose_talk_simple(const char* text, float speed, float pitch_scale);
  */
 API_EXPORT void execute_render_to_file(const char* output_path, NoteEvent* notes, int count);
 
+/**
+ * 呼び出し側が確保したバッファへの合成（render-into）
+ * out_buffer: 書き込み先（float32, capacity サンプル分）
+ * 戻り値: 書き込んだサンプル数。capacity が足りない場合は何も書かずに
+ *         必要なサンプル数を負の値で返す（-required）
+ */
+API_EXPORT int request_synthesis_into(SynthesisRequest req, float* out_buffer, int capacity);
+
+/**
+ * Talk の1文を呼び出し側が確保したバッファへ合成する（一時WAVを経由しない）
+ * events: 音素イベントの配列
+ * sample_rate: 出力のサンプリング周波数
+ * out_buffer: 書き込み先（float32, capacity サンプル分）
+ * 戻り値: 書き込んだサンプル数。capacity が足りない場合は何も書かずに
+ *         必要なサンプル数を負の値で返す（-required）
+ */
+API_EXPORT int execute_talk_render_into(TalkPhonemeEvent* events, int count, int sample_rate, float* out_buffer, int capacity);
+
 /**
  * エンジンの解放
  */
@@ -21,4 +21,22 @@ typedef struct {
     int phoneme_count;
 } CNoteEvent;
 
+// 合成リクエスト（Python側の SynthesisRequest と同じ並び）
+typedef struct {
+    CNoteEvent* notes;
+    int note_count;
+    CPitchEvent* pitch_events;
+    int pitch_event_count;
+    int sample_rate;
+} SynthesisRequest;
+
+// Talk の音素イベント（Python側の C_PhonemeEvent と同じ並び）
+typedef struct {
+    float pitch_start;    // 開始時のピッチ
+    float pitch_end;      // 終了時のピッチ
+    float duration;       // 長さ（秒）
+    const char* lyric;    // 音素名
+    float formant_shift;  // フォルマントのずらし量
+} TalkPhonemeEvent;
+
 #endif
@@ -0,0 +1,10 @@
+# conftest.py
+# GUI のモジュールは GUI フォルダ直下から import する前提なので、テストでも同じ並びにする
+
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GUI_DIR = os.path.join(ROOT_DIR, "GUI")
+if GUI_DIR not in sys.path:
+    sys.path.insert(0, GUI_DIR)
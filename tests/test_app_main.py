@@ -0,0 +1,61 @@
+# test_app_main.py
+# 起動時の EngineLoader が既定のキャラクターを実際に読み込めているか確認する
+
+import os
+import sys
+
+import pytest
+
+import vo_se_engine
+from app_main import EngineLoader
+from startup_profile import StartupProfile
+from bench_synthesis import make_voicebank
+
+
+@pytest.fixture
+def voicebank_root(tmp_path, monkeypatch):
+    monkeypatch.setenv("VOSE_BACKEND", "numpy")
+    monkeypatch.setattr(vo_se_engine, "VOICEBANK_ROOT", str(tmp_path))
+    return tmp_path
+
+
+def _load(char_id="char_001"):
+    loader = EngineLoader(StartupProfile(enabled=False), char_id)
+    loader.start()
+    return loader, loader.wait()
+
+
+def _voicebank(root, name):
+    folder = os.path.join(str(root), name)
+    os.makedirs(folder)
+    make_voicebank(folder)
+
+
+def test_loads_default_character_from_audio_data(voicebank_root):
+    _voicebank(voicebank_root, "char_001")
+    loader, engine = _load()
+    assert loader.error is None
+    assert engine.active_character_id == "char_001"
+    assert engine.previews
+
+
+def test_falls_back_to_first_discovered_character(voicebank_root):
+    _voicebank(voicebank_root, "aoi")
+    loader, engine = _load()
+    assert loader.error is None
+    assert engine.active_character_id == "aoi"
+
+
+def test_empty_roster_loads_without_voicebank(voicebank_root):
+    loader, engine = _load()
+    assert loader.error is None
+    assert engine.active_character_id == "char_001"
+    assert engine.active_audio_dir == ""
+
+
+def test_import_error_is_raised_from_wait(voicebank_root, monkeypatch):
+    monkeypatch.setitem(sys.modules, "vo_se_engine", None) # import vo_se_engine が ImportError になる
+    loader = EngineLoader(StartupProfile(enabled=False))
+    loader.start()
+    with pytest.raises(ImportError):
+        loader.wait()
@@ -0,0 +1,43 @@
+# test_audio_output.py
+# 合成待ちのストリームを読んでもフィーダーが止まらず、停止がすぐに効くことを確認する
+
+import threading
+import time
+
+import numpy as np
+
+from audio_output import StreamSource
+
+
+def _slow_blocks(started, closed, delay):
+    try:
+        yield np.ones(4, dtype=np.float32)
+        started.set()
+        time.sleep(delay) # 次のフレーズを合成中
+        yield np.ones(4, dtype=np.float32)
+    finally:
+        closed.set()
+
+
+def test_read_does_not_wait_for_slow_render():
+    started, closed = threading.Event(), threading.Event()
+    source = StreamSource(_slow_blocks(started, closed, 0.5), timeline_offset=100)
+    assert source.read(4, timeout=1.0)[0] == 100
+    started.wait(1.0)
+
+    t0 = time.perf_counter()
+    position, block = source.read(4, timeout=0.01)
+    assert time.perf_counter() - t0 < 0.2
+    assert block.size == 0 and position == 104
+
+    t0 = time.perf_counter()
+    source.close()
+    assert time.perf_counter() - t0 < 0.05
+    assert closed.wait(2.0) # 合成中だったジェネレーターも、読み込みスレッドが閉じる
+
+
+def test_read_returns_none_after_last_block():
+    source = StreamSource([np.ones(3, dtype=np.float32)])
+    assert source.read(3, timeout=1.0)[1].size == 3
+    assert source.read(3, timeout=1.0) is None
+    assert source.read(3, timeout=1.0) is None
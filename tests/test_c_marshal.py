@@ -0,0 +1,57 @@
+# test_c_marshal.py
+# c_marshal の構造化 dtype が vo_se_engine の ctypes 構造体（= audio_types.h）と同じ配置になっているか確認する
+
+import ctypes
+
+import numpy as np
+import pytest
+
+import c_marshal
+from data_models import NoteEvent, PitchEvent
+from vo_se_engine import CNoteEvent, CPitchEvent
+
+LAYOUTS = [
+    (c_marshal.PITCH_EVENT_DTYPE, CPitchEvent),
+    (c_marshal.NOTE_EVENT_DTYPE, CNoteEvent),
+]
+
+
+@pytest.mark.parametrize("dtype, c_struct", LAYOUTS)
+def test_itemsize_matches_ctypes(dtype, c_struct):
+    assert dtype.itemsize == ctypes.sizeof(c_struct)
+
+
+@pytest.mark.parametrize("dtype, c_struct", LAYOUTS)
+def test_field_offsets_match_ctypes(dtype, c_struct):
+    assert list(dtype.names) == [name for name, _ in c_struct._fields_]
+    for name in dtype.names:
+        field_dtype, offset = dtype.fields[name][:2]
+        c_field = getattr(c_struct, name)
+        assert (offset, field_dtype.itemsize) == (c_field.offset, c_field.size), name
+
+
+@pytest.mark.parametrize("dtype, c_struct", LAYOUTS)
+def test_check_layout_accepts_matching_struct(dtype, c_struct):
+    c_marshal.check_layout(dtype, c_struct)
+
+
+def test_check_layout_rejects_shifted_field():
+    class Shifted(ctypes.Structure):
+        _fields_ = [("time", ctypes.c_double), ("value", ctypes.c_int)]
+
+    with pytest.raises(RuntimeError):
+        c_marshal.check_layout(c_marshal.PITCH_EVENT_DTYPE, Shifted)
+
+
+def test_arrays_read_back_through_ctypes():
+    keep_alive = []
+    notes = c_marshal.notes_to_array([NoteEvent(60, 0.5, 1.25, 90, "あ", ["a"])], keep_alive)
+    pitches = c_marshal.pitch_events_to_array([PitchEvent(0.25, -120)])
+
+    c_note = c_marshal.as_struct_pointer(notes, CNoteEvent)[0]
+    assert (c_note.note_number, c_note.start_time, c_note.duration, c_note.velocity) == (60, 0.5, 1.25, 90)
+    assert c_note.lyrics.decode('utf-8') == "あ"
+    assert c_note.phoneme_count == 1 and c_note.phonemes[0] == b"a"
+
+    c_pitch = c_marshal.as_struct_pointer(pitches, CPitchEvent)[0]
+    assert (c_pitch.time, c_pitch.value) == (np.float32(0.25), -120)
@@ -0,0 +1,88 @@
+# test_character_roster.py
+# キャラクターの名簿への登録 → 先読み → 切り替え が一通りつながっているか確認する
+
+import os
+
+from bench_synthesis import make_voicebank
+from data_models import CharacterInfo
+from vo_se_engine import VO_SE_Engine
+
+
+def _voicebank(root, name):
+    folder = os.path.join(str(root), name)
+    os.makedirs(folder)
+    make_voicebank(folder)
+    return folder
+
+
+def test_register_prefetch_and_activate(tmp_path):
+    engine = VO_SE_Engine(backend="numpy")
+    folder = _voicebank(tmp_path, "aoi")
+    engine.register_character(CharacterInfo(id="char_001", name="アオイ", audio_dir=folder))
+
+    engine.prefetch_characters()
+    engine.character_pool._prefetch_thread.join(timeout=10)
+    assert engine.character_pool.is_resident("char_001")
+
+    assert engine.set_active_character("char_001")
+    assert engine.active_character_id == "char_001"
+    assert engine.active_audio_dir == os.path.abspath(folder)
+    assert engine.numpy_backend.voicebank is not None and "あ" in engine.numpy_backend.voicebank
+
+
+def test_discover_registers_voicebank_folders(tmp_path):
+    _voicebank(tmp_path, "aoi")
+    _voicebank(tmp_path, "midori")
+    engine = VO_SE_Engine(backend="numpy")
+    engine.register_character(CharacterInfo(id="aoi", name="アオイ", audio_dir=str(tmp_path / "aoi")))
+
+    assert engine.discover_characters(str(tmp_path)) == ["midori"]
+    assert engine.characters["aoi"].name == "アオイ" # 登録済みのものは上書きしない
+    assert engine.default_character_id("char_001") in ("aoi", "midori")
+    assert engine.set_active_character("midori")
+
+
+def test_failed_switch_keeps_previous_character(tmp_path):
+    engine = VO_SE_Engine(backend="numpy")
+    engine.register_character(CharacterInfo(id="aoi", name="アオイ", audio_dir=_voicebank(tmp_path, "aoi")))
+    engine.register_character(CharacterInfo(id="gone", name="ない", audio_dir=str(tmp_path / "missing")))
+
+    assert engine.set_active_character("aoi")
+    assert not engine.set_active_character("gone")
+    assert engine.active_character_id == "aoi"
+
+
+def test_switch_waits_for_phrase_render_to_finish(tmp_path):
+    import threading
+    import time
+    from render_cache import PhraseRenderer, phrase_key, split_into_phrases
+    from data_models import NoteEvent
+
+    engine = VO_SE_Engine(backend="numpy")
+    engine.register_character(CharacterInfo(id="a", name="A", audio_dir=_voicebank(tmp_path, "a")))
+    engine.register_character(CharacterInfo(id="b", name="B", audio_dir=_voicebank(tmp_path, "b")))
+    engine.character_pool.get("b", engine.characters["b"].audio_dir) # 切り替え自体はすぐ終わるようにしておく
+    assert engine.set_active_character("a")
+    renderer = PhraseRenderer(engine)
+    (phrase,) = split_into_phrases([NoteEvent(60, 0.0, 0.5, 100, "あ")])
+
+    seen = []
+    original = engine.synthesize_into
+
+    def synthesize_into(*args, **kwargs):
+        # 合成の途中で別スレッドからキャラクターを切り替える
+        switch = threading.Thread(target=engine.set_active_character, args=("b",))
+        switch.start()
+        time.sleep(0.1)
+        seen.append((engine.active_character_id, engine.numpy_backend.char_id))
+        engine.synthesize_into = original
+        return original(*args, **kwargs)
+
+    engine.synthesize_into = synthesize_into
+    renderer.render_phrase(phrase)
+    while engine.active_character_id != "b":
+        time.sleep(0.01)
+
+    assert seen == [("a", "a")] # 合成が終わるまで声もIDも変わらない
+    assert phrase_key(phrase, "a", engine.sample_rate) in renderer.cache
+    assert phrase_key(phrase, "b", engine.sample_rate) not in renderer.cache
@@ -0,0 +1,47 @@
+# test_parallel_export.py
+# 並列書き出しが通常の（1プロセスでの）合成と同じ音声になるか確認する
+
+import pytest
+
+from bench_synthesis import make_voicebank
+from data_models import NoteEvent, PitchEvent
+from parallel_export import build_segments, render_parallel
+from vo_se_engine import VO_SE_Engine
+
+SAMPLE_RATE = 44100
+
+
+def _song():
+    # 休符で区切られたフレーズを複数作る（区間の境目がフレーズの境目に来る）
+    notes, t = [], 0.0
+    for phrase in range(6):
+        for i in range(4):
+            notes.append(NoteEvent(60 + (phrase + i) % 7, t, 0.37, 100, "あ" if i % 2 else "い"))
+            t += 0.37
+        t += 0.213
+    pitch_events = [PitchEvent(0.1 * k, int(800 * ((k % 9) - 4))) for k in range(int(t * 10))]
+    return notes, pitch_events
+
+
+@pytest.mark.parametrize("quality", ["linear", "sinc_fast"])
+def test_parallel_matches_serial(tmp_path, quality):
+    make_voicebank(str(tmp_path), SAMPLE_RATE)
+    notes, pitch_events = _song()
+
+    engine = VO_SE_Engine(sample_rate=SAMPLE_RATE, backend="numpy", resample_quality=quality)
+    engine.load_character("test", str(tmp_path))
+    serial = engine.synthesize(notes, pitch_events)
+
+    parallel = render_parallel(notes, pitch_events, SAMPLE_RATE, "test", str(tmp_path),
+                               max_workers=2, backend="numpy", resample_quality=quality)
+    assert parallel.size == serial.size
+    assert abs(parallel - serial).max() <= 1e-6
+
+
+def test_segments_start_on_sample_boundaries():
+    notes, pitch_events = _song()
+    segments = build_segments(notes, pitch_events, 4, SAMPLE_RATE)
+    assert len(segments) > 1
+    for seg in segments:
+        assert (seg.start_time * SAMPLE_RATE) == round(seg.start_time * SAMPLE_RATE)
+        assert seg.start_time <= min(n.start_time for n in seg.notes)
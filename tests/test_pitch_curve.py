@@ -0,0 +1,54 @@
+# test_pitch_curve.py
+# 合成バックエンドとグラフエディタが同じピッチ曲線のキャッシュを使っているか確認する
+
+import numpy as np
+
+from data_models import NoteEvent, PitchEvent
+from pitch_curve import CONTROL_FRAME_RATE, DISPLAY_FRAME_RATE, PitchCurveCache, bend_semitones, bend_table
+from render_cache import pitch_events_in_range, split_into_phrases
+from vo_se_engine import VO_SE_Engine
+
+
+def _song():
+    notes = [NoteEvent(60, 0.0, 0.5, 100, "あ"), NoteEvent(62, 0.5, 0.5, 100, "い"),
+             NoteEvent(64, 1.5, 0.75, 100, "う")]
+    pitch_events = [PitchEvent(0.0, 0), PitchEvent(0.8, 4096), PitchEvent(2.0, -2048)]
+    return notes, pitch_events
+
+
+def test_editor_lookup_hits_curves_computed_by_synth():
+    notes, pitch_events = _song()
+    engine = VO_SE_Engine(backend="numpy")
+    engine.synthesize(notes, pitch_events)
+    cache = engine.pitch_curves
+    n_phrases = len(split_into_phrases(notes, pitch_events))
+    assert cache.misses == n_phrases
+
+    curves = cache.curves_for_song(notes, pitch_events, DISPLAY_FRAME_RATE)
+    assert len(curves) == n_phrases
+    assert cache.hits == n_phrases and cache.misses == n_phrases
+
+
+def test_bend_ratio_at_interpolates_control_rate_curve():
+    notes, pitch_events = _song()
+    cache = PitchCurveCache()
+    phrase = split_into_phrases(notes, pitch_events)[0]
+    curve = cache.get(phrase)
+    assert curve.frame_rate == CONTROL_FRAME_RATE
+
+    # ピッチイベントの間は直線なので、フレームの間を補間してもサンプルごとに計算した値と一致する
+    t = np.linspace(0.1, 0.7, 1000)
+    expected = np.exp2(bend_semitones(t, *bend_table(pitch_events)) / 12.0)
+    assert np.allclose(curve.bend_ratio_at(t), expected, atol=1e-9)
+    # フレーズの最後のサンプルまで曲線の範囲に入っている
+    assert curve.end_time >= phrase.end_time
+
+
+def test_pitch_events_in_range_interpolates_edges():
+    events = [PitchEvent(0.0, 0), PitchEvent(1.0, 1000), PitchEvent(2.0, 2000), PitchEvent(3.0, 0)]
+    inside = pitch_events_in_range(events, 1.0, 2.5)
+    assert [(p.time, p.value) for p in inside] == [(0.0, 1000), (1.0, 2000), (1.5, 1000)]
+
+    between = pitch_events_in_range(events, 0.5, 0.75, [p.time for p in events])
+    assert [(p.time, p.value) for p in between] == [(0.0, 500), (0.25, 750)]
+    assert pitch_events_in_range([], 0.0, 1.0) == []
@@ -0,0 +1,24 @@
+# test_preview_cache.py
+# プレビュー音の作り置きが GUI 用のエンジンでだけ行われるか確認する
+
+from bench_synthesis import make_voicebank
+from vo_se_engine import VO_SE_Engine
+
+
+def test_headless_engine_does_not_prerender_previews(tmp_path):
+    make_voicebank(str(tmp_path))
+    engine = VO_SE_Engine(backend="numpy")
+    engine.load_character("test", str(tmp_path))
+    assert engine.preview_cache._thread is None
+    assert engine.preview_cache.ready_count == 0
+    # 作り置きしていなくても、鳴らす時にその場で合成できる
+    assert engine.preview_cache.tone_for(60).size > 0
+
+
+def test_gui_engine_prerenders_previews(tmp_path):
+    make_voicebank(str(tmp_path))
+    engine = VO_SE_Engine(backend="numpy", previews=True)
+    engine.load_character("test", str(tmp_path))
+    engine.preview_cache.wait(timeout=30)
+    assert engine.preview_cache.character_id == "test"
+    assert engine.preview_cache.ready_count > 0
@@ -0,0 +1,25 @@
+# test_render_cli.py
+# render_cli の書き出し先の決め方を確認する
+
+import os
+
+import pytest
+
+from render_cli import output_paths
+
+
+def test_same_name_in_different_folders_does_not_collide(tmp_path):
+    projects = [str(tmp_path / "album1" / "song.json"), str(tmp_path / "album2" / "song.json")]
+    outputs = output_paths(projects, "out", "wav")
+    assert outputs == [os.path.join("out", "album1", "song.wav"), os.path.join("out", "album2", "song.wav")]
+
+
+def test_single_folder_writes_directly_under_out_dir(tmp_path):
+    projects = [str(tmp_path / "a.json"), str(tmp_path / "b.json")]
+    assert output_paths(projects, "out", "flac") == [os.path.join("out", "a.flac"), os.path.join("out", "b.flac")]
+
+
+def test_duplicate_output_is_rejected(tmp_path):
+    project = str(tmp_path / "song.json")
+    with pytest.raises(ValueError):
+        output_paths([project, project], "out", "wav")
@@ -0,0 +1,44 @@
+# test_render_into.py
+# プレビュー音・ストリーミング・フレーズ合成が render-into とバッファプールを通り、定常状態で確保し直さないことを確認する
+
+import numpy as np
+
+from data_models import NoteEvent, PitchEvent
+from render_cache import PhraseRenderer
+from vo_se_engine import VO_SE_Engine
+
+
+def _song():
+    notes = [NoteEvent(60 + i % 5, 0.3 * i + (0.2 if i >= 4 else 0.0), 0.3, 100, "あ") for i in range(8)]
+    return notes, [PitchEvent(0.0, 0), PitchEvent(2.0, 2048)]
+
+
+def test_synthesize_into_matches_synthesize():
+    notes, pitch_events = _song()
+    engine = VO_SE_Engine(backend="numpy")
+    expected = engine.synthesize(notes, pitch_events)
+    audio = engine.synthesize_into(notes, pitch_events)
+    assert np.array_equal(audio, expected)
+    engine.release_buffer(audio)
+
+
+def test_steady_state_does_not_allocate():
+    notes, pitch_events = _song()
+    engine = VO_SE_Engine(backend="numpy")
+    renderer = PhraseRenderer(engine)
+
+    def play_once():
+        for note_number in (60, 64, 67):
+            engine.preview_cache.clear()
+            assert engine.preview_cache.tone_for(note_number).size > 0
+        for _ in engine.synthesize_stream(notes, pitch_events):
+            pass
+        renderer.cache.clear()
+        renderer.mark_dirty()
+        renderer.render_range(notes, pitch_events, 0.0, 3.0)
+
+    play_once()
+    warm = engine.buffer_pool.allocations
+    for _ in range(3):
+        play_once()
+    assert engine.buffer_pool.allocations == warm
@@ -0,0 +1,53 @@
+# test_render_server.py
+# 長い曲のリクエストが、送り終わるまでワーカーとキューの枠を使い続けること（アドミッション制御から漏れないこと）を確認する
+
+import os
+
+import numpy as np
+
+from bench_synthesis import make_voicebank
+from data_models import NoteEvent
+from render_server import STREAM_QUEUE_BLOCKS, SMALL_REQUEST_SECONDS, CharacterWorker, LatencyMetrics, RenderRequest
+
+
+def _worker(tmp_path, max_queue):
+    folder = os.path.join(str(tmp_path), "aoi")
+    os.makedirs(folder)
+    make_voicebank(folder)
+    return CharacterWorker("aoi", folder, 44100, "numpy", max_queue, LatencyMetrics())
+
+
+def _sing(seconds):
+    notes = [NoteEvent(60 + i % 5, i * 0.5, 0.5, 100, "あ") for i in range(int(seconds / 0.5))]
+    return RenderRequest("sing", (notes, []))
+
+
+def test_long_request_is_rendered_by_worker_and_holds_its_slot(tmp_path):
+    worker = _worker(tmp_path, max_queue=1)
+    long_request = _sing(SMALL_REQUEST_SECONDS + 3.0)
+    assert worker.submit(long_request)
+    blocks = long_request.future.result(timeout=10)
+
+    # 送信していない間、ワーカーは合成済みブロックの上限で待っている（次のリクエストはキューに残る）
+    waiting = _sing(1.0)
+    assert worker.submit(waiting)
+    assert not worker.submit(_sing(1.0)) # キューは満杯
+    assert blocks._queue.qsize() <= STREAM_QUEUE_BLOCKS
+    assert not waiting.future.done()
+
+    audio = np.concatenate(list(blocks))
+    assert audio.size >= int(long_request.duration * 44100)
+    assert waiting.future.result(timeout=10).size > 0
+
+
+def test_closing_blocks_stops_the_worker(tmp_path):
+    worker = _worker(tmp_path, max_queue=1)
+    long_request = _sing(SMALL_REQUEST_SECONDS + 30.0)
+    worker.submit(long_request)
+    blocks = long_request.future.result(timeout=10)
+    next(blocks)
+    blocks.close() # クライアントが切断した
+
+    after = _sing(1.0)
+    assert worker.submit(after)
+    assert after.future.result(timeout=10).size > 0
@@ -0,0 +1,55 @@
+# test_synthesis_stream.py
+# 休符の無い長いフレーズでも細かく合成して早く鳴り始めること、end_time で出力が切れることを確認する
+
+import numpy as np
+
+from data_models import NoteEvent, PitchEvent
+from render_cache import split_into_phrases, split_long_phrase
+from vo_se_engine import VO_SE_Engine
+
+
+def _legato_song(n_notes=40):
+    # 休符の無い 0.3 秒のノートの連続（全体で1フレーズ）
+    notes = [NoteEvent(60 + i % 7, 0.3 * i, 0.3, 100, "あ") for i in range(n_notes)]
+    return notes, [PitchEvent(0.0, 0), PitchEvent(0.3 * n_notes, 4096)]
+
+
+def test_long_phrase_is_split_at_note_boundaries():
+    notes, pitch_events = _legato_song()
+    (phrase,) = split_into_phrases(notes, pitch_events)
+    pieces = split_long_phrase(phrase, 2.0)
+    assert len(pieces) > 1
+    assert sum(len(p.notes) for p in pieces) == len(notes)
+    assert all(p.end_time - p.start_time <= 2.0 + 0.3 for p in pieces)
+
+
+def test_first_block_does_not_wait_for_whole_phrase():
+    notes, pitch_events = _legato_song()
+    engine = VO_SE_Engine(backend="numpy")
+    rendered = []
+
+    def render_phrase(ph):
+        rendered.append(ph)
+        return engine.synthesize(ph.local_notes(), ph.pitch_events)
+
+    blocks = engine.synthesize_stream(notes, pitch_events, max_in_flight=1, render_phrase=render_phrase,
+                                      max_phrase_seconds=2.0)
+    next(blocks)
+    assert len(rendered) <= 3 # 曲全体（12秒）ではなく先頭の数区間だけ合成した時点で最初のブロックが出る
+    blocks.close()
+
+
+def test_stream_matches_full_render():
+    notes, pitch_events = _legato_song()
+    engine = VO_SE_Engine(backend="numpy")
+    expected = engine.synthesize(notes, pitch_events)
+    streamed = np.concatenate(list(engine.synthesize_stream(notes, pitch_events, max_phrase_seconds=2.0)))
+    n = min(expected.size, streamed.size)
+    assert np.abs(streamed[:n] - expected[:n]).max() <= 1e-6
+
+
+def test_end_time_truncates_output():
+    notes, pitch_events = _legato_song()
+    engine = VO_SE_Engine(backend="numpy")
+    blocks = list(engine.synthesize_stream(notes, pitch_events, start_time=1.0, end_time=3.25))
+    assert sum(b.size for b in blocks) == int(round(2.25 * engine.sample_rate))
@@ -0,0 +1,51 @@
+# test_talk_engine_wrapper.py
+# render-into の確保し直しが1回で終わること（エンジンがおかしな値を返しても止まること）を確認する
+
+import types
+
+import numpy as np
+import pytest
+
+from data_models import PhonemeEvent
+from talk_engine_wrapper import TalkEngineWrapper
+
+
+def _wrapper(responses):
+    """execute_talk_render_into が responses(capacity) を順に返す偽のエンジン"""
+    calls = []
+
+    def render_into(c_array, count, sample_rate, ptr, capacity):
+        calls.append(capacity)
+        written = responses[len(calls) - 1](capacity)
+        if written > 0:
+            ptr[0] = 0.5
+        return written
+
+    wrapper = TalkEngineWrapper.__new__(TalkEngineWrapper)
+    wrapper.lib = types.SimpleNamespace(execute_talk_render_into=render_into)
+    wrapper.has_render_into = True
+    return wrapper, calls
+
+
+EVENTS = [PhonemeEvent("a", 0.0, 0.1, 220.0, 220.0)]
+
+
+def test_retries_once_with_requested_size():
+    wrapper, calls = _wrapper([lambda cap: -(cap + 100), lambda cap: cap])
+    audio = wrapper.render_sentence_to_array(EVENTS, 1000)
+    assert calls == [calls[0], calls[0] + 100]
+    assert audio.size == calls[1] and audio[0] == np.float32(0.5)
+
+
+def test_raises_when_second_call_still_too_small():
+    wrapper, calls = _wrapper([lambda cap: -(cap + 100), lambda cap: -(cap + 100), lambda cap: 0])
+    with pytest.raises(RuntimeError):
+        wrapper.render_sentence_to_array(EVENTS, 1000)
+    assert len(calls) == 2
+
+
+def test_raises_when_requested_size_does_not_grow():
+    wrapper, calls = _wrapper([lambda cap: -cap, lambda cap: 0])
+    with pytest.raises(RuntimeError):
+        wrapper.render_sentence_to_array(EVENTS, 1000)
+    assert len(calls) == 1
@@ -0,0 +1,25 @@
+# test_talk_pipeline.py
+# 文ごとの通知に、読み上げ先頭から数えた開始秒が渡ること（タイムラインに音素を並べるのに使う）を確認する
+
+import numpy as np
+
+from talk_pipeline import TalkPipeline
+
+
+class _Analyzer:
+    def analyze_many(self, text):
+        for sentence in text.split("。"):
+            yield sentence, [{"lyric": "a", "start_time": 0.0, "duration": 0.1, "pitch_start": 60, "pitch_end": 60}]
+
+
+def test_on_sentence_reports_start_after_previous_audio_and_gap():
+    rate = 100
+    lengths = iter([30, 50])
+    pipeline = TalkPipeline(_Analyzer(), lambda events: np.ones(next(lengths), dtype=np.float32), rate, gap_seconds=0.2)
+    seen = []
+    pipeline.on_sentence = lambda index, sentence, events, start: seen.append((index, sentence, start))
+
+    audio = np.concatenate(list(pipeline.stream("あ。い")))
+    assert seen == [(0, "あ", 0.0), (1, "い", 0.5)]
+    assert audio.size == 30 + 20 + 50
+    assert audio[int(seen[1][2] * rate)] == 1.0
@@ -0,0 +1,13 @@
+# test_text_analyzer.py
+# text_analyzer を import しただけでは pyopenjtalk を読み込まないことを確認する（起動時間・ワーカーの起動のため）
+
+import subprocess
+import sys
+
+from conftest import GUI_DIR
+
+
+def test_import_does_not_load_pyopenjtalk():
+    code = "import sys, text_analyzer; text_analyzer.TextAnalyzer().dict_version; print('pyopenjtalk' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=GUI_DIR, capture_output=True, text=True, check=True)
+    assert result.stdout.strip().splitlines()[-1] == "False"